@@ -1,276 +1,505 @@
+import logging
+import queue
 import sqlite3
 import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
 from datetime import datetime
+from pathlib import Path
+
+import migrations
+
+
+class InsufficientStockError(Exception):
+    """الكمية المطلوبة غير متوفرة؛ shortfalls قائمة (expense_id, الكمية المطلوبة)"""
+
+    def __init__(self, shortfalls):
+        super().__init__(f"Insufficient stock for expenses {[expense_id for expense_id, _ in shortfalls]}")
+        self.shortfalls = shortfalls
+
+
+# إنقاص مشروط: لا ينجح إلا إذا كان المتبقي كافيًا
+RESERVE_STOCK_SQL = (
+    "UPDATE expenses SET consumption = consumption + ?, remaining = remaining - ? "
+    "WHERE expense_id = ? AND remaining >= ?"
+)
+
+
+def reserve_stock(cursor, reservations):
+    """حجز كميات من المخزون بإنقاص مشروط داخل المعاملة الحالية.
+
+    reservations: قائمة (expense_id, quantity). كل صنف يُنقص بأمر واحد
+    لا ينجح إلا إذا كان المتبقي كافيًا، فلا يمكن أن يصبح المتبقي سالبًا
+    مهما تعددت الجلسات. يعيد عدد الصفوف المتأثرة، ويرفع
+    InsufficientStockError بكل الأصناف غير المتوفرة حتى تتراجع المعاملة.
+    """
+    affected = 0
+    shortfalls = []
+    for expense_id, quantity in reservations:
+        cursor.execute(RESERVE_STOCK_SQL, (quantity, quantity, expense_id, quantity))
+        if cursor.rowcount == 1:
+            affected += 1
+        else:
+            shortfalls.append((expense_id, quantity))
+    if shortfalls:
+        raise InsufficientStockError(shortfalls)
+    return affected
+
+
+class DatabaseClosedError(RuntimeError):
+    """استخدام DatabaseManager بعد close_connection"""
+
+
+# الفترة المحاسبية المفتوحة حاليًا؛ تُستخدم كاستعلام فرعي لتصفية السجلات الحية
+OPEN_PERIOD_SQL = "(SELECT period_id FROM periods WHERE closed_at IS NULL)"
+
+CLOSE_PERIOD_SQL = f"""
+    UPDATE periods
+    SET closed_at = ?, end_date = ?, archive_key_id = ?
+    WHERE period_id = {OPEN_PERIOD_SQL}
+    RETURNING period_id
+"""
+
+
+def close_period(cursor, archive_key_id):
+    """إغلاق الفترة المفتوحة وربطها بمفتاح الأرشيف ثم فتح فترة جديدة.
+
+    السجلات تبقى في جداولها موسومة بـ period_id، فالتقفيل مجرد تعديل
+    لبيانات الفترة. يعيد رقم الفترة المغلقة.
+    """
+    now = datetime.now()
+    cursor.execute(CLOSE_PERIOD_SQL, (now.strftime("%Y-%m-%d %H:%M:%S"), now.strftime("%Y-%m-%d"), archive_key_id))
+    row = cursor.fetchone()
+    cursor.execute("INSERT INTO periods (start_date) VALUES (?)", (now.strftime("%Y-%m-%d"),))
+    return row[0] if row else None
+
+
+# إجراءات المُخوِّل (authorizer) التي تعدل بيانات جدول، والتي تغير المخطط فتبطل كل النتائج المخزنة
+WRITE_ACTIONS = (sqlite3.SQLITE_INSERT, sqlite3.SQLITE_UPDATE, sqlite3.SQLITE_DELETE)
+SCHEMA_ACTIONS = (
+    sqlite3.SQLITE_ALTER_TABLE, sqlite3.SQLITE_DROP_TABLE, sqlite3.SQLITE_DROP_VIEW, sqlite3.SQLITE_DROP_VTABLE,
+)
+ALL_TABLES = "*"
+
 
 class DatabaseManager:
+    # تجميع عمليات الكتابة التي تصل خلال هذه المدة (بالثواني) في معاملة واحدة
+    GROUP_COMMIT_WINDOW = 0.005
+    GROUP_COMMIT_MAX_JOBS = 256
+    # مهلة الانتظار عند انشغال قاعدة البيانات وعدد مرات إعادة المحاولة
+    BUSY_TIMEOUT_MS = 5000
+    BUSY_RETRIES = 5
+    # أقصى عدد نتائج استعلامات محفوظة في ذاكرة fetch_cached
+    QUERY_CACHE_SIZE = 256
+    # أقصى عدد استعلامات تُحفظ جداولها المقروءة (الاستعلامات المبنية ديناميكيًا لا تنمو بلا حد)
+    QUERY_TABLES_SIZE = 1024
+
     def __init__(self, db_name="expenses.db"):
-        self.lock = threading.Lock()
         self.db_name = db_name
+        # اتصال الكتابة الوحيد، يملكه خيط الكتابة بعد بدء تشغيله
         self.conn = None
+        self._write_queue = None
+        self._writer = None
+        # اتصالات القراءة: اتصال للقراءة فقط لكل خيط
+        self._local = threading.local()
+        self._readers = []
+        self._readers_lock = threading.Lock()
+        self._generation = 0
+        # يحمي فتح الاتصالات وإغلاقها وإرسال مهام الكتابة، فلا يعمل إلا خيط كتابة واحد
+        self._lifecycle_lock = threading.RLock()
+        self._closed = False
+        # يمسكه خيط الكتابة طوال تنفيذ كل دفعة
+        self._conn_lock = threading.Lock()
+        # الجداول التي عدلتها الدفعة الجارية، يجمعها المُخوِّل على اتصال الكتابة
+        self._written_tables = set()
+        # ذاكرة نتائج الاستعلامات: (الاستعلام، المعاملات) -> (الجداول المقروءة، الصفوف)
+        self._query_cache = OrderedDict()
+        # نص الاستعلام بمسافات موحدة -> الجداول التي يقرؤها، الأقدم استخدامًا أولًا
+        self._query_tables = OrderedDict()
+        self._cache_lock = threading.Lock()
+        # يزداد مع كل إبطال، فلا تُحفظ نتيجة قُرئت أثناء كتابة متزامنة
+        self._cache_sequence = 0
+        self._data_version = None
+        # تُستدعى بالجداول المعدلة بعد كل إبطال (انظر add_invalidation_listener)
+        self._invalidation_listeners = []
+        self.cache_hits = 0
+        self.cache_misses = 0
         self.reconnect()
 
     def reconnect(self):
-        """إعادة الاتصال بقاعدة البيانات"""
+        """إعادة الاتصال بقاعدة البيانات (وإعادة فتحها بعد close_connection)"""
+        with self._lifecycle_lock:
+            self._reconnect()
+
+    def _reconnect(self):
         try:
+            self._stop_writer()
+            self._close_readers()
             if self.conn:
                 self.conn.close()
-            self.conn = sqlite3.connect(self.db_name, check_same_thread=False)
+            # المعاملات تُدار يدويًا في خيط الكتابة (BEGIN IMMEDIATE / COMMIT)
+            self.conn = sqlite3.connect(
+                self.db_name,
+                check_same_thread=False,
+                isolation_level=None,
+                timeout=self.BUSY_TIMEOUT_MS / 1000,
+            )
+            # وضع WAL يسمح للقراءات بالاستمرار أثناء الكتابة
+            self.conn.execute("PRAGMA journal_mode = WAL;")
+            self.conn.execute("PRAGMA synchronous = NORMAL;")
+            self.conn.execute(f"PRAGMA busy_timeout = {self.BUSY_TIMEOUT_MS};")
             self.conn.execute("PRAGMA foreign_keys = ON;")  # تفعيل المفاتيح الأجنبية
-            self.create_tables()
+            self.migrate()
+            self._data_version = self.conn.execute("PRAGMA data_version").fetchone()[0]
+            self.clear_cache()
+            self._start_writer()
+            self._closed = False
         except Exception as e:
             print(f"فشل إعادة الاتصال: {e}")
 
-    def create_tables(self):
-        """إنشاء الجداول إذا لم تكن موجودة"""
-        try:
-            cursor = self.conn.cursor()
-            self.conn.execute("BEGIN TRANSACTION")
-
-            # جدول المصاريف
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS expenses (
-                    expense_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    item_name TEXT,
-                    quantity INTEGER,
-                    price REAL,
-                    total_price REAL,
-                    consumption INTEGER DEFAULT 0,
-                    remaining INTEGER DEFAULT 0,
-                    is_miscellaneous INTEGER DEFAULT 0,
-                    is_drink INTEGER DEFAULT 0,
-                    date TEXT
-                )
-            """)
-
-            # جدول المشتركين
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS members (
-                    member_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    name TEXT,
-                    rank TEXT,
-                    contribution REAL,
-                    total_due REAL DEFAULT 0,
-                    date TEXT
-                )
-            """)
-
-            # جدول سجلات الوجبات
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS meal_records (
-                    meal_record_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    meal_type TEXT,
-                    date TEXT,
-                    member_id INTEGER,
-                    final_cost REAL,
-                    FOREIGN KEY (member_id) REFERENCES members(member_id)
-                )
-            """)
-
-            # جدول سجلات المشروبات
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS drink_records (
-                    drink_record_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    date TEXT,
-                    drink_name TEXT,
-                    member_id INTEGER,
-                    quantity INTEGER,
-                    total_cost REAL,
-                    FOREIGN KEY (member_id) REFERENCES members(member_id)
-                )
-            """)
-
-            # جدول المصاريف النثرية العام
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS miscellaneous_expenses (
-                    misc_expense_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    date TEXT,
-                    amount REAL,
-                    meal_type TEXT,
-                    meal_record_id INTEGER,
-                    member_id INTEGER,
-                    FOREIGN KEY (meal_record_id) REFERENCES meal_records(meal_record_id),
-                    FOREIGN KEY (member_id) REFERENCES members(member_id)
-                )
-            """)
-
-            # جدول النثريات الخاص بالمشتركين
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS miscellaneous_contributions (
-                    misc_contribution_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    member_id INTEGER,
-                    misc_amount REAL,
-                    meal_count INTEGER DEFAULT 0,
-                    distribution_date TEXT,
-                    FOREIGN KEY (member_id) REFERENCES members(member_id)
-                )
-            """)
-
-            # جدول مفاتيح الأرشيف
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS archive_keys (
-                    archive_key_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    archive_name TEXT,
-                    start_date TEXT,
-                    end_date TEXT,
-                    archived_at TEXT
-                )
-            """)
-
-            # جداول الأرشيف
-            self._create_archive_tables(cursor)
-
-            self.conn.commit()
-            self._run_migrations(cursor)
+    def _ensure_open(self):
+        if self._closed:
+            raise DatabaseClosedError(f"Database {self.db_name} is closed")
 
-        except Exception as e:
-            self.conn.rollback()
-            print(f"حدث خطأ أثناء إنشاء الجداول أو التعديلات: {e}")
-        finally:
-            pass
-
-    def _create_archive_tables(self, cursor):
-        """إنشاء جداول الأرشيف"""
-        # أرشيف المصاريف
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS expenses_archive (
-                expense_id INTEGER,
-                item_name TEXT,
-                quantity INTEGER,
-                price REAL,
-                total_price REAL,
-                consumption INTEGER DEFAULT 0,
-                remaining INTEGER DEFAULT 0,
-                is_miscellaneous INTEGER DEFAULT 0,
-                is_drink INTEGER DEFAULT 0,
-                date TEXT,
-                archive_key_id INTEGER,
-                PRIMARY KEY (expense_id, archive_key_id),
-                FOREIGN KEY (archive_key_id) REFERENCES archive_keys(archive_key_id)
-            )
-        """)
-
-        # أرشيف المشتركين
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS members_archive (
-                member_id INTEGER,
-                name TEXT,
-                rank TEXT,
-                contribution REAL,
-                total_due REAL,
-                date TEXT,
-                archive_key_id INTEGER,
-                PRIMARY KEY (member_id, archive_key_id),
-                FOREIGN KEY (archive_key_id) REFERENCES archive_keys(archive_key_id)
-            )
-        """)
-
-        # أرشيف سجلات الوجبات
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS meal_records_archive (
-                meal_record_id INTEGER,
-                meal_type TEXT,
-                date TEXT,
-                member_id INTEGER,
-                final_cost REAL,
-                archive_key_id INTEGER,
-                PRIMARY KEY (meal_record_id, archive_key_id),
-                FOREIGN KEY (archive_key_id) REFERENCES archive_keys(archive_key_id)
-            )
-        """)
-
-        # أرشيف سجلات المشروبات
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS drink_records_archive (
-                drink_record_id INTEGER,
-                date TEXT,
-                drink_name TEXT,
-                member_id INTEGER,
-                quantity INTEGER,
-                total_cost REAL,
-                archive_key_id INTEGER,
-                PRIMARY KEY (drink_record_id, archive_key_id),
-                FOREIGN KEY (archive_key_id) REFERENCES archive_keys(archive_key_id)
-            )
-        """)
-
-        # أرشيف المصاريف النثرية
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS miscellaneous_expenses_archive (
-                misc_expense_id INTEGER,
-                date TEXT,
-                amount REAL,
-                meal_type TEXT,
-                meal_record_id INTEGER,
-                archive_key_id INTEGER,
-                PRIMARY KEY (misc_expense_id, archive_key_id),
-                FOREIGN KEY (archive_key_id) REFERENCES archive_keys(archive_key_id)
-            )
-        """)
-
-        # أرشيف توزيعات النثريات
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS miscellaneous_contributions_archive (
-                misc_contribution_id INTEGER,
-                member_id INTEGER,
-                misc_amount REAL,
-                meal_count INTEGER,
-                distribution_date TEXT,
-                archive_key_id INTEGER,
-                PRIMARY KEY (misc_contribution_id, archive_key_id),
-                FOREIGN KEY (archive_key_id) REFERENCES archive_keys(archive_key_id)
-            )
-        """)
+    # --- خيط الكتابة (Single writer) ---
+
+    def _start_writer(self):
+        """تشغيل خيط الكتابة الذي يملك اتصال الكتابة"""
+        self._write_queue = queue.Queue()
+        self._writer = threading.Thread(target=self._writer_loop, name="db-writer", daemon=True)
+        self._writer.start()
 
-    def _run_migrations(self, cursor):
-        """التعديلات على الجداول (Migrations)"""
+    def _stop_writer(self):
+        """إيقاف خيط الكتابة بعد تنفيذ كل المهام المنتظرة"""
+        if self._writer is not None:
+            self._write_queue.put(None)
+            self._writer.join()
+            self._writer = None
+
+    def _writer_loop(self):
+        """استقبال مهام الكتابة وتجميع ما يصل منها خلال نافذة قصيرة في معاملة واحدة"""
+        while True:
+            job = self._write_queue.get()
+            if job is None:
+                return
+            batch = [job]
+            stop = False
+            deadline = time.monotonic() + self.GROUP_COMMIT_WINDOW
+            while len(batch) < self.GROUP_COMMIT_MAX_JOBS:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    job = self._write_queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if job is None:
+                    stop = True
+                    break
+                batch.append(job)
+            self._commit_batch(batch)
+            if stop:
+                return
+
+    def _retry_busy(self, statement):
+        """تنفيذ أمر تحكم بالمعاملة مع إعادة المحاولة عند انشغال قاعدة البيانات"""
+        delay = 0.01
+        for attempt in range(self.BUSY_RETRIES):
+            try:
+                return self.conn.execute(statement)
+            except sqlite3.OperationalError as e:
+                message = str(e).lower()
+                if ("locked" not in message and "busy" not in message) or attempt == self.BUSY_RETRIES - 1:
+                    raise
+                logging.warning(f"Database busy on {statement}, retrying in {delay:.2f}s")
+                time.sleep(delay)
+                delay *= 2
+
+    def _authorize_write(self, action, arg1, arg2, db_name, source):
+        """مُخوِّل اتصال الكتابة: تسجيل الجداول التي تعدلها الأوامر (ومشغلاتها) دون منع أي أمر"""
+        if action in WRITE_ACTIONS:
+            self._written_tables.add(arg1.lower())
+        elif action in SCHEMA_ACTIONS:
+            self._written_tables.add(ALL_TABLES)
+        return sqlite3.SQLITE_OK
+
+    def _commit_batch(self, batch):
+        """تنفيذ دفعة مع منع فحص data_version على اتصال الكتابة أثناءها، ثم إبطال نتائج الجداول المعدلة"""
+        with self._conn_lock:
+            # المُخوِّل لا يُستدعى إلا عند تحضير الأمر؛ إعادة تعيينه تُلغي الأوامر المحضرة
+            # فيُحضر كل أمر من جديد في أول استخدام له داخل الدفعة ويُسجل ما يكتبه
+            self._written_tables = set()
+            self.conn.set_authorizer(self._authorize_write)
+            try:
+                self._run_batch(batch)
+            finally:
+                self.conn.set_authorizer(None)
+
+    def _run_batch(self, batch):
+        """تنفيذ مجموعة مهام داخل معاملة واحدة؛ كل مهمة داخل SAVEPOINT مستقل"""
+        outcomes = []
         try:
-            # تعديل جدول miscellaneous_expenses
-            cursor.execute("PRAGMA table_info(miscellaneous_expenses)")
-            cols = [col[1] for col in cursor.fetchall()]
-            if "meal_record_id" not in cols:
-                cursor.execute("ALTER TABLE miscellaneous_expenses ADD COLUMN meal_record_id INTEGER")
-            if "member_id" not in cols:
-                cursor.execute("ALTER TABLE miscellaneous_expenses ADD COLUMN member_id INTEGER REFERENCES members(member_id)")
-
-            # تعديل جدول miscellaneous_contributions
-            cursor.execute("PRAGMA table_info(miscellaneous_contributions)")
-            cols = [col[1] for col in cursor.fetchall()]
-            if "meal_count" not in cols:
-                cursor.execute("ALTER TABLE miscellaneous_contributions ADD COLUMN meal_count INTEGER DEFAULT 0")
-            if "distribution_date" not in cols:
-                cursor.execute("ALTER TABLE miscellaneous_contributions ADD COLUMN distribution_date TEXT")
-
-            self.conn.commit()
+            self._retry_busy("BEGIN IMMEDIATE")
+            for fn, future in batch:
+                if not future.set_running_or_notify_cancel():
+                    continue
+                cursor = self.conn.cursor()
+                cursor.execute("SAVEPOINT write_job")
+                try:
+                    result = fn(cursor)
+                except Exception as e:
+                    cursor.execute("ROLLBACK TO write_job")
+                    cursor.execute("RELEASE write_job")
+                    outcomes.append((future, None, e))
+                else:
+                    cursor.execute("RELEASE write_job")
+                    outcomes.append((future, result, None))
+            self._retry_busy("COMMIT")
         except Exception as e:
-            print(f"حدث خطأ أثناء تنفيذ التعديلات: {e}")
+            logging.error(f"Write batch of {len(batch)} jobs failed: {e}")
+            if self.conn.in_transaction:
+                self.conn.execute("ROLLBACK")
+            self.invalidate(self._written_tables)
+            for fn, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        # الإبطال قبل إعلام المنتظرين، فكل قراءة بعد write() ترى البيانات الجديدة
+        self.invalidate(self._written_tables)
+        for future, result, error in outcomes:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
 
-    def execute_query(self, query, params=()):
-        """تنفيذ استعلام مع قفل للسلامة في البيئات متعددة الخيوط"""
-        with self.lock:
+    def submit_write(self, fn):
+        """إرسال مهمة كتابة fn(cursor) إلى خيط الكتابة وإرجاع Future بنتيجتها"""
+        future = Future()
+        if threading.current_thread() is self._writer:
+            # استدعاء من داخل مهمة كتابة: ننفذها مباشرة داخل نفس المعاملة
             try:
-                if not self.conn:
-                    self.reconnect()
-                cursor = self.conn.cursor()
-                cursor.execute(query, params)
-                self.conn.commit()
-                return cursor
+                future.set_result(fn(self.conn.cursor()))
             except Exception as e:
-                print(f"حدث خطأ أثناء تنفيذ الاستعلام: {e}")
-                return None
+                future.set_exception(e)
+            return future
+        # الإرسال تحت القفل، فلا تصل مهمة إلى الطابور بعد إيقاف خيط الكتابة
+        with self._lifecycle_lock:
+            self._ensure_open()
+            self._write_queue.put((fn, future))
+        return future
+
+    def write(self, fn, timeout=None):
+        """تنفيذ مهمة كتابة fn(cursor) والانتظار حتى تثبيتها؛ يعيد نتيجتها أو يرفع استثناءها"""
+        return self.submit_write(fn).result(timeout)
+
+    def _open_reader(self):
+        """فتح اتصال قراءة فقط جديد لخيط التنفيذ الحالي"""
+        uri = f"{Path(self.db_name).resolve().as_uri()}?mode=ro"
+        conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        conn.execute("PRAGMA query_only = ON;")
+        with self._readers_lock:
+            self._readers.append(conn)
+        return conn
+
+    def reader(self):
+        """إرجاع اتصال القراءة الخاص بالخيط الحالي (يُنشأ عند أول استخدام)"""
+        self._ensure_open()
+        conn = getattr(self._local, "conn", None)
+        if conn is None or getattr(self._local, "generation", None) != self._generation:
+            conn = self._open_reader()
+            self._local.conn = conn
+            self._local.generation = self._generation
+        return conn
+
+    def _close_readers(self):
+        """إغلاق جميع اتصالات القراءة المفتوحة"""
+        with self._readers_lock:
+            readers, self._readers = self._readers, []
+            self._generation += 1
+        for conn in readers:
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+
+    def migrate(self):
+        """تحديث مخطط قاعدة البيانات بتنفيذ الترحيلات المعلقة فقط"""
+        try:
+            migrations.migrate(self.conn)
+        except Exception as e:
+            print(f"حدث خطأ أثناء تنفيذ الترحيلات: {e}")
+
+    def current_period_id(self):
+        """رقم الفترة المحاسبية المفتوحة"""
+        row = self.fetch_one_cached(f"SELECT {OPEN_PERIOD_SQL}")
+        return row[0] if row else None
+
+    def reserve_stock(self, reservations):
+        """حجز كميات من المخزون كمهمة كتابة مستقلة؛ انظر reserve_stock"""
+        return self.write(lambda cursor: reserve_stock(cursor, reservations))
+
+    def execute_query(self, query, params=()):
+        """تنفيذ استعلام كتابة عبر خيط الكتابة"""
+        try:
+            return self.write(lambda cursor: cursor.execute(query, params))
+        except DatabaseClosedError:
+            raise
+        except Exception as e:
+            print(f"حدث خطأ أثناء تنفيذ الاستعلام: {e}")
+            return None
 
     def fetch_all(self, query, params=()):
-        """استرجاع جميع البيانات من قاعدة البيانات"""
+        """استرجاع جميع البيانات من قاعدة البيانات عبر اتصال القراءة الخاص بالخيط"""
+        self._ensure_open()
         try:
-            if not self.conn:
-                self.reconnect()
-            cursor = self.conn.cursor()
+            cursor = self.reader().cursor()
             cursor.execute(query, params)
             return cursor.fetchall()
         except Exception as e:
             print(f"حدث خطأ أثناء استرجاع البيانات: {e}")
             return []
 
+    def fetch_one(self, query, params=()):
+        """استرجاع صف واحد (أو None) عبر اتصال القراءة الخاص بالخيط"""
+        self._ensure_open()
+        try:
+            cursor = self.reader().cursor()
+            cursor.execute(query, params)
+            return cursor.fetchone()
+        except Exception as e:
+            print(f"حدث خطأ أثناء استرجاع البيانات: {e}")
+            return None
+
+    # --- ذاكرة نتائج الاستعلامات ---
+
+    def invalidate(self, tables):
+        """حذف النتائج المحفوظة للاستعلامات التي تقرأ أيًا من الجداول tables (أو الكل مع ALL_TABLES)"""
+        if not tables:
+            return
+        with self._cache_lock:
+            self._cache_sequence += 1
+            if ALL_TABLES in tables:
+                self._query_cache.clear()
+            else:
+                stale = [key for key, (read, _) in self._query_cache.items() if not read.isdisjoint(tables)]
+                for key in stale:
+                    del self._query_cache[key]
+        for listener in list(self._invalidation_listeners):
+            try:
+                listener(tables)
+            except Exception as e:
+                logging.error(f"Invalidation listener {listener} failed: {e}")
+
+    def add_invalidation_listener(self, listener):
+        """تسجيل listener(tables) يُستدعى بعد تثبيت كل كتابة بالجداول التي عدلتها.
+
+        بعد دفعة من خيط الكتابة يُستدعى قبل إعلام المنتظرين بانتهائها، ومع
+        ALL_TABLES عند إعادة الاتصال أو اكتشاف كتابة من خارج البرنامج.
+        """
+        self._invalidation_listeners.append(listener)
+
+    def clear_cache(self):
+        """حذف كل النتائج المحفوظة"""
+        self.invalidate({ALL_TABLES})
+
+    def cache_stats(self):
+        """إحصاءات الذاكرة: عدد الإصابات والإخفاقات والنتائج المحفوظة"""
+        with self._cache_lock:
+            return {"hits": self.cache_hits, "misses": self.cache_misses, "entries": len(self._query_cache)}
+
+    def _check_data_version(self):
+        """اكتشاف الكتابة من اتصالات خارجية (برنامج آخر) عبر PRAGMA data_version على اتصال الكتابة.
+
+        data_version على اتصال لا يتغير بالتعديلات التي يثبتها الاتصال نفسه، فأي
+        تغير فيه يعني أن اتصالًا آخر عدل قاعدة البيانات فتُحذف كل النتائج. يعيد
+        False إذا كانت دفعة كتابة قيد التنفيذ، فتُقرأ البيانات مباشرة دون الذاكرة.
+        """
+        if not self._conn_lock.acquire(blocking=False):
+            return False
+        try:
+            version = self.conn.execute("PRAGMA data_version").fetchone()[0]
+        finally:
+            self._conn_lock.release()
+        if version != self._data_version:
+            self._data_version = version
+            self.clear_cache()
+        return True
+
+    def _fetch_tracked(self, query, params):
+        """تنفيذ استعلام قراءة وإرجاع (الصفوف، الجداول التي يقرؤها)"""
+        conn = self.reader()
+        normalized = " ".join(query.split())
+        with self._cache_lock:
+            tables = self._query_tables.get(normalized)
+            if tables is not None:
+                self._query_tables.move_to_end(normalized)
+        if tables is not None:
+            return conn.execute(query, params).fetchall(), tables
+        read = set()
+
+        def collect(action, arg1, arg2, db_name, source):
+            if action == sqlite3.SQLITE_READ and arg1:
+                read.add(arg1.lower())
+            return sqlite3.SQLITE_OK
+
+        conn.set_authorizer(collect)
+        try:
+            rows = conn.execute(query, params).fetchall()
+        finally:
+            conn.set_authorizer(None)
+        tables = frozenset(read)
+        with self._cache_lock:
+            self._query_tables[normalized] = tables
+            while len(self._query_tables) > self.QUERY_TABLES_SIZE:
+                self._query_tables.popitem(last=False)
+        return rows, tables
+
+    def fetch_cached(self, query, params=()):
+        """مثل fetch_all لكن النتيجة تُحفظ حتى تُعدل أحد الجداول التي يقرؤها الاستعلام.
+
+        الجداول المقروءة تُعرف من مُخوِّل SQLite عند أول تنفيذ للاستعلام، والكتابة
+        عبر خيط الكتابة تبطل نتائج الجداول التي عدلتها، والكتابة من خارج البرنامج
+        تبطل كل النتائج (انظر _check_data_version). عند الامتلاء تُحذف الأقدم استخدامًا.
+        """
+        self._ensure_open()
+        try:
+            key = (query, tuple(params))
+            if not self._check_data_version():
+                with self._cache_lock:
+                    self.cache_misses += 1
+                return self.fetch_all(query, params)
+            with self._cache_lock:
+                entry = self._query_cache.get(key)
+                if entry is not None:
+                    self._query_cache.move_to_end(key)
+                    self.cache_hits += 1
+                    return list(entry[1])
+                self.cache_misses += 1
+                sequence = self._cache_sequence
+            rows, tables = self._fetch_tracked(query, params)
+            with self._cache_lock:
+                # لا تُحفظ النتيجة إذا حدث إبطال أثناء قراءتها
+                if sequence == self._cache_sequence:
+                    self._query_cache[key] = (tables, rows)
+                    while len(self._query_cache) > self.QUERY_CACHE_SIZE:
+                        self._query_cache.popitem(last=False)
+            return list(rows)
+        except Exception as e:
+            print(f"حدث خطأ أثناء استرجاع البيانات: {e}")
+            return []
+
+    def fetch_one_cached(self, query, params=()):
+        """مثل fetch_one عبر ذاكرة fetch_cached"""
+        rows = self.fetch_cached(query, params)
+        return rows[0] if rows else None
+
     def close_connection(self):
-        """إغلاق اتصال قاعدة البيانات"""
-        if self.conn:
-            self.conn.close()
+        """إغلاق اتصالات قاعدة البيانات (الكتابة والقراءة)؛ الاستخدام بعده يرفع DatabaseClosedError"""
+        with self._lifecycle_lock:
+            self._closed = True
+            self._stop_writer()
+            self._close_readers()
+            if self.conn:
+                self.conn.close()
+                self.conn = None
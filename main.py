@@ -1,24 +1,143 @@
+import time
+
+# بداية قياس زمن التشغيل قبل أي استيراد
+_started = time.perf_counter()
+
+import importlib
+import logging
+import multiprocessing
+import threading
+
 import flet as ft
-from screeninfo import get_monitors
-from pages.main_page import MainPage
-from pages.input_page import InputPage
-from pages.view_page import ViewPage
-from pages.input_subscribers import InputSubscribersPage
-from pages.input_purchases import InputPurchasesPage
-from pages.show_subscribers import ShowSubscribersPage
-from pages.show_purchases import ShowPurchasesPage
-from pages.show_over import ShowOverPage
-from pages.distribute_expenses import DistributeExpensesPage
-from pages.drink_page import DrinkPage
-from pages.meal_page import MealPage
-from pages.reports_page import ReportsPage
-from pages.end_month_page import EndMonthPage
 from database import DatabaseManager
-import logging
 
 # إعداد الـ Logging
 logging.basicConfig(level=logging.INFO)
 
+# مراحل بدء التشغيل: (المرحلة، الزمن منذ بدء البرنامج بالمللي ثانية)
+startup_timings = []
+
+
+def mark_startup(stage):
+    """تسجيل زمن الوصول إلى مرحلة من مراحل بدء التشغيل"""
+    startup_timings.append((stage, (time.perf_counter() - _started) * 1000))
+
+
+def startup_report():
+    """تقرير نصي بمراحل بدء التشغيل وزمن كل مرحلة"""
+    lines = ["Startup timing:"]
+    previous = 0.0
+    for stage, elapsed in startup_timings:
+        lines.append(f"  {stage:<24} +{elapsed - previous:8.1f} ms  (at {elapsed:8.1f} ms)")
+        previous = elapsed
+    return "\n".join(lines)
+
+
+mark_startup("imports")
+
+# اتصال مركزي واحد بقاعدة البيانات تتشاركه جميع الجلسات:
+# اتصال كتابة وحيد واتصالات قراءة لكل خيط
+# عمليات spawn (كشوف المشتركين) تستورد هذا الملف من جديد، فالاتصال والنافذة للعملية الرئيسية فقط
+if __name__ == "__main__":
+    db = DatabaseManager()
+    mark_startup("database")
+
+# سجل الصفحات: الاسم -> (الوحدة، الصنف). الصفحة تُستورد وتُنشأ عند أول انتقال إليها فقط
+PAGE_REGISTRY = {
+    "main_page": ("pages.main_page", "MainPage"),
+    "input_page": ("pages.input_page", "InputPage"),
+    "view_page": ("pages.view_page", "ViewPage"),
+    "input_subscribers": ("pages.input_subscribers", "InputSubscribersPage"),
+    "input_purchases": ("pages.input_purchases", "InputPurchasesPage"),
+    "show_subscribers": ("pages.show_subscribers", "ShowSubscribersPage"),
+    "show_purchases": ("pages.show_purchases", "ShowPurchasesPage"),
+    "show_over": ("pages.show_over", "ShowOverPage"),
+    "distribute_expenses": ("pages.distribute_expenses", "DistributeExpensesPage"),
+    "drink_page": ("pages.drink_page", "DrinkPage"),
+    "reports_page": ("pages.reports_page", "ReportsPage"),
+    "end_month_page": ("pages.end_month_page", "EndMonthPage"),
+    "meal_page": ("pages.meal_page", "MealPage"),
+    "search_page": ("pages.search_page", "SearchPage"),
+}
+
+
+class PageCache:
+    """إنشاء الصفحات عند الطلب والاحتفاظ بشجرة عناصر كل صفحة بين الزيارات.
+
+    كل صفحة تُبنى مرة واحدة داخل حاوية الجذر، والتنقل يخفي الصفحة الحالية
+    ويُظهر المطلوبة، فلا يُعاد إرسال شجرة العناصر كاملة. عند الرجوع لصفحة
+    مبنية تُستدعى refresh() إن وُجدت لتحديث الأجزاء المرتبطة بالبيانات فقط.
+    """
+
+    def __init__(self, page, background_image, db, root):
+        self.page = page
+        self.background_image = background_image
+        self.db = db
+        self.root = root
+        self.current = None
+        self._pages = {}
+        self._views = {}
+        # البناء المسبق يعمل في خيط آخر بالتوازي مع التنقل
+        self._lock = threading.RLock()
+
+    def __contains__(self, page_name):
+        return page_name in PAGE_REGISTRY
+
+    def __getitem__(self, page_name):
+        with self._lock:
+            instance = self._pages.get(page_name)
+            if instance is None:
+                started = time.perf_counter()
+                module_name, class_name = PAGE_REGISTRY[page_name]
+                page_class = getattr(importlib.import_module(module_name), class_name)
+                instance = page_class(self.page, self.background_image, self.db)
+                instance.set_navigate(self.navigate)
+                self._pages[page_name] = instance
+                logging.info(f"Page {page_name} created in {(time.perf_counter() - started) * 1000:.1f} ms")
+            return instance
+
+    def _view(self, page_name):
+        """حاوية الصفحة؛ تُبنى مرة واحدة وتبقى في الجذر مخفية. يعيد (الحاوية، هل بُنيت الآن)"""
+        with self._lock:
+            view = self._views.get(page_name)
+            if view is not None:
+                return view, False
+            view = ft.Container(content=self[page_name].get_content(), expand=True, visible=False)
+            self._views[page_name] = view
+            self.root.controls.append(view)
+            return view, True
+
+    def navigate(self, page_name):
+        """التنقل بين الصفحات بتبديل الظهور"""
+        if page_name not in self:
+            return
+        with self._lock:
+            view, created = self._view(page_name)
+            if not created:
+                refresh = getattr(self[page_name], "refresh", None)
+                if refresh:
+                    refresh()
+            if self.current is not None and self.current is not view:
+                self.current.visible = False
+            view.visible = True
+            self.current = view
+            self.page.update()
+
+    def prewarm(self):
+        """بناء الصفحات غير المفتوحة في الخلفية بعد ظهور الشاشة الأولى"""
+        started = time.perf_counter()
+        built = 0
+        for page_name in PAGE_REGISTRY:
+            try:
+                built += self._view(page_name)[1]
+            except Exception as e:
+                logging.warning(f"Could not prewarm page {page_name}: {e}")
+        if built:
+            with self._lock:
+                self.page.update()
+        logging.info(f"Prewarmed {built} pages in {(time.perf_counter() - started) * 1000:.1f} ms")
+
+
 def main(page: ft.Page):
     # إعدادات الصفحة
     page.title = "برنامج توزيع المصاريات"
@@ -30,19 +149,9 @@ def main(page: ft.Page):
     page.window.height = 600
     page.window.resizable = True
 
-    # حساب موقع النافذة لفتحها في منتصف الشاشة
+    # فتح النافذة في منتصف الشاشة (يحسبه Flet بدون الاستعلام عن الشاشات)
     try:
-        monitors = get_monitors()
-        if monitors:
-            primary_monitor = monitors[0]
-            screen_width = primary_monitor.width
-            screen_height = primary_monitor.height
-
-            window_left = (screen_width - 800) // 2
-            window_top = (screen_height - 600) // 2
-
-            page.window.left = window_left
-            page.window.top = window_top
+        page.window.center()
     except Exception as e:
         print(f"حدث خطأ أثناء تعيين موقع النافذة: {e}")
 
@@ -55,45 +164,29 @@ def main(page: ft.Page):
     # تحميل الخلفية مرة واحدة
     background_image = ft.Image(src="3.jpg", fit=ft.ImageFit.COVER, expand=True)
     
-    # إنشاء اتصال مركزي بقاعدة البيانات
-    db = DatabaseManager()
-    
-    # --- إغلاق الاتصال عند إغلاق النافذة ---
-    def on_window_close(e):
-        if e.data == "close":
-            db.close_connection()
-            page.window.destroy()
-    page.window.on_close = on_window_close
-
-    # إنشاء الصفحات مع تمرير الاتصال المركزي
-    pages = {
-        "main_page": MainPage(page, background_image, db),
-        "input_page": InputPage(page, background_image, db),
-        "view_page": ViewPage(page, background_image, db),
-        "input_subscribers": InputSubscribersPage(page, background_image, db),
-        "input_purchases": InputPurchasesPage(page, background_image, db),
-        "show_subscribers": ShowSubscribersPage(page, background_image, db),
-        "show_purchases": ShowPurchasesPage(page, background_image, db),
-        "show_over": ShowOverPage(page, background_image, db),
-        "distribute_expenses": DistributeExpensesPage(page, background_image, db),
-        "drink_page": DrinkPage(page, background_image, db),
-        "reports_page": ReportsPage(page, background_image, db),
-        "end_month_page": EndMonthPage(page, background_image, db),
-        "meal_page": MealPage(page, background_image, db)
-    }
+    # الصفحات تُنشأ عند أول انتقال إليها وتبقى داخل حاوية الجذر
+    root = ft.Column(expand=True, spacing=0)
+    page.add(root)
+    pages = PageCache(page, background_image, db, root)
 
     # تعيين الصفحة الرئيسية
-    page.add(pages["main_page"].get_content())
+    pages.navigate("main_page")
+    mark_startup("first paint")
+    logging.info(startup_report())
 
-    # وظيفة للتنقل بين الصفحات
-    def navigate(page_name):
-        page.clean()
-        if page_name in pages:
-            page.add(pages[page_name].get_content())
-        page.update()
+    # تجهيز بقية الصفحات في الخلفية
+    threading.Thread(target=pages.prewarm, daemon=True).start()
 
-    # تمرير دالة التنقل إلى الصفحات
-    for page_instance in pages.values():
-        page_instance.set_navigate(navigate)
-
-ft.app(target=main)
\ No newline at end of file
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    try:
+        ft.app(target=main)
+    finally:
+        # استخدام التقارير المحفوظة المجمع في الذاكرة يُكتب قبل الإغلاق حتى لا يضيع
+        try:
+            from services import report_cache
+            report_cache.flush_touches(db)
+        except Exception as e:
+            logging.error(f"Could not save report cache usage: {e}")
+        # مدير قاعدة البيانات مشترك بين كل الجلسات، فيُغلق مرة واحدة عند انتهاء البرنامج
+        db.close_connection()
@@ -0,0 +1,606 @@
+import logging
+
+from utils.arabic import fold_sql
+
+# سجل الترحيلات: (رقم الإصدار، الوصف، الدالة) مرتبة تصاعديًا.
+# رقم الإصدار الحالي لقاعدة البيانات محفوظ في PRAGMA user_version
+MIGRATIONS = []
+
+
+def migration(version, description):
+    """تسجيل دالة ترحيل بإصدار محدد"""
+    def register(step):
+        if MIGRATIONS and version <= MIGRATIONS[-1][0]:
+            raise ValueError(f"Migration {version} registered out of order")
+        MIGRATIONS.append((version, description, step))
+        return step
+    return register
+
+
+def latest_version():
+    """أحدث إصدار مسجل للمخطط"""
+    return MIGRATIONS[-1][0] if MIGRATIONS else 0
+
+
+def migrate(conn):
+    """تنفيذ الترحيلات المعلقة فقط، كل ترحيل داخل معاملة واحدة.
+
+    الاتصال يجب أن يكون في وضع autocommit (isolation_level=None).
+    يعيد رقم إصدار المخطط بعد التنفيذ.
+    """
+    current = conn.execute("PRAGMA user_version").fetchone()[0]
+    if current >= latest_version():
+        return current
+    for version, description, step in MIGRATIONS:
+        if version <= current:
+            continue
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            step(conn.cursor())
+            conn.execute(f"PRAGMA user_version = {version}")
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        logging.info(f"Applied schema migration {version}: {description}")
+        current = version
+    return current
+
+
+def _columns(cursor, table):
+    cursor.execute(f"PRAGMA table_info({table})")
+    return {col[1] for col in cursor.fetchall()}
+
+
+@migration(1, "initial schema")
+def _initial_schema(cursor):
+    """إنشاء الجداول الأساسية وجداول الأرشيف.
+
+    قواعد البيانات التي أنشئت قبل ترقيم الإصدارات قد تفتقد بعض الأعمدة،
+    لذلك نضيفها هنا مرة واحدة فقط.
+    """
+    # جدول المصاريف
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS expenses (
+            expense_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            item_name TEXT,
+            quantity INTEGER,
+            price REAL,
+            total_price REAL,
+            consumption INTEGER DEFAULT 0,
+            remaining INTEGER DEFAULT 0,
+            is_miscellaneous INTEGER DEFAULT 0,
+            is_drink INTEGER DEFAULT 0,
+            date TEXT
+        )
+    """)
+
+    # جدول المشتركين
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS members (
+            member_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT,
+            rank TEXT,
+            contribution REAL,
+            total_due REAL DEFAULT 0,
+            date TEXT
+        )
+    """)
+
+    # جدول سجلات الوجبات
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS meal_records (
+            meal_record_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            meal_type TEXT,
+            date TEXT,
+            member_id INTEGER,
+            final_cost REAL,
+            FOREIGN KEY (member_id) REFERENCES members(member_id)
+        )
+    """)
+
+    # جدول سجلات المشروبات
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS drink_records (
+            drink_record_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            date TEXT,
+            drink_name TEXT,
+            member_id INTEGER,
+            quantity INTEGER,
+            total_cost REAL,
+            FOREIGN KEY (member_id) REFERENCES members(member_id)
+        )
+    """)
+
+    # جدول المصاريف النثرية العام
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS miscellaneous_expenses (
+            misc_expense_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            date TEXT,
+            amount REAL,
+            meal_type TEXT,
+            meal_record_id INTEGER,
+            member_id INTEGER,
+            FOREIGN KEY (meal_record_id) REFERENCES meal_records(meal_record_id),
+            FOREIGN KEY (member_id) REFERENCES members(member_id)
+        )
+    """)
+
+    # جدول النثريات الخاص بالمشتركين
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS miscellaneous_contributions (
+            misc_contribution_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            member_id INTEGER,
+            misc_amount REAL,
+            meal_count INTEGER DEFAULT 0,
+            distribution_date TEXT,
+            FOREIGN KEY (member_id) REFERENCES members(member_id)
+        )
+    """)
+
+    # جدول مفاتيح الأرشيف
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS archive_keys (
+            archive_key_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            archive_name TEXT,
+            start_date TEXT,
+            end_date TEXT,
+            archived_at TEXT
+        )
+    """)
+
+    # جداول الأرشيف
+    # أرشيف المصاريف
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS expenses_archive (
+            expense_id INTEGER,
+            item_name TEXT,
+            quantity INTEGER,
+            price REAL,
+            total_price REAL,
+            consumption INTEGER DEFAULT 0,
+            remaining INTEGER DEFAULT 0,
+            is_miscellaneous INTEGER DEFAULT 0,
+            is_drink INTEGER DEFAULT 0,
+            date TEXT,
+            archive_key_id INTEGER,
+            PRIMARY KEY (expense_id, archive_key_id),
+            FOREIGN KEY (archive_key_id) REFERENCES archive_keys(archive_key_id)
+        )
+    """)
+
+    # أرشيف المشتركين
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS members_archive (
+            member_id INTEGER,
+            name TEXT,
+            rank TEXT,
+            contribution REAL,
+            total_due REAL,
+            date TEXT,
+            archive_key_id INTEGER,
+            PRIMARY KEY (member_id, archive_key_id),
+            FOREIGN KEY (archive_key_id) REFERENCES archive_keys(archive_key_id)
+        )
+    """)
+
+    # أرشيف سجلات الوجبات
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS meal_records_archive (
+            meal_record_id INTEGER,
+            meal_type TEXT,
+            date TEXT,
+            member_id INTEGER,
+            final_cost REAL,
+            archive_key_id INTEGER,
+            PRIMARY KEY (meal_record_id, archive_key_id),
+            FOREIGN KEY (archive_key_id) REFERENCES archive_keys(archive_key_id)
+        )
+    """)
+
+    # أرشيف سجلات المشروبات
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS drink_records_archive (
+            drink_record_id INTEGER,
+            date TEXT,
+            drink_name TEXT,
+            member_id INTEGER,
+            quantity INTEGER,
+            total_cost REAL,
+            archive_key_id INTEGER,
+            PRIMARY KEY (drink_record_id, archive_key_id),
+            FOREIGN KEY (archive_key_id) REFERENCES archive_keys(archive_key_id)
+        )
+    """)
+
+    # أرشيف المصاريف النثرية
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS miscellaneous_expenses_archive (
+            misc_expense_id INTEGER,
+            date TEXT,
+            amount REAL,
+            meal_type TEXT,
+            meal_record_id INTEGER,
+            archive_key_id INTEGER,
+            PRIMARY KEY (misc_expense_id, archive_key_id),
+            FOREIGN KEY (archive_key_id) REFERENCES archive_keys(archive_key_id)
+        )
+    """)
+
+    # أرشيف توزيعات النثريات
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS miscellaneous_contributions_archive (
+            misc_contribution_id INTEGER,
+            member_id INTEGER,
+            misc_amount REAL,
+            meal_count INTEGER,
+            distribution_date TEXT,
+            archive_key_id INTEGER,
+            PRIMARY KEY (misc_contribution_id, archive_key_id),
+            FOREIGN KEY (archive_key_id) REFERENCES archive_keys(archive_key_id)
+        )
+    """)
+
+    # أعمدة أضيفت لاحقًا إلى جدول miscellaneous_expenses
+    cols = _columns(cursor, "miscellaneous_expenses")
+    if "meal_record_id" not in cols:
+        cursor.execute("ALTER TABLE miscellaneous_expenses ADD COLUMN meal_record_id INTEGER")
+    if "member_id" not in cols:
+        cursor.execute("ALTER TABLE miscellaneous_expenses ADD COLUMN member_id INTEGER REFERENCES members(member_id)")
+
+    # أعمدة أضيفت لاحقًا إلى جدول miscellaneous_contributions
+    cols = _columns(cursor, "miscellaneous_contributions")
+    if "meal_count" not in cols:
+        cursor.execute("ALTER TABLE miscellaneous_contributions ADD COLUMN meal_count INTEGER DEFAULT 0")
+    if "distribution_date" not in cols:
+        cursor.execute("ALTER TABLE miscellaneous_contributions ADD COLUMN distribution_date TEXT")
+
+
+@migration(2, "indexes for hot lookup paths")
+def _hot_path_indexes(cursor):
+    """فهارس لمسارات البحث والربط المتكررة في صفحات الوجبات والمشروبات والتقارير والتقفيل"""
+    statements = [
+        # المصاريف: البحث بالاسم وتصفية المشروبات/النثريات
+        "CREATE INDEX IF NOT EXISTS idx_expenses_item_name ON expenses(item_name)",
+        "CREATE INDEX IF NOT EXISTS idx_expenses_kind ON expenses(is_drink, is_miscellaneous)",
+        "CREATE INDEX IF NOT EXISTS idx_expenses_date ON expenses(date)",
+        # المشتركين: البحث بالاسم
+        "CREATE INDEX IF NOT EXISTS idx_members_name ON members(name)",
+        # سجلات الوجبات والمشروبات
+        "CREATE INDEX IF NOT EXISTS idx_meal_records_member ON meal_records(member_id)",
+        "CREATE INDEX IF NOT EXISTS idx_meal_records_date ON meal_records(date)",
+        "CREATE INDEX IF NOT EXISTS idx_drink_records_member ON drink_records(member_id)",
+        "CREATE INDEX IF NOT EXISTS idx_drink_records_date ON drink_records(date)",
+        # النثريات
+        "CREATE INDEX IF NOT EXISTS idx_misc_expenses_member ON miscellaneous_expenses(member_id)",
+        "CREATE INDEX IF NOT EXISTS idx_misc_expenses_meal_record ON miscellaneous_expenses(meal_record_id)",
+        "CREATE INDEX IF NOT EXISTS idx_misc_contributions_member ON miscellaneous_contributions(member_id)",
+        "CREATE INDEX IF NOT EXISTS idx_misc_contributions_date ON miscellaneous_contributions(distribution_date)",
+        # الأرشيف: التصفية بمفتاح الأرشيف
+        "CREATE INDEX IF NOT EXISTS idx_archive_keys_period ON archive_keys(start_date, end_date)",
+        "CREATE INDEX IF NOT EXISTS idx_expenses_archive_key ON expenses_archive(archive_key_id)",
+        "CREATE INDEX IF NOT EXISTS idx_members_archive_key ON members_archive(archive_key_id)",
+        "CREATE INDEX IF NOT EXISTS idx_meal_records_archive_key ON meal_records_archive(archive_key_id, member_id)",
+        "CREATE INDEX IF NOT EXISTS idx_drink_records_archive_key ON drink_records_archive(archive_key_id, member_id)",
+        "CREATE INDEX IF NOT EXISTS idx_misc_expenses_archive_key ON miscellaneous_expenses_archive(archive_key_id)",
+        "CREATE INDEX IF NOT EXISTS idx_misc_contributions_archive_key ON miscellaneous_contributions_archive(archive_key_id)",
+    ]
+    for statement in statements:
+        cursor.execute(statement)
+
+
+# جداول الحقائق التي تُوسم بالفترة المحاسبية
+PERIOD_TAGGED_TABLES = {
+    "meal_records": "meal_record_id",
+    "drink_records": "drink_record_id",
+    "miscellaneous_expenses": "misc_expense_id",
+    "miscellaneous_contributions": "misc_contribution_id",
+}
+
+
+@migration(3, "period-tagged fact tables")
+def _periods(cursor):
+    """جدول الفترات ووسم السجلات بالفترة، بحيث يصبح تقفيل الشهر مجرد إغلاق للفترة.
+
+    الفترات المؤرشفة سابقًا (archive_keys) تتحول إلى فترات مغلقة، وتبقى
+    بياناتها القديمة في جداول *_archive. السجلات الحية تُنسب للفترة
+    المفتوحة، والنثريات القديمة تُنسب لفترتها حسب أرشيفها.
+    """
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS periods (
+            period_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            start_date TEXT,
+            end_date TEXT,
+            closed_at TEXT,
+            archive_key_id INTEGER,
+            FOREIGN KEY (archive_key_id) REFERENCES archive_keys(archive_key_id)
+        )
+    """)
+    # فترة مفتوحة واحدة فقط في أي وقت
+    cursor.execute(
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_periods_single_open "
+        "ON periods(IFNULL(closed_at, 'open')) WHERE closed_at IS NULL"
+    )
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_periods_archive_key ON periods(archive_key_id)")
+
+    # الفترات المؤرشفة سابقًا
+    cursor.execute("""
+        INSERT INTO periods (start_date, end_date, closed_at, archive_key_id)
+        SELECT start_date, end_date, COALESCE(archived_at, end_date), archive_key_id
+        FROM archive_keys
+        ORDER BY archive_key_id
+    """)
+
+    # الفترة المفتوحة الحالية تبدأ من أقدم سجل حي
+    cursor.execute("""
+        INSERT INTO periods (start_date)
+        SELECT COALESCE(MIN(d), DATE('now', 'localtime')) FROM (
+            SELECT MIN(date) AS d FROM meal_records
+            UNION ALL SELECT MIN(date) FROM drink_records
+        )
+    """)
+    open_period_id = cursor.lastrowid
+
+    for table, key in PERIOD_TAGGED_TABLES.items():
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN period_id INTEGER REFERENCES periods(period_id)")
+
+    cursor.execute("UPDATE meal_records SET period_id = ?", (open_period_id,))
+    cursor.execute("UPDATE drink_records SET period_id = ?", (open_period_id,))
+    # النثريات المرتبطة بوجبات مؤرشفة تتبع فترة تلك الوجبات
+    cursor.execute("""
+        UPDATE miscellaneous_expenses
+        SET period_id = COALESCE(
+            (SELECT p.period_id
+             FROM meal_records_archive a
+             JOIN periods p ON p.archive_key_id = a.archive_key_id
+             WHERE a.meal_record_id = miscellaneous_expenses.meal_record_id
+               AND NOT EXISTS (SELECT 1 FROM meal_records mr
+                               WHERE mr.meal_record_id = miscellaneous_expenses.meal_record_id)
+             ORDER BY p.period_id DESC
+             LIMIT 1),
+            ?)
+    """, (open_period_id,))
+    cursor.execute("""
+        UPDATE miscellaneous_contributions
+        SET period_id = COALESCE(
+            (SELECT p.period_id
+             FROM miscellaneous_contributions_archive a
+             JOIN periods p ON p.archive_key_id = a.archive_key_id
+             WHERE a.misc_contribution_id = miscellaneous_contributions.misc_contribution_id
+             ORDER BY p.period_id DESC
+             LIMIT 1),
+            ?)
+    """, (open_period_id,))
+
+    for table, key in PERIOD_TAGGED_TABLES.items():
+        # السجلات الجديدة تُنسب تلقائيًا للفترة المفتوحة
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_{table}_period
+            AFTER INSERT ON {table}
+            WHEN NEW.period_id IS NULL
+            BEGIN
+                UPDATE {table}
+                SET period_id = (SELECT period_id FROM periods WHERE closed_at IS NULL)
+                WHERE {key} = NEW.{key};
+            END
+        """)
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_period_member ON {table}(period_id, member_id)")
+
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_meal_records_period_date ON meal_records(period_id, date)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_drink_records_period_date ON drink_records(period_id, date)")
+
+
+@migration(4, "month close checkpoints")
+def _month_close_checkpoints(cursor):
+    """جداول تتبع تقفيل الشهر: تشغيل لكل تقفيل ونقطة حفظ لكل مرحلة منه"""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS month_close_runs (
+            run_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            period_id INTEGER NOT NULL,
+            archive_key_id INTEGER,
+            status TEXT NOT NULL DEFAULT 'running',
+            started_at TEXT,
+            finished_at TEXT,
+            FOREIGN KEY (period_id) REFERENCES periods(period_id),
+            FOREIGN KEY (archive_key_id) REFERENCES archive_keys(archive_key_id)
+        )
+    """)
+    # تقفيل واحد فقط قيد التنفيذ في أي وقت
+    cursor.execute(
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_month_close_runs_running "
+        "ON month_close_runs(status) WHERE status = 'running'"
+    )
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS month_close_stages (
+            run_id INTEGER NOT NULL,
+            stage TEXT NOT NULL,
+            completed_at TEXT,
+            duration_ms REAL,
+            detail TEXT,
+            PRIMARY KEY (run_id, stage),
+            FOREIGN KEY (run_id) REFERENCES month_close_runs(run_id)
+        )
+    """)
+
+
+@migration(5, "sort and filter indexes for show tables")
+def _show_table_indexes(cursor):
+    """فهارس الترتيب والتصفية في صفحات العرض.
+
+    صفحات الأصناف والنثريات تعرض جزءًا واحدًا من expenses حسب
+    is_miscellaneous، لذلك كل فهرس ترتيب يبدأ به حتى يُقرأ الجزء
+    مرتبًا مباشرة ويتوقف الاستعلام عند LIMIT بدون فرز مؤقت.
+    """
+    for column in ("item_name", "quantity", "price", "total_price", "date"):
+        cursor.execute(
+            f"CREATE INDEX IF NOT EXISTS idx_expenses_misc_{column} ON expenses(is_miscellaneous, {column})"
+        )
+    # (rank, name) للترتيب بالرتبة وللتصفية بالرتبة مع الترتيب بالاسم
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_members_rank_name ON members(rank, name)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_members_contribution ON members(contribution)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_members_total_due ON members(total_due)")
+
+
+
+# الجداول التي تُبنى منها فهارس البحث السريع في الذاكرة: (الجدول، عمود الاسم)
+NAME_SOURCES = {
+    "members": "name",
+    "expenses": "item_name",
+}
+
+
+@migration(6, "name change log for typeahead indexes")
+def _name_changes(cursor):
+    """سجل تغييرات الأسماء تكتبه المشغلات عند أي إضافة أو حذف أو تعديل للاسم.
+
+    فهرس البحث في الذاكرة يقرأ قبل كل بحث التغييرات التي تلي آخر تغيير
+    طبقه (قراءة بالفهرس) ويحدّث الصفوف المتغيرة فقط، أيًا كان مصدر الكتابة.
+    """
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS name_changes (
+            change_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            source TEXT NOT NULL,
+            row_id INTEGER NOT NULL
+        )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_name_changes_source ON name_changes(source, change_id)")
+    for table, column in NAME_SOURCES.items():
+        log = "INSERT INTO name_changes (source, row_id) VALUES ('{table}', {row}.rowid);"
+        cursor.execute(
+            f"CREATE TRIGGER IF NOT EXISTS trg_{table}_names_insert AFTER INSERT ON {table} "
+            f"BEGIN {log.format(table=table, row='NEW')} END"
+        )
+        cursor.execute(
+            f"CREATE TRIGGER IF NOT EXISTS trg_{table}_names_delete AFTER DELETE ON {table} "
+            f"BEGIN {log.format(table=table, row='OLD')} END"
+        )
+        cursor.execute(
+            f"CREATE TRIGGER IF NOT EXISTS trg_{table}_names_update AFTER UPDATE OF {column} ON {table} "
+            f"WHEN OLD.{column} IS NOT NEW.{column} BEGIN {log.format(table=table, row='NEW')} END"
+        )
+
+
+# مصادر فهرس البحث الشامل: الجدول -> (النوع، رمز المصدر، عمود المعرف، عمود مفتاح الأرشيف، عمود الاسم، عمود الرتبة)
+SEARCH_SOURCES = {
+    "members": ("member", 0, "member_id", None, "name", "rank"),
+    "members_archive": ("member", 1, "member_id", "archive_key_id", "name", "rank"),
+    "expenses": ("item", 2, "expense_id", None, "item_name", None),
+    "expenses_archive": ("item", 3, "expense_id", "archive_key_id", "item_name", None),
+}
+
+
+def search_rowid(source, row):
+    """rowid ثابت في search_index لصف المصدر: (مفتاح الأرشيف، المعرف، رمز المصدر).
+
+    الجداول المؤرشفة تُكتب بـ INSERT OR REPLACE الذي لا يطلق مشغل الحذف،
+    فالـ rowid مشتق من المفتاح المنطقي حتى يستبدل الإدراج الجديد القديم.
+    """
+    _, code, id_column, archive_column, _, _ = SEARCH_SOURCES[source]
+    archive = f"COALESCE({row}.{archive_column}, 0)" if archive_column else "0"
+    return f"((({archive}) << 32) + {row}.{id_column}) * 4 + {code}"
+
+
+def _search_values(source, row):
+    kind, _, id_column, archive_column, name_column, rank_column = SEARCH_SOURCES[source]
+    rank = f"{row}.{rank_column}" if rank_column else "NULL"
+    label = f"TRIM(COALESCE({rank}, '') || ' ' || COALESCE({row}.{name_column}, ''))"
+    archive = f"{row}.{archive_column}" if archive_column else "NULL"
+    return (
+        f"{search_rowid(source, row)}, {fold_sql(f'{row}.{name_column}')}, {fold_sql(rank)}, "
+        f"{label}, '{kind}', {row}.{id_column}, {archive}, {row}.date"
+    )
+
+
+@migration(7, "global full-text search index")
+def _global_search(cursor):
+    """فهرس FTS5 لأسماء الأصناف والمشتركين ورتبهم في الجداول الحية والمؤرشفة.
+
+    الأسماء تُخزن بعد fold (توحيد الحروف وحذف الحركات) لأن مقسم unicode61
+    يعامل الحركات العربية كفواصل. المشغلات تبقي الفهرس متزامنًا مع كل
+    إضافة وتعديل وحذف، والأعمدة غير المفهرسة تحفظ ما يلزم لتجميع النتائج
+    حسب الفترة بدون الرجوع للجداول.
+    """
+    cursor.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5(
+            name, member_rank,
+            label UNINDEXED, kind UNINDEXED, ref_id UNINDEXED,
+            archive_key_id UNINDEXED, date UNINDEXED,
+            tokenize = 'unicode61 remove_diacritics 2',
+            prefix = '2 3'
+        )
+    """)
+    columns = "rowid, name, member_rank, label, kind, ref_id, archive_key_id, date"
+    for source, (_, _, id_column, archive_column, name_column, rank_column) in SEARCH_SOURCES.items():
+        upsert = f"INSERT OR REPLACE INTO search_index ({columns}) VALUES ({_search_values(source, 'NEW')});"
+        delete = f"DELETE FROM search_index WHERE rowid = {search_rowid(source, 'OLD')};"
+        watched = ", ".join(c for c in (id_column, archive_column, name_column, rank_column, "date") if c)
+        cursor.execute(f"CREATE TRIGGER IF NOT EXISTS trg_{source}_search_insert AFTER INSERT ON {source} BEGIN {upsert} END")
+        cursor.execute(f"CREATE TRIGGER IF NOT EXISTS trg_{source}_search_delete AFTER DELETE ON {source} BEGIN {delete} END")
+        cursor.execute(
+            f"CREATE TRIGGER IF NOT EXISTS trg_{source}_search_update AFTER UPDATE OF {watched} ON {source} "
+            f"BEGIN {delete} {upsert} END"
+        )
+        cursor.execute(
+            f"INSERT OR REPLACE INTO search_index ({columns}) SELECT {_search_values(source, source)} FROM {source}"
+        )
+
+    # نشاط المشترك في كل فترة من الفهرس وحده؛ (member_id, period_id) يغني عن فهرس member_id
+    for table in ("meal_records", "drink_records"):
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_member_period ON {table}(member_id, period_id)")
+        cursor.execute(f"DROP INDEX IF EXISTS idx_{table}_member")
+    # وفي الأرشيف القديم (فهارسه الحالية تبدأ بمفتاح الأرشيف)
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_meal_records_archive_member ON meal_records_archive(member_id, archive_key_id)"
+    )
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_drink_records_archive_member ON drink_records_archive(member_id, archive_key_id)"
+    )
+
+
+@migration(8, "reference data change log")
+def _reference_changes(cursor):
+    """تسجيل تعديل الأعمدة المرجعية في name_changes أيضًا.
+
+    الإضافة والحذف وتعديل الاسم مسجلة من الترحيل 6، فيصبح السجل سجلًا
+    لكل تغيير في صفوف members و expenses يحتاجه مخزن البيانات المرجعية،
+    وفهرس الأسماء يعيد قراءة هذه الصفوف فقط دون أثر على نتائجه. المتبقي
+    (remaining) ليس منها لأنه يتغير مع كل بيع.
+    """
+    # الأعمدة الأخرى (غير الاسم) التي يحفظها مخزن البيانات المرجعية: الجدول -> الأعمدة
+    columns_by_table = {
+        "members": ("rank",),
+        "expenses": ("price", "is_drink", "is_miscellaneous"),
+    }
+    for table, columns in columns_by_table.items():
+        changed = " OR ".join(f"OLD.{column} IS NOT NEW.{column}" for column in columns)
+        cursor.execute(
+            f"CREATE TRIGGER IF NOT EXISTS trg_{table}_reference_update AFTER UPDATE OF {', '.join(columns)} ON {table} "
+            f"WHEN {changed} BEGIN INSERT INTO name_changes (source, row_id) VALUES ('{table}', NEW.rowid); END"
+        )
+
+
+@migration(9, "rendered report cache catalog")
+def _report_cache(cursor):
+    """فهرس التقارير المرسومة للفترات المغلقة (services/report_cache).
+
+    صف لكل (نوع التقرير، مفتاح الأرشيف) يشير إلى ملف مسمى ببصمة محتواه،
+    فالتقارير المتطابقة تتشارك ملفًا واحدًا. last_used_at يحدد ترتيب
+    الحذف عند تجاوز حجم الذاكرة.
+    """
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS report_cache (
+            report_type TEXT NOT NULL,
+            archive_key_id INTEGER NOT NULL,
+            render_version INTEGER NOT NULL,
+            content_hash TEXT NOT NULL,
+            file_name TEXT NOT NULL,
+            size_bytes INTEGER NOT NULL,
+            created_at TEXT NOT NULL,
+            last_used_at TEXT NOT NULL,
+            hits INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (report_type, archive_key_id),
+            FOREIGN KEY (archive_key_id) REFERENCES archive_keys(archive_key_id)
+        )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_report_cache_last_used ON report_cache(last_used_at)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_report_cache_content ON report_cache(content_hash)")
@@ -2,6 +2,9 @@ import flet as ft
 from datetime import datetime
 import logging
 
+from database import OPEN_PERIOD_SQL
+from migrations import PERIOD_TAGGED_TABLES
+
 class ClearData:
     def __init__(self, page, db):
         self.page = page
@@ -73,10 +76,15 @@ class ClearData:
                 self.show_snackbar("لم يتم اختيار أي جداول!")
                 return
 
-            with self.db.conn:
-                cursor = self.db.conn.cursor()
+            def clear_tables(cursor):
                 for table in tables:
-                    cursor.execute(f"DELETE FROM {table}")
+                    if table in PERIOD_TAGGED_TABLES:
+                        # سجلات الفترات المغلقة هي الأرشيف، فلا يُمسح إلا سجل الفترة المفتوحة
+                        cursor.execute(f"DELETE FROM {table} WHERE period_id = {OPEN_PERIOD_SQL}")
+                    else:
+                        cursor.execute(f"DELETE FROM {table}")
+
+            self.db.write(clear_tables)
 
             self.show_snackbar("تم المسح بنجاح!")
             # إذا كان هناك نقل إلى صفحة معينة بعد المسح:
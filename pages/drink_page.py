@@ -1,5 +1,6 @@
 import flet as ft
-from database import DatabaseManager
+from database import DatabaseManager, InsufficientStockError
+from services import drinks, meals, reference
 from utils.button_utils import create_button
 from datetime import datetime
 import sqlite3
@@ -13,13 +14,11 @@ class DrinkPage:
         self.selected_row = None
         self.selected_item_id = None
         self.selected_row_control = None
-        self.page.on_close = self.close_connection
 
     def set_navigate(self, navigate):
         self.navigate = navigate
 
     def get_content(self):
-        self.page.clean()
         title = ft.Text(
             "توزيع المشروبات",
             size=40,
@@ -55,6 +54,8 @@ class DrinkPage:
             bgcolor=ft.colors.WHITE,
             label_style=ft.TextStyle(size=18, weight=ft.FontWeight.BOLD),
         )
+        # القوائم تتحدث فور إضافة مشترك أو مشروب من أي جلسة
+        reference.subscribe(self.db, self.page, self.on_reference_change)
         btn_save = create_button("حفظ", lambda e: self.save_drink_distribution(e), bgcolor=ft.colors.GREEN)
         btn_back = create_button("رجوع", lambda e: self.navigate("distribute_expenses"), bgcolor=ft.colors.RED)
         content = ft.Column(
@@ -71,15 +72,27 @@ class DrinkPage:
         )
         return container
 
+    def refresh(self):
+        """إعادة تحميل قوائم المشروبات والأعضاء فقط عند الرجوع للصفحة"""
+        self.drink_var.options = self.get_drink_options()
+        self.member_var.options = self.get_member_options()
+        self.reset_fields()
+
+    def on_reference_change(self, topic, change):
+        """تحديث القائمة المتأثرة من مخزن البيانات المرجعية دون استعلام"""
+        if change.source == "members":
+            dropdown, options = self.member_var, self.get_member_options()
+        else:
+            dropdown, options = self.drink_var, self.get_drink_options()
+        dropdown.options = options
+        if dropdown.page:
+            dropdown.update()
+
     def get_drink_options(self):
-        cursor = self.db.conn.cursor()
-        cursor.execute("SELECT item_name FROM expenses WHERE is_drink = 1")
-        return [ft.dropdown.Option(row[0]) for row in cursor.fetchall()]
+        return [ft.dropdown.Option(name) for name in drinks.drink_names(self.db)]
 
     def get_member_options(self):
-        cursor = self.db.conn.cursor()
-        cursor.execute("SELECT member_id, rank || ' ' || name FROM members")
-        return [ft.dropdown.Option(f"{row[0]} - {row[1]}") for row in cursor.fetchall()]
+        return [ft.dropdown.Option(f"{member_id} - {label}") for member_id, label in meals.member_options(self.db)]
 
     ### دالة جديدة لإعادة تعيين الحقول ###
     def reset_fields(self):
@@ -96,30 +109,17 @@ class DrinkPage:
         date = self.date_var.value
 
         if drink_name and quantity > 0 and member_info and date:
-            try:
-                cursor = self.db.conn.cursor()
-                member_id = member_info.split(" - ")[0]
-                cursor.execute("SELECT price, quantity, consumption FROM expenses WHERE item_name = ? AND is_drink = 1", (drink_name,))
-                price_data = cursor.fetchone()
+            member_id = member_info.split(" - ")[0]
 
-                if price_data:
-                    unit_price, available_quantity, consumption = price_data
-                    if quantity <= available_quantity:
-                        total_cost = quantity * unit_price
-                        cursor.execute("UPDATE members SET total_due = total_due + ? WHERE member_id = ?", (total_cost, member_id))
-                        new_consumption = consumption + quantity
-                        remaining_quantity = available_quantity - quantity
-                        cursor.execute("UPDATE expenses SET consumption = ?, remaining = ? WHERE item_name = ?", (new_consumption, remaining_quantity, drink_name))
-                        cursor.execute("INSERT INTO drink_records (date, drink_name, member_id, quantity, total_cost) VALUES (?, ?, ?, ?, ?)",
-                                       (date, drink_name, member_id, quantity, total_cost))
-                        self.db.conn.commit()
-                        self.show_snackbar("تم توزيع المشروبات بنجاح!")
-                        ### استدعاء دالة إعادة التعيين ###
-                        self.reset_fields()
-                    else:
-                        self.show_snackbar("الكمية المطلوبة تتجاوز الكمية المتاحة.")
-                else:
-                    self.show_snackbar("المشروب غير موجود.")
+            try:
+                drinks.record_drink(self.db, date, drink_name, member_id, quantity)
+                self.show_snackbar("تم توزيع المشروبات بنجاح!")
+                ### استدعاء دالة إعادة التعيين ###
+                self.reset_fields()
+            except InsufficientStockError:
+                self.show_snackbar("الكمية المطلوبة تتجاوز الكمية المتاحة.")
+            except drinks.UnknownDrinkError:
+                self.show_snackbar("المشروب غير موجود.")
             except sqlite3.Error as e:
                 self.show_snackbar(f"حدث خطأ أثناء توزيع المشروبات: {e}")
         else:
@@ -130,7 +130,3 @@ class DrinkPage:
         self.page.snack_bar = snack_bar
         snack_bar.open = True
         self.page.update()
-
-    def close_connection(self, e):
-        if self.db.conn:
-            self.db.conn.close()
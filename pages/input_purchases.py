@@ -1,7 +1,8 @@
 import flet as ft
 from database import DatabaseManager
+from services import purchases, reference
 from utils.button_utils import create_button
-from datetime import datetime  # لإضافة التاريخ
+from utils.debounce import Debouncer
 
 class InputPurchasesPage:
     def __init__(self, page, background_image, db):
@@ -17,6 +18,10 @@ class InputPurchasesPage:
             height=50,
             bgcolor="#f0f0f0",
         )
+        # القائمة تتحدث فور إضافة صنف من أي جلسة
+        reference.subscribe(self.db, self.page, self.on_reference_change)
+        # البحث عن الأصناف المشابهة ينتظر توقف الكتابة قليلًا
+        self.search_debouncer = Debouncer(self.search_similar_items)
 
         self.quantity_field = ft.TextField(
             label="الكمية",
@@ -51,10 +56,16 @@ class InputPurchasesPage:
     def set_navigate(self, navigate):
         self.navigate = navigate
 
+    def on_reference_change(self, topic, change):
+        """تحديث قائمة الأصناف من مخزن البيانات المرجعية دون استعلام"""
+        if change.source != "expenses":
+            return
+        self.item_name_dropdown.options = self.get_expense_options()
+        if self.item_name_dropdown.page:
+            self.item_name_dropdown.update()
+
     def get_expense_options(self):
-        cursor = self.db.conn.cursor()
-        cursor.execute("SELECT DISTINCT item_name FROM expenses")
-        return [ft.dropdown.Option(row[0]) for row in cursor.fetchall()]
+        return [ft.dropdown.Option(name) for name in purchases.item_names(self.db)]
 
     def open_add_item_dialog(self, e):
         self.new_item_name_field = ft.TextField(
@@ -62,7 +73,7 @@ class InputPurchasesPage:
             width=300,
             height=50,
             bgcolor="#f0f0f0",
-            on_change=self.search_similar_items
+            on_change=self.search_debouncer
         )
         self.similar_items_list = ft.Column()
 
@@ -92,17 +103,13 @@ class InputPurchasesPage:
         self.page.update()
 
     def search_similar_items(self, e):
-        search_query = self.new_item_name_field.value.strip().lower()
+        search_query = self.new_item_name_field.value.strip()
         if not search_query:
             self.similar_items_list.controls = []
             self.page.update()
             return
 
-        similar_items = self.db.fetch_all(
-            "SELECT item_name FROM expenses WHERE LOWER(item_name) LIKE ?",
-            (f"%{search_query}%",)
-        )
-        similar_items = [item[0] for item in similar_items]
+        similar_items = purchases.similar_items(self.db, search_query)
         self.similar_items_list.controls = [
             ft.TextButton(
                 content=ft.Text(item, size=14, color="black"),
@@ -129,15 +136,7 @@ class InputPurchasesPage:
             self.show_snackbar("هذا الصنف موجود بالفعل!")
             return
 
-        # إضافة التاريخ الحالي
-        current_date = datetime.now().strftime("%Y-%m-%d")
-
-        cursor = self.db.conn.cursor()
-        cursor.execute(
-            "INSERT INTO expenses (item_name, quantity, price, total_price, remaining, date) VALUES (?, 0, 0, 0, 0, ?)",
-            (new_item, current_date)
-        )
-        self.db.conn.commit()
+        purchases.add_item(self.db, new_item)
 
         self.item_name_dropdown.options = self.get_expense_options()
         self.item_name_dropdown.value = new_item
@@ -145,6 +144,7 @@ class InputPurchasesPage:
         self.page.update()
 
     def close_add_item_dialog(self, e=None):
+        self.search_debouncer.cancel()
         self.add_item_dialog.open = False
         self.page.update()
 
@@ -164,37 +164,11 @@ class InputPurchasesPage:
                 self.show_snackbar("يرجى ملء جميع الحقول بشكل صحيح!")
                 return
 
-            # إضافة التاريخ الحالي
-            current_date = datetime.now().strftime("%Y-%m-%d")
-
-            cursor = self.db.conn.cursor()
-
-            # Get existing item data
-            cursor.execute("SELECT quantity, price, is_miscellaneous, is_drink FROM expenses WHERE item_name = ?", (item_name,))
-            result = cursor.fetchone()
-
-            if result:
-                # Update existing item
-                old_qty, old_price, old_is_miscellaneous, old_is_drink = result
-                new_qty = old_qty + quantity
-                new_total = (old_price * old_qty) + total_price
-                new_price = new_total / new_qty
-                new_is_miscellaneous = self.is_miscellaneous_check.value
-                new_is_drink = self.is_drink_check.value
-
-                cursor.execute(
-                    "UPDATE expenses SET quantity=?, price=?, total_price=?, remaining=?, is_miscellaneous=?, is_drink=?, date=? WHERE item_name=?",
-                    (new_qty, new_price, new_total, new_qty, new_is_miscellaneous, new_is_drink, current_date, item_name)
-                )
-            else:
-                # Insert new item
-                unit_price = total_price / quantity
-                cursor.execute(
-                    "INSERT INTO expenses (item_name, quantity, price, total_price, remaining, is_miscellaneous, is_drink, date) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
-                    (item_name, quantity, unit_price, total_price, quantity, self.is_miscellaneous_check.value, self.is_drink_check.value, current_date)
-                )
-
-            self.db.conn.commit()
+            purchases.record_purchase(
+                self.db, item_name, quantity, total_price,
+                is_miscellaneous=self.is_miscellaneous_check.value,
+                is_drink=self.is_drink_check.value,
+            )
             self.reset_form()
             self.show_snackbar("تم الحفظ بنجاح!")
 
@@ -216,6 +190,10 @@ class InputPurchasesPage:
         if self.navigate:
             self.navigate("input_page")
 
+    def refresh(self):
+        """تحديث قائمة الأصناف عند الرجوع للصفحة"""
+        self.item_name_dropdown.options = self.get_expense_options()
+
     def get_content(self):
         return ft.Container(
             content=ft.Column(
@@ -1,7 +1,8 @@
 import flet as ft
 from database import DatabaseManager
+from services import members
 from utils.button_utils import create_button
-from datetime import datetime  # لإضافة التاريخ
+from utils.debounce import Debouncer
 
 class InputSubscribersPage:
     def __init__(self, page, background_image, db):
@@ -25,12 +26,15 @@ class InputSubscribersPage:
             bgcolor="#f0f0f0",
         )
 
+        # البحث عن الأسماء المشابهة ينتظر توقف الكتابة قليلًا
+        self.search_debouncer = Debouncer(self.search_similar_names)
+
         self.name_field = ft.TextField(
             label="اسم المشترك",
             width=300,
             height=50,
             bgcolor="#f0f0f0",
-            on_change=self.search_similar_names,
+            on_change=self.search_debouncer,
         )
 
         self.similar_names_list = ft.ListView(
@@ -53,16 +57,12 @@ class InputSubscribersPage:
         self.navigate = navigate
 
     def search_similar_names(self, e):
-        search_query = self.name_field.value.strip().lower()
+        search_query = self.name_field.value.strip()
         if not search_query:
             self.similar_names_list.controls = []
             self.page.update()
             return
-        similar_names = self.db.fetch_all(
-              "SELECT name FROM members WHERE LOWER(name) LIKE ?",(f"%{search_query}%",)
-        )
-
-        similar_names = [row[0] for row in similar_names]
+        similar_names = members.similar_names(self.db, search_query)
 
         self.similar_names_list.controls = [
             ft.TextButton(
@@ -93,33 +93,21 @@ class InputSubscribersPage:
                 self.show_snackbar("مبلغ المساهمة يجب أن يكون رقمًا موجبًا.")
                 return
 
-            cursor = self.db.conn.cursor()
-
-            # التحقق من عدم تكرار الاسم
-            cursor.execute("SELECT COUNT(*) FROM members WHERE name = ?", (name,))
-            if cursor.fetchone()[0] > 0:
+            try:
+                members.register_member(self.db, rank, name, contribution)
+            except members.DuplicateMemberError:
                 self.show_snackbar("هذا الاسم موجود بالفعل!")
                 return
-
-            # إضافة التاريخ الحالي
-            current_date = datetime.now().strftime("%Y-%m-%d")
-
-            # إدراج البيانات مع التاريخ
-            cursor.execute(
-                "INSERT INTO members (rank, name, contribution, date) VALUES (?, ?, ?, ?)",
-                (rank, name, contribution, current_date)
-            )
-            self.db.conn.commit()
             self.reset_form()
             self.show_snackbar("تم حفظ البيانات بنجاح!")
 
         except ValueError:
             self.show_snackbar("مبلغ المساهمة يجب أن يكون رقمًا.")
         except Exception as ex:
-            self.db.conn.rollback()
             self.show_snackbar(f"حدث خطأ أثناء حفظ البيانات: {str(ex)}")
 
     def reset_form(self):
+        self.search_debouncer.cancel()
         self.rank_dropdown.value = None
         self.name_field.value = ""
         self.similar_names_list.controls = []
@@ -1,5 +1,6 @@
 import flet as ft
-from database import DatabaseManager
+from database import DatabaseManager, InsufficientStockError
+from services import meals, reference
 from utils.button_utils import create_button
 from datetime import datetime
 
@@ -13,14 +14,25 @@ class MealPage:
         self.selected_meals = {}
         self.member_selection = {}
         self.misc_var = None
-        # إغلاق الاتصال بقاعدة البيانات عند إغلاق الصفحة
-        self.page.on_close = self.close_connection
+        self.meal_options = {}
     
     def set_navigate(self, navigate):
         self.navigate = navigate
     
     def get_content(self):
-        return self.show_initial_page()
+        # خطوات التسجيل تتبدل داخل هذه الحاوية فقط، فتبقى بقية الشاشة كما هي
+        self.step_container = ft.Container(content=self.show_initial_page(), expand=True)
+        reference.subscribe(self.db, self.page, self.on_reference_change)
+        return self.step_container
+
+    def refresh(self):
+        """العودة للخطوة الأولى عند الرجوع للصفحة"""
+        self.show_step(self.show_initial_page())
+
+    def show_step(self, step):
+        """عرض خطوة من خطوات التسجيل داخل حاوية الصفحة"""
+        self.step_container.content = step
+        self.page.update()
     
     # الصفحة الأولى: اختيار نوع الوجبة
     def show_initial_page(self):
@@ -91,8 +103,7 @@ class MealPage:
         if not self.meal_type_dropdown.value:
             self.show_snackbar("يرجى اختيار نوع الوجبة!")
             return
-        self.page.clean()
-        self.page.add(self.show_meal_selection())
+        self.show_step(self.show_meal_selection())
     
     # الصفحة الثانية: اختيار الأصناف
     def show_meal_selection(self, e=None):
@@ -103,12 +114,13 @@ class MealPage:
             color=ft.colors.WHITE,
             text_align=ft.TextAlign.CENTER,
         )
+        # لقطة المخزون: تُقرأ مرة واحدة وتُستخدم للتحقق من الكميات
         self.meal_options = self.get_meal_options()
         self.selected_meals = {}
         meal_checkboxes = []
-        for meal in self.meal_options:
+        for expense_id, (meal, _, _) in self.meal_options.items():
             var = ft.Checkbox(value=False)
-            self.selected_meals[meal] = var
+            self.selected_meals[expense_id] = var
             meal_checkboxes.append(
                 ft.Row(
                     [
@@ -141,11 +153,7 @@ class MealPage:
         )
         btn_back = create_button(
             "رجوع",
-            lambda e: [
-                self.page.controls.clear(),
-                self.page.add(self.show_initial_page()),
-                self.page.update()
-            ],
+            lambda e: self.show_step(self.show_initial_page()),
             bgcolor=ft.colors.RED
         )
         content = ft.Stack(
@@ -176,8 +184,7 @@ class MealPage:
         if not any(var.value for var in self.selected_meals.values()) and not self.misc_var.value:
             self.show_snackbar("يرجى اختيار صنف واحد على الأقل!")
             return
-        self.page.clean()
-        self.page.add(self.show_quantity_input())
+        self.show_step(self.show_quantity_input())
     
     # الصفحة الثالثة: إدخال الكميات
     def show_quantity_input(self, e=None):
@@ -190,15 +197,16 @@ class MealPage:
         )
         self.meal_quantities = {}
         quantity_fields = []
-        for meal, var in self.selected_meals.items():
+        for expense_id, var in self.selected_meals.items():
             if var.value:
+                meal = self.meal_options[expense_id][0]
                 quantity_var = ft.TextField(
                     label=f"كمية {meal}",
                     value="",
                     width=300,
                     bgcolor=ft.colors.WHITE
                 )
-                self.meal_quantities[meal] = quantity_var
+                self.meal_quantities[expense_id] = quantity_var
                 quantity_fields.append(quantity_var)
         if self.misc_var.value:
             self.misc_amount_var = ft.TextField(
@@ -215,11 +223,7 @@ class MealPage:
         )
         btn_back = create_button(
             "رجوع",
-            lambda e: [
-                self.page.controls.clear(),
-                self.page.add(self.show_meal_selection()),
-                self.page.update()
-            ],
+            lambda e: self.show_step(self.show_meal_selection()),
             bgcolor=ft.colors.RED
         )
         content = ft.Stack(
@@ -247,24 +251,24 @@ class MealPage:
     
     def validate_quantities(self, e):
         error_messages = []
-        # التحقق من حقول الوجبات
-        for meal, field in self.meal_quantities.items():
+        # التحقق من حقول الوجبات مقابل لقطة المخزون (بدون استعلامات)
+        for expense_id, field in self.meal_quantities.items():
+            meal, _, remaining = self.meal_options[expense_id]
             value = field.value.strip()
             if not value:
                 error_messages.append(f"حقل كمية {meal} مطلوب!")
                 field.error_text = "هذا الحقل مطلوب"
                 field.update()
-            else:
-                try:
-                    quantity = int(value)
-                    cursor = self.db.conn.cursor()
-                    cursor.execute("SELECT remaining FROM expenses WHERE item_name = ?", (meal,))
-                    remaining = cursor.fetchone()[0]
-                    if quantity > remaining:
-                        self.show_snackbar(f"الكمية المطلوبة لـ {meal} غير متوفرة!")
-                        return
-                except ValueError:
-                    error_messages.append(f"حقل كمية {meal} يجب أن يكون عددًا صحيحًا!")
+                continue
+            try:
+                quantity = int(value)
+            except ValueError:
+                error_messages.append(f"حقل كمية {meal} يجب أن يكون عددًا صحيحًا!")
+                continue
+            if quantity <= 0:
+                error_messages.append(f"حقل كمية {meal} يجب أن يكون أكبر من صفر!")
+            elif quantity > remaining:
+                error_messages.append(f"الكمية المطلوبة لـ {meal} غير متوفرة! (المتاح: {remaining})")
         # التحقق من المصاريف الأخرى
         if self.misc_var.value:
             misc_value = self.misc_amount_var.value.strip()
@@ -278,12 +282,11 @@ class MealPage:
                 except ValueError:
                     error_messages.append("حقل مبلغ المصاريف الأخرى يجب أن يكون رقمًا!")
         if error_messages:
-            for message in error_messages:
-                self.show_snackbar(message)
+            # عرض كل الأخطاء معًا
+            self.show_snackbar("\n".join(error_messages))
             return
         # إذا لم يكن هناك أخطاء، ننتقل إلى صفحة اختيار الأعضاء
-        self.page.clean()
-        self.page.add(self.show_member_selection())
+        self.show_step(self.show_member_selection())
     
     # الصفحة الرابعة: اختيار الأعضاء
     def show_member_selection(self):
@@ -297,9 +300,9 @@ class MealPage:
         member_options = self.get_member_options()
         self.member_selection = {}
         member_checkboxes = []
-        for member in member_options:
+        for member_id, member in member_options:
             var = ft.Checkbox(value=False)
-            self.member_selection[member] = var
+            self.member_selection[member_id] = var
             member_checkboxes.append(
                 ft.Row(
                     [
@@ -322,11 +325,7 @@ class MealPage:
         )
         btn_back = create_button(
             "رجوع",
-            lambda e: [
-                self.page.controls.clear(),
-                self.page.add(self.show_quantity_input()),
-                self.page.update()
-            ],
+            lambda e: self.show_step(self.show_quantity_input()),
             bgcolor=ft.colors.RED
         )
         content = ft.Stack(
@@ -354,80 +353,51 @@ class MealPage:
     
     # حفظ البيانات
     def save_data(self, e):
-        total_cost = 0
+        # اختيار الأعضاء (بمعرفاتهم مباشرة)
+        selected_ids = [member_id for member_id, var in self.member_selection.items() if var.value]
+        if not selected_ids:
+            self.show_snackbar("لم يتم اختيار أي أعضاء!")
+            return
+        quantities = {expense_id: int(field.value) for expense_id, field in self.meal_quantities.items()}
+        misc_total = float(self.misc_amount_var.value) if self.misc_var.value else None
+        meal_type = self.meal_type_dropdown.value
+        date = self.date_field.value
+
         try:
-            cursor = self.db.conn.cursor()
-            
-            # تحديث الكميات للأصناف
-            for meal, field in self.meal_quantities.items():
-                quantity = int(field.value)
-                cursor.execute("UPDATE expenses SET consumption = consumption + ?, remaining = remaining - ? WHERE item_name = ?", 
-                              (quantity, quantity, meal))
-                cursor.execute("SELECT price FROM expenses WHERE item_name = ?", (meal,))
-                price = cursor.fetchone()[0]
-                total_cost += quantity * price
-            
-            # اختيار الأعضاء
-            selected_members = [member for member, var in self.member_selection.items() if var.value]
-            if not selected_members:
-                self.show_snackbar("لم يتم اختيار أي أعضاء!")
-                return
-            
-            # حساب التكلفة لكل عضو
-            cost_per_member = total_cost / len(selected_members)
-            
-            # معالجة المصاريف النثرية
-            misc_expense_id = None
-            misc_amount_per_member = 0
-            if self.misc_var.value:
-                misc_total = float(self.misc_amount_var.value)
-                misc_amount_per_member = misc_total / len(selected_members)
-                total_cost += misc_total
-            
-            # إدراج المصاريف النثرية وسجلات الوجبات
-            for member in selected_members:
-                # تحديث إجمالي المدين للمشترك
-                cursor.execute("UPDATE members SET total_due = total_due + ? WHERE rank || ' ' || name = ?",
-                              (cost_per_member + misc_amount_per_member, member))
-                
-                # الحصول على معرف العضو
-                cursor.execute("SELECT member_id FROM members WHERE rank || ' ' || name = ?", (member,))
-                member_id = cursor.fetchone()[0]
-                
-                # إدراج سجل الوجبة
-                cursor.execute("INSERT INTO meal_records (meal_type, date, member_id, final_cost) VALUES (?, ?, ?, ?)",
-                              (self.meal_type_dropdown.value, self.date_field.value, member_id, cost_per_member))
-                meal_record_id = cursor.lastrowid
-                
-                # إدراج المصروف النثري المرتبط بالعضو والوجبة
-                if self.misc_var.value:
-                    cursor.execute("INSERT INTO miscellaneous_expenses (date, amount, meal_type, meal_record_id, member_id) VALUES (?, ?, ?, ?, ?)",
-                                  (self.date_field.value, misc_amount_per_member, self.meal_type_dropdown.value, meal_record_id, member_id))
-            
-            self.db.conn.commit()
+            meals.record_meal(self.db, meal_type, date, selected_ids, quantities, misc_total)
             self.show_snackbar("تم حفظ البيانات بنجاح!")
             self.navigate("meal_page")
+        except InsufficientStockError as e:
+            # تم بيع جزء من المخزون من جلسة أخرى بعد التحقق
+            names = "، ".join(self.meal_options[expense_id][0] for expense_id, _ in e.shortfalls)
+            self.show_snackbar(f"الكمية المطلوبة غير متوفرة الآن: {names}")
         except Exception as e:
-            self.db.conn.rollback()
             self.show_snackbar(f"حدث خطأ: {str(e)}")
     
     # وظائف مساعدة
+    def on_reference_change(self, topic, change):
+        """تحديث أسماء وأسعار الأصناف المعروضة عند تعديلها من المخزن المرجعي.
+
+        المتبقي لا يتغير بتعديل الاسم أو السعر فيبقى كما في لقطة الصفحة،
+        فلا يُستعلم عن المخزون مع كل تغيير.
+        """
+        if change.source != "expenses" or not self.meal_options:
+            return
+        current = reference.reference_store(self.db).meal_options()
+        for expense_id in change.changed:
+            if expense_id in self.meal_options and expense_id in current:
+                name, price = current[expense_id]
+                self.meal_options[expense_id] = (name, price, self.meal_options[expense_id][2])
+
     def get_meal_options(self):
-        cursor = self.db.conn.cursor()
-        cursor.execute("SELECT item_name FROM expenses WHERE is_drink = 0 AND is_miscellaneous = 0")
-        return [row[0] for row in cursor.fetchall()]
+        """لقطة المخزون للأصناف: {expense_id: (الاسم، السعر، المتبقي)} باستعلام واحد"""
+        return meals.meal_options(self.db)
     
     def get_member_options(self):
-        cursor = self.db.conn.cursor()
-        cursor.execute("SELECT rank || ' ' || name FROM members")
-        return [row[0] for row in cursor.fetchall()]
+        return meals.member_options(self.db)
     
     def show_snackbar(self, message):
         snack_bar = ft.SnackBar(ft.Text(message))
         self.page.snack_bar = snack_bar
         snack_bar.open = True
         self.page.update()
-    
-    def close_connection(self, e):
-        if self.db.conn:
-            self.db.conn.close()
@@ -1,27 +1,11 @@
 import flet as ft
 from database import DatabaseManager
 from utils.button_utils import create_button
-import pandas as pd
+from services import reports
 from datetime import datetime
 import os
-import matplotlib.pyplot as plt
-from reportlab.lib.pagesizes import letter, A4
-from reportlab.lib.units import inch
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.lib import colors
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
 import logging
 
-# Register Arabic font (assuming 1.ttf is an Arabic font)
-try:
-    pdfmetrics.registerFont(TTFont('Arabic-Font', '/home/ubuntu/project_review/1.ttf'))
-except Exception as e:
-    logging.warning(f"Could not register font /home/ubuntu/project_review/1.ttf for PDF export: {e}")
-    # Fallback font if registration fails
-    pdfmetrics.registerFont(TTFont('Arabic-Font', 'arial.ttf'))
-
 
 class ReportsPage:
     def __init__(self, page, background_image, db):
@@ -90,8 +74,12 @@ class ReportsPage:
         
         historical_reports_controls = ft.Column([
             ft.Row(
-                [self.archive_dropdown],
+                [
+                    self.archive_dropdown,
+                    create_button("بحث شامل في كل الفترات", lambda e: self.navigate("search_page"), bgcolor=ft.colors.BLUE_GREY),
+                ],
                 alignment=ft.MainAxisAlignment.CENTER,
+                spacing=20,
             ),
             ft.Row(
                 [
@@ -163,6 +151,10 @@ class ReportsPage:
 
         return content
 
+    def refresh(self):
+        """تحديث قائمة فترات الأرشيف عند الرجوع للصفحة"""
+        self.load_archive_periods()
+
     def load_archive_periods(self):
         try:
             # استعلام لجلب فترات الأرشيف المتاحة
@@ -171,7 +163,7 @@ class ReportsPage:
                 FROM archive_keys
                 ORDER BY archived_at DESC
             """
-            rows = self.db.fetch_all(query)
+            rows = self.db.fetch_cached(query)
             
             if not rows:
                 self.archive_periods = []
@@ -221,7 +213,7 @@ class ReportsPage:
                 FROM expenses
                 ORDER BY date DESC, item_name
             """
-            rows = self.db.fetch_all(query)
+            rows = self.db.fetch_cached(query)
 
             if not rows:
                 self.show_snackbar("لا توجد بيانات للمصروفات الحالية.")
@@ -274,7 +266,7 @@ class ReportsPage:
                 FROM members
                 ORDER BY name
             """
-            rows = self.db.fetch_all(query)
+            rows = self.db.fetch_cached(query)
 
             if not rows:
                 self.show_snackbar("لا توجد بيانات للمشتركين الحاليين.")
@@ -336,66 +328,11 @@ class ReportsPage:
 
     def generate_comprehensive_report(self):
         try:
-            # 1. بيانات المشتركين والاستهلاك
-            query_members = """
-                SELECT 
-                    m.member_id,
-                    m.name AS "الاسم", 
-                    m.rank AS "الرتبة", 
-                    m.contribution AS "المساهمة",
-                    COALESCE(SUM(mr.final_cost), 0) AS "تكلفة_الوجبات",
-                    COALESCE(SUM(dr.total_cost), 0) AS "تكلفة_المشروبات",
-                    m.total_due AS "النثرية_الموزعة"
-                FROM members m
-                LEFT JOIN meal_records mr ON m.member_id = mr.member_id
-                LEFT JOIN drink_records dr ON m.member_id = dr.member_id
-                GROUP BY m.member_id, m.name, m.rank, m.contribution, m.total_due
-            """
-            df_members = pd.read_sql(query_members, self.db.conn)
-            
-            if df_members.empty:
+            # نفس التقرير المستخدم في صفحة تقفيل الشهر
+            report = reports.comprehensive_report(self.db)
+            if report is None:
                 return None
-                
-            # حساب إجمالي الاستهلاك لكل مشترك
-            df_members["إجمالي_الاستهلاك"] = df_members["تكلفة_الوجبات"] + df_members["تكلفة_المشروبات"] + df_members["النثرية_الموزعة"]
-            df_members["الرصيد_النهائي"] = df_members["المساهمة"] - df_members["إجمالي_الاستهلاك"]
-
-            # 2. ملخص مالي
-            total_contributions = df_members["المساهمة"].sum()
-            total_meal_cost = df_members["تكلفة_الوجبات"].sum()
-            total_drink_cost = df_members["تكلفة_المشروبات"].sum()
-            total_misc_distributed = df_members["النثرية_الموزعة"].sum()
-            total_consumption = df_members["إجمالي_الاستهلاك"].sum()
-            final_balance_members = df_members["الرصيد_النهائي"].sum()
-
-            # 3. قيمة المخزون المتبقي
-            cursor = self.db.conn.cursor()
-            cursor.execute("SELECT SUM(remaining * price) FROM expenses WHERE is_miscellaneous = 0")
-            value_remaining_items = cursor.fetchone()[0] or 0
-
-            # 4. إنشاء قسم الملخص
-            summary_data = {
-                "البند": ["إجمالي المساهمات", "إجمالي تكلفة الوجبات", "إجمالي تكلفة المشروبات", "إجمالي النثرية الموزعة", 
-                          "إجمالي الاستهلاك", "قيمة المخزون المتبقي", "الرصيد النقدي المتوقع (المساهمات - الاستهلاك)", "رصيد المشتركين النهائي"],
-                "المبلغ": [total_contributions, total_meal_cost, total_drink_cost, total_misc_distributed, 
-                           total_consumption, value_remaining_items, total_contributions - total_consumption, final_balance_members]
-            }
-            df_summary = pd.DataFrame(summary_data)
-
-            # 5. تنسيق جدول المشتركين
-            df_members_display = df_members[["الاسم", "الرتبة", "المساهمة", "تكلفة_الوجبات", "تكلفة_المشروبات", "النثرية_الموزعة", "إجمالي_الاستهلاك", "الرصيد_النهائي"]]
-            # إضافة صف الإجماليات
-            totals_members = df_members_display.sum(numeric_only=True).to_frame().T
-            totals_members["الاسم"] = "الإجمالي"
-            totals_members["الرتبة"] = ""
-            df_members_display = pd.concat([df_members_display, totals_members], ignore_index=True)
-            
-            # تخزين كلا الجزأين للتصدير/العرض
-            report_content = {
-                "summary": df_summary,
-                "members": df_members_display
-            }
-            return report_content
+            return report.to_frames()
         except Exception as e:
             logging.error(f"Error generating comprehensive report: {e}")
             self.show_snackbar(f"حدث خطأ أثناء إنشاء التقرير الشامل: {e}")
@@ -0,0 +1,139 @@
+import flet as ft
+import logging
+from services import search
+from utils.button_utils import create_button
+from utils.debounce import Debouncer
+
+
+class SearchPage:
+    # أقصى عدد أسطر تُعرض لكل فترة
+    MAX_LINES_PER_PERIOD = 30
+
+    def __init__(self, page, background_image, db):
+        self.page = page
+        self.navigate = None
+        self.background_image = background_image
+        self.db = db
+
+        self.query_field = ft.TextField(
+            label="ابحث باسم صنف أو مشترك أو رتبة",
+            width=400,
+            height=50,
+            bgcolor="#f0f0f0",
+            on_change=Debouncer(self.run_search, delay=0.3),
+            on_submit=self.run_search,
+        )
+        self.summary = ft.Text("", color="white", weight=ft.FontWeight.BOLD)
+        self.results_list = ft.ListView(spacing=5, padding=10, expand=True)
+
+    def set_navigate(self, navigate):
+        self.navigate = navigate
+
+    def run_search(self, e=None):
+        text = self.query_field.value.strip()
+        if not text:
+            self.summary.value = ""
+            self.results_list.controls = []
+            self.page.update()
+            return
+        try:
+            results = search.search(self.db, text)
+        except Exception as ex:
+            logging.error(f"Search failed for {text!r}: {ex}")
+            self.summary.value = f"تعذر البحث: {ex}"
+            self.results_list.controls = []
+            self.page.update()
+            return
+
+        summary = f"{results.hits} نتيجة في {len(results.periods)} فترة ({results.elapsed_ms:.0f} مللي ثانية)"
+        if results.truncated:
+            summary += " - عدد النتائج كبير، يرجى تضييق البحث"
+        if not results.with_activity:
+            summary += " - لم يُحسب عدد الوجبات لكثرة المشتركين المطابقين"
+        self.summary.value = summary
+        self.results_list.controls = [self.period_card(period) for period in results.periods]
+        self.page.update()
+
+    def period_card(self, period):
+        """بطاقة نتائج فترة: العنوان مع العدد ثم سطر لكل مشترك أو صنف"""
+        if period.is_open:
+            title = period.title
+        else:
+            title = f"{period.title} ({period.start_date or '?'} إلى {period.end_date or '?'})"
+        counts = f"{len(period.members)} مشترك، {len(period.items)} صنف"
+        if period.members:
+            counts += f"، {period.meal_count} وجبة"
+
+        lines = [
+            f"👤 {member.label} - وجبات: {member.meals}، مشروبات: {member.drinks}"
+            for member in period.members.values()
+        ] + [
+            f"📦 {item.label} - تاريخ الشراء: {item.date or 'غير معروف'}"
+            for item in period.items
+        ]
+        hidden = len(lines) - self.MAX_LINES_PER_PERIOD
+        lines = lines[:self.MAX_LINES_PER_PERIOD]
+        if hidden > 0:
+            lines.append(f"... و{hidden} نتيجة أخرى")
+
+        return ft.Container(
+            content=ft.Column(
+                [
+                    ft.Text(f"{title} - {counts}", weight=ft.FontWeight.BOLD, color=ft.colors.WHITE),
+                    ft.Column([ft.Text(line, size=13) for line in lines], spacing=2),
+                ],
+                spacing=5,
+            ),
+            bgcolor=ft.colors.GREEN_700 if period.is_open else ft.colors.BLUE_GREY_700,
+            padding=10,
+            border_radius=10,
+        )
+
+    def refresh(self):
+        """إعادة تنفيذ البحث الحالي عند الرجوع للصفحة"""
+        if self.query_field.value:
+            self.run_search()
+
+    def get_content(self):
+        title = ft.Text(
+            "بحث شامل",
+            size=40,
+            weight=ft.FontWeight.BOLD,
+            color="white",
+            text_align=ft.TextAlign.CENTER,
+            font_family="DancingScript",
+        )
+
+        btn_back = create_button(
+            "رجوع",
+            lambda e: self.navigate("reports_page"),
+            bgcolor=ft.colors.RED
+        )
+
+        return ft.Container(
+            content=ft.Column(
+                [
+                    ft.Container(height=20),
+                    title,
+                    ft.Container(height=10),
+                    ft.Row(
+                        [self.query_field, create_button("بحث", self.run_search, width=120)],
+                        alignment=ft.MainAxisAlignment.CENTER,
+                        spacing=20,
+                    ),
+                    self.summary,
+                    ft.Container(
+                        content=self.results_list,
+                        width=700,
+                        expand=True,
+                    ),
+                    btn_back,
+                    ft.Container(height=10),
+                ],
+                alignment=ft.MainAxisAlignment.START,
+                horizontal_alignment=ft.CrossAxisAlignment.CENTER,
+            ),
+            image_src=self.background_image.src,
+            image_fit=ft.ImageFit.COVER,
+            expand=True,
+        )
@@ -1,6 +1,16 @@
 import flet as ft
-from database import DatabaseManager
 from utils.button_utils import create_button
+from utils.data_grid import DataGrid, parse_date, prefix_filter, range_filter
+from utils.debounce import Debouncer
+
+# جدول النثريات: الأعمدة المسترجعة وأعمدة الترتيب (لكل منها فهرس، انظر tools/check_query_plans)
+GRID = dict(
+    table="expenses",
+    key="expense_id",
+    columns=["expense_id", "item_name", "quantity", "price", "total_price", "consumption", "remaining", "is_miscellaneous", "is_drink"],
+    where="is_miscellaneous = 1",
+    sortable=["item_name", "quantity", "price", "total_price"],
+)
 
 class ShowOverPage:
     def __init__(self, page, background_image, db):
@@ -12,27 +22,14 @@ class ShowOverPage:
         # تهيئة المتغيرات لتتبع الصف المحدد
         self.selected_row = None
         self.selected_item_id = None
-        self.selected_row_control = None
-
-        # إغلاق الاتصال بقاعدة البيانات عند إغلاق الصفحة
-        self.page.on_close = self.close_connection
+        self.grid = None
+        # التصفية بالاسم تنتظر توقف الكتابة قليلًا بدل استعلام مع كل حرف
+        self.name_debouncer = Debouncer(self.filter_by_name)
 
     def set_navigate(self, navigate):
         self.navigate = navigate
 
-    def get_expenses_data(self):
-        # جلب البيانات من قاعدة البيانات
-        rows = self.db.fetch_all(
-            "SELECT expense_id, item_name, quantity, price, total_price, consumption, remaining, is_miscellaneous, is_drink FROM expenses WHERE is_miscellaneous = 1"
-        )
-        # أسماء الأعمدة
-        columns = ["expense_id", "item_name", "quantity", "price", "total_price", "consumption", "remaining", "is_miscellaneous", "is_drink"]
-        # تحويل كل tuple إلى dict
-        return [dict(zip(columns, row)) for row in rows]
-
     def get_content(self):
-        self.page.clean()
-
         title = ft.Text(
             "عرض النثريات",
             size=40,
@@ -54,69 +51,29 @@ class ShowOverPage:
             "remaining": "المتبقي",
         }
 
-        # صف العناوين الثابت
-        self.header_row = ft.Container(
-            content=ft.Row(
-                [
-                    ft.Container(
-                        content=ft.Text(column_names[col], weight=ft.FontWeight.BOLD),
-                        width=80 if col == "expense_id" else 100,
-                        alignment=ft.alignment.center,
-                        padding=10,
-                        bgcolor=ft.colors.GREEN,
-                    ) for col in columns
-                ],
-                alignment=ft.MainAxisAlignment.CENTER,
-            ),
-            bgcolor=ft.colors.GREEN,
-            shadow=ft.BoxShadow(blur_radius=30, color="green"),
-            width=750,
+        # مرشحات الجدول: تتحول إلى شروط WHERE في الاستعلام
+        self.name_filter = ft.TextField(label="اسم الصنف", width=180, height=40, text_size=12, on_change=self.name_debouncer)
+        self.date_from = ft.TextField(label="من تاريخ", hint_text="YYYY-MM-DD", width=130, height=40, text_size=12,
+                                      on_submit=self.filter_by_date, on_blur=self.filter_by_date)
+        self.date_to = ft.TextField(label="إلى تاريخ", hint_text="YYYY-MM-DD", width=130, height=40, text_size=12,
+                                    on_submit=self.filter_by_date, on_blur=self.filter_by_date)
+        filters_row = ft.Row(
+            [self.date_to, self.date_from, self.name_filter],
+            alignment=ft.MainAxisAlignment.CENTER,
+            spacing=10,
         )
 
-        # بيانات الجدول
-        self.rows = self.get_expenses_data()
-        self.data_rows = [
-            ft.Container(
-                content=ft.Row(
-                    [
-                        ft.Container(
-                            content=ft.Text(str(row[col])),
-                            width=80 if col == "expense_id" else 100,
-                            alignment=ft.alignment.center,
-                            padding=10,
-                            bgcolor=None,
-                        ) for col in columns
-                    ],
-                    alignment=ft.MainAxisAlignment.CENTER,
-                ),
-                on_click=lambda e, row=row: self.select_row(e, row),
-            ) for row in self.rows
-        ]
-
-        # الجدول مع سكرول بار (فقط للبيانات)
-        self.scrollable_data = ft.ListView(
-            self.data_rows,
-            height=300,
+        # الجدول يحمل الصفوف على دفعات ويبني عناصر النافذة الظاهرة فقط
+        self.grid = DataGrid(
+            self.db,
+            **GRID,
+            display_columns=columns,
+            column_names=column_names,
+            widths={"expense_id": 80},
             width=750,
-            spacing=0,
-            padding=0,
-        )
-
-        # تغليف ListView داخل Container لتحديد لون الخلفية
-        scrollable_container = ft.Container(
-            content=self.scrollable_data,
-            bgcolor=ft.colors.LIGHT_GREEN,
-            shadow=ft.BoxShadow(blur_radius=30, color="green"),
-        )
-
-        # وضع صف العناوين والبيانات في عمود
-        self.table = ft.Column(
-            [
-                self.header_row,
-                scrollable_container,
-            ],
-            spacing=0,
+            on_select=self.select_row,
         )
+        self.table = self.grid.build()
 
         # وضع الأزرار في سطر واحد
         btn_edit = create_button(
@@ -149,6 +106,8 @@ class ShowOverPage:
                     ft.Container(height=10),
                     title,
                     ft.Container(height=10),
+                    filters_row,
+                    ft.Container(height=10),
                     self.table,
                     ft.Container(height=10),
                     buttons_row,
@@ -163,16 +122,9 @@ class ShowOverPage:
 
         return content
 
-    def select_row(self, e, row):
-        if self.selected_row_control is not None:
-            self.selected_row_control.bgcolor = None
-
+    def select_row(self, row):
         self.selected_row = row
-        self.selected_item_id = row['expense_id']
-        if e is not None:
-            e.control.bgcolor = ft.colors.YELLOW
-            self.selected_row_control = e.control
-        self.page.update()
+        self.selected_item_id = row['expense_id'] if row else None
 
     def edit_item(self, e):
         if not self.selected_row:
@@ -286,16 +238,14 @@ class ShowOverPage:
 
         if item_name and quantity >= 0 and price >= 0:
             try:
-                cursor = self.db.conn.cursor()
-                cursor.execute("UPDATE expenses SET item_name=?, quantity=?, price=?, total_price=?, consumption=?, remaining=?, is_miscellaneous=?, is_drink=? WHERE expense_id=?",
-                               (item_name, quantity, price, total_price, consumption, remaining, is_miscellaneous, is_drink, item_id))
-                self.db.conn.commit()
+                self.db.write(lambda cursor: cursor.execute(
+                    "UPDATE expenses SET item_name=?, quantity=?, price=?, total_price=?, consumption=?, remaining=?, is_miscellaneous=?, is_drink=? WHERE expense_id=?",
+                    (item_name, quantity, price, total_price, consumption, remaining, is_miscellaneous, is_drink, item_id)))
                 self.show_snackbar("تم تعديل البيانات بنجاح!")
                 self.close_dialog(dialog)
-                self.selected_row = None
-                self.selected_item_id = None
-                self.selected_row_control = None
-                self.update_table()
+                self.selected_row = self.grid.patch_row(item_id)
+                if self.selected_row is None:
+                    self.selected_item_id = None
             except Exception as e:
                 self.show_snackbar(f"حدث خطأ أثناء تعديل البيانات: {e}")
         else:
@@ -323,47 +273,34 @@ class ShowOverPage:
 
     def confirm_delete(self, item_id, dialog):
         try:
-            cursor = self.db.conn.cursor()
-            cursor.execute("DELETE FROM expenses WHERE expense_id=?", (item_id,))
-            self.db.conn.commit()
+            self.db.write(lambda cursor: cursor.execute("DELETE FROM expenses WHERE expense_id=?", (item_id,)))
             self.show_snackbar("تم حذف الصنف بنجاح!")
             self.close_dialog(dialog)
+            self.grid.remove_row(item_id)
             self.selected_row = None
             self.selected_item_id = None
-            self.selected_row_control = None
-            self.update_table()
         except Exception as e:
             self.show_snackbar(f"حدث خطأ أثناء الحذف: {e}")
 
-    def update_table(self):
-        self.rows = self.get_expenses_data()
-        self.data_rows.clear()
-        columns = ["remaining", "consumption", "total_price", "price", "quantity", "item_name", "expense_id"]
-        self.data_rows.extend([
-            ft.Container(
-                content=ft.Row(
-                    [
-                        ft.Container(
-                            content=ft.Text(str(row[col])),
-                            width=80 if col == "expense_id" else 100,
-                            alignment=ft.alignment.center,
-                            padding=10,
-                            bgcolor=None,
-                        ) for col in columns
-                    ],
-                    alignment=ft.MainAxisAlignment.CENTER,
-                ),
-                on_click=lambda e, row=row: self.select_row(e, row),
-            ) for row in self.rows
-        ])
-        self.scrollable_data.controls = self.data_rows
-        if self.selected_item_id is not None:
-            for row_control in self.scrollable_data.controls:
-                if row_control.content.controls[6].content.value == str(self.selected_item_id):
-                    row_control.bgcolor = ft.colors.YELLOW
-                    self.selected_row_control = row_control
-                    break
-        self.page.update()
+    def filter_by_name(self, e):
+        """تصفية الأصناف التي يبدأ اسمها بالنص المكتوب"""
+        text = self.name_filter.value.strip()
+        clause, params = prefix_filter("item_name", text) if text else (None, ())
+        self.grid.set_filter("item_name", clause, params)
+
+    def filter_by_date(self, e):
+        """تصفية الأصناف حسب تاريخ الشراء"""
+        try:
+            start = parse_date(self.date_from.value)
+            end = parse_date(self.date_to.value)
+        except ValueError:
+            self.show_snackbar("يرجى إدخال التاريخ بصيغة YYYY-MM-DD.")
+            return
+        self.grid.set_filter("date", *range_filter("date", start, end))
+
+    def refresh(self):
+        """إعادة تحميل نافذة الجدول فقط عند الرجوع للصفحة"""
+        self.grid.reload()
 
     def close_dialog(self, dialog):
         dialog.open = False
@@ -374,7 +311,3 @@ class ShowOverPage:
         self.page.snack_bar = snack_bar
         snack_bar.open = True
         self.page.update()
-
-    def close_connection(self, e=None):
-        if self.db.conn:
-            self.db.conn.close()
\ No newline at end of file
@@ -1,6 +1,16 @@
 import flet as ft
-from database import DatabaseManager
+from services import members
 from utils.button_utils import create_button
+from utils.data_grid import DataGrid, prefix_filter
+from utils.debounce import Debouncer
+
+# جدول المشتركين: الأعمدة المسترجعة وأعمدة الترتيب (لكل منها فهرس، انظر tools/check_query_plans)
+GRID = dict(
+    table="members",
+    key="member_id",
+    columns=["member_id", "rank", "name", "contribution", "total_due"],
+    sortable=["rank", "name", "contribution", "total_due"],
+)
 
 class ShowSubscribersPage:
     def __init__(self, page, background_image, db):
@@ -12,26 +22,16 @@ class ShowSubscribersPage:
         # تهيئة المتغيرات لتتبع الصف المحدد
         self.selected_row = None
         self.selected_member_id = None
-        self.selected_row_control = None
+        self.grid = None
+        # التصفية بالاسم تنتظر توقف الكتابة قليلًا بدل استعلام مع كل حرف
+        self.name_debouncer = Debouncer(self.filter_by_name)
 
     def set_navigate(self, navigate):
         self.navigate = navigate
 
-    def get_members_data(self):
-        rows = self.db.fetch_all("SELECT member_id, rank, name, contribution, total_due FROM members")
-        columns = ["member_id", "rank", "name", "contribution", "total_due"]
-        return [dict(zip(columns, row)) for row in rows]
-
-    def select_row(self, e, row):
-        if self.selected_row_control is not None:
-            self.selected_row_control.bgcolor = None  # إعادة لون الصف السابق
-
+    def select_row(self, row):
         self.selected_row = row
-        self.selected_member_id = row['member_id']
-        if e is not None:  # إذا تم النقر على الصف
-            e.control.bgcolor = ft.colors.YELLOW  # تغيير لون الصف المحدد إلى أصفر
-            self.selected_row_control = e.control
-        self.page.update()
+        self.selected_member_id = row['member_id'] if row else None
 
     def edit_member(self, e):
         if not hasattr(self, 'selected_row') or self.selected_row is None:
@@ -84,13 +84,14 @@ class ShowSubscribersPage:
 
         if rank and name and contribution >= 0 and total_due >= 0:
             try:
-                cursor = self.db.conn.cursor()
-                cursor.execute("UPDATE members SET total_due=?, contribution=?, name=?, rank=? WHERE member_id=?",
-                               (total_due, contribution, name, rank, member_id))
-                self.db.conn.commit()
+                self.db.write(lambda cursor: cursor.execute(
+                    "UPDATE members SET total_due=?, contribution=?, name=?, rank=? WHERE member_id=?",
+                    (total_due, contribution, name, rank, member_id)))
                 self.show_snackbar("تم تعديل البيانات بنجاح!")
                 self.close_dialog(dialog)
-                self.update_table()
+                self.selected_row = self.grid.patch_row(member_id)
+                if self.selected_row is None:
+                    self.selected_member_id = None
             except Exception as e:
                 self.show_snackbar(f"حدث خطأ أثناء تعديل البيانات: {e}")
         else:
@@ -119,38 +120,35 @@ class ShowSubscribersPage:
 
     def confirm_delete(self, member_id, dialog):
         try:
-            cursor = self.db.conn.cursor()
-            cursor.execute("DELETE FROM members WHERE member_id=?", (member_id,))
-            self.db.conn.commit()
+            self.db.write(lambda cursor: cursor.execute("DELETE FROM members WHERE member_id=?", (member_id,)))
             self.show_snackbar("تم حذف المشترك بنجاح!")
             self.close_dialog(dialog)
-            self.update_table()
+            self.grid.remove_row(member_id)
+            self.selected_row = None
+            self.selected_member_id = None
         except Exception as e:
             self.show_snackbar(f"حدث خطأ أثناء الحذف: {e}")
 
-    def update_table(self):
-        # تحديث البيانات في الجدول
-        self.rows = self.get_members_data()
-        self.data_rows.clear()
-        self.data_rows.extend([
-            ft.Container(
-                content=ft.Row(
-                    [
-                        ft.Container(
-                            content=ft.Text(str(row[col])),
-                            width=120,
-                            alignment=ft.alignment.center,
-                            padding=10,
-                            bgcolor=None,
-                        ) for col in ["total_due", "contribution", "name", "rank", "member_id"]
-                    ],
-                    alignment=ft.MainAxisAlignment.CENTER,
-                ),
-                on_click=lambda e, row=row: self.select_row(e, row),
-            ) for idx, row in enumerate(self.rows)
-        ])
-        self.scrollable_data.controls = self.data_rows
-        self.page.update()
+    def filter_by_name(self, e):
+        """تصفية المشتركين الذين يبدأ اسمهم بالنص المكتوب"""
+        text = self.name_filter.value.strip()
+        clause, params = prefix_filter("name", text) if text else (None, ())
+        self.grid.set_filter("name", clause, params)
+
+    def filter_by_rank(self, e):
+        rank = self.rank_filter.value
+        self.grid.set_filter("rank", "rank = ?" if rank else None, (rank,) if rank else ())
+
+    def load_ranks(self):
+        """خيارات الرتب من الفهرس (rank, name) بدون مسح الجدول"""
+        ranks = members.ranks(self.db)
+        self.rank_filter.options = [ft.dropdown.Option("", "كل الرتب")] + [ft.dropdown.Option(rank) for rank in ranks]
+
+    def refresh(self):
+        """إعادة تحميل نافذة الجدول فقط عند الرجوع للصفحة"""
+        self.load_ranks()
+        self.grid.reload()
+        self.rank_filter.update()
 
     def close_dialog(self, dialog):
         dialog.open = False
@@ -182,69 +180,27 @@ class ShowSubscribersPage:
             "total_due": "المبلغ المستحق",
         }
 
-        # صف العناوين الثابت
-        self.header_row = ft.Container(
-            content=ft.Row(
-                [
-                    ft.Container(
-                        content=ft.Text(column_names[col], weight=ft.FontWeight.BOLD),
-                        width=120,
-                        alignment=ft.alignment.center,
-                        padding=10,
-                        bgcolor=ft.colors.GREEN,
-                    ) for col in columns
-                ],
-                alignment=ft.MainAxisAlignment.CENTER,
-            ),
-            bgcolor=ft.colors.GREEN,
-            shadow=ft.BoxShadow(blur_radius=30, color="green"),
-            width=600,
+        # مرشحات الجدول: تتحول إلى شروط WHERE في الاستعلام
+        self.name_filter = ft.TextField(label="الاسم", width=180, height=40, text_size=12, on_change=self.name_debouncer)
+        self.rank_filter = ft.Dropdown(label="الرتبة", width=150, text_size=12, on_change=self.filter_by_rank)
+        self.load_ranks()
+        filters_row = ft.Row(
+            [self.rank_filter, self.name_filter],
+            alignment=ft.MainAxisAlignment.CENTER,
+            spacing=10,
         )
 
-        # بيانات الجدول
-        self.rows = self.get_members_data()
-        self.data_rows = [
-            ft.Container(
-                content=ft.Row(
-                    [
-                        ft.Container(
-                            content=ft.Text(str(row[col])),
-                            width=120,
-                            alignment=ft.alignment.center,
-                            padding=10,
-                            bgcolor=None,
-                        ) for col in columns
-                    ],
-                    alignment=ft.MainAxisAlignment.CENTER,
-                ),
-                on_click=lambda e, row=row: self.select_row(e, row),
-            ) for idx, row in enumerate(self.rows)
-        ]
-
-        # الجدول مع سكرول بار
-        self.scrollable_data = ft.ListView(
-            self.data_rows,
-            height=300,
+        # الجدول يحمل الصفوف على دفعات ويبني عناصر النافذة الظاهرة فقط
+        self.grid = DataGrid(
+            self.db,
+            **GRID,
+            display_columns=columns,
+            column_names=column_names,
+            widths={col: 120 for col in columns},
             width=640,
-            spacing=0,
-            padding=0,
-        )
-
-        # تغليف ListView داخل Container
-        scrollable_container = ft.Container(
-            content=self.scrollable_data,
-            bgcolor=ft.colors.LIGHT_GREEN,
-            shadow=ft.BoxShadow(blur_radius=30, color="green"),
-        )
-
-        # وضع صف العناوين والبيانات في عمود
-        self.table = ft.Column(
-            [
-                self.header_row,
-                scrollable_container,
-            ],
-            spacing=0,
+            on_select=self.select_row,
         )
+        self.table = self.grid.build()
 
         # وضع الأزرار في سطر واحد باستخدام الزر الموحد
         btn_edit = create_button("تعديل", lambda e: self.edit_member(e), bgcolor=ft.colors.AMBER)
@@ -264,6 +220,8 @@ class ShowSubscribersPage:
                     ft.Container(height=5),
                     title,
                     ft.Container(height=5),
+                    filters_row,
+                    ft.Container(height=5),
                     self.table,
                     ft.Container(height=10),
                     buttons_row,
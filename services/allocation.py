@@ -0,0 +1,157 @@
+"""توزيع تكلفة النثريات على المشتركين بعمليات متجهة على مصفوفات NumPy.
+
+استهلاك الفترة يُقرأ باستعلام تجميعي واحد إلى مصفوفات (مشترك × نوع
+وجبة)، ثم تحسب الاستراتيجية وزن كل مشترك، ويُقسم المبلغ بالقروش مع
+تقريب أكبر الباقي حتى يساوي مجموع الحصص المبلغ الكلي تمامًا.
+
+الاستراتيجيات المتاحة (STRATEGIES):
+    meal_count        حسب عدد الوجبات
+    meal_type_weight  حسب عدد الوجبات موزونًا بنوع الوجبة (MEAL_TYPE_WEIGHTS)
+    cost_share        حسب نصيب المشترك من تكلفة الوجبات
+
+إذا كان مجموع الأوزان صفرًا (مثل cost_share في فترة كل وجباتها بلا
+تكلفة) يُوزع المبلغ حسب عدد الوجبات، ثم بالتساوي، بدل إيقاف التقفيل.
+"""
+import logging
+from dataclasses import dataclass
+
+import numpy as np
+
+# وزن كل نوع وجبة في استراتيجية meal_type_weight؛ الأنواع غير المذكورة وزنها 1.
+# النثريات (غاز، خبز، منظفات...) تُستهلك بقدر حجم الوجبة لا بعددها فقط،
+# والغداء هو الوجبة الرئيسية ويُطبخ له تقريبًا مرة ونصف ما يُطبخ للفطار أو
+# العشاء. القيم افتراضية ويمكن تمريرها مختلفة عبر allocate(..., weights=...)
+MEAL_TYPE_WEIGHTS = {
+    "فطار": 1.0,
+    "غداء": 1.5,
+    "عشاء": 1.0,
+}
+
+DEFAULT_STRATEGY = "meal_count"
+
+CONSUMPTION_SQL = """
+    SELECT member_id, COALESCE(meal_type, ''), COUNT(*), COALESCE(SUM(final_cost), 0)
+    FROM meal_records
+    WHERE period_id = ?
+    GROUP BY member_id, meal_type
+"""
+
+STRATEGIES = {}
+
+
+def strategy(name):
+    """تسجيل دالة أوزان: تستقبل Consumption (وخيارات اختيارية) وتعيد مصفوفة وزن لكل مشترك"""
+    def register(weights):
+        STRATEGIES[name] = weights
+        return weights
+    return register
+
+
+@dataclass
+class Consumption:
+    """استهلاك الفترة: صف لكل مشترك وعمود لكل نوع وجبة"""
+    member_ids: np.ndarray
+    meal_types: list
+    meal_counts: np.ndarray
+    meal_costs: np.ndarray
+
+    @property
+    def total_meals(self):
+        """عدد وجبات كل مشترك"""
+        return self.meal_counts.sum(axis=1)
+
+    def __len__(self):
+        return len(self.member_ids)
+
+
+@strategy("meal_count")
+def _by_meal_count(consumption):
+    return consumption.total_meals.astype(np.float64)
+
+
+@strategy("meal_type_weight")
+def _by_meal_type_weight(consumption, weights=None):
+    weights = MEAL_TYPE_WEIGHTS if weights is None else weights
+    type_weights = np.array([weights.get(t, 1.0) for t in consumption.meal_types], dtype=np.float64)
+    return consumption.meal_counts @ type_weights
+
+
+@strategy("cost_share")
+def _by_cost_share(consumption):
+    return consumption.meal_costs.sum(axis=1)
+
+
+def load_consumption(cursor, period_id):
+    """قراءة عدد وتكلفة وجبات كل مشترك حسب نوع الوجبة في الفترة"""
+    cursor.execute(CONSUMPTION_SQL, (period_id,))
+    rows = cursor.fetchall()
+    if not rows:
+        empty = np.zeros((0, 0))
+        return Consumption(np.zeros(0, dtype=np.int64), [], empty, empty)
+
+    member_col, type_col, count_col, cost_col = zip(*rows)
+    member_ids, member_index = np.unique(np.array(member_col, dtype=np.int64), return_inverse=True)
+    meal_types, type_index = np.unique(np.array(type_col, dtype=object), return_inverse=True)
+    counts = np.zeros((len(member_ids), len(meal_types)), dtype=np.int64)
+    costs = np.zeros((len(member_ids), len(meal_types)), dtype=np.float64)
+    counts[member_index, type_index] = count_col
+    costs[member_index, type_index] = cost_col
+    return Consumption(member_ids, list(meal_types), counts, costs)
+
+
+def largest_remainder(total, weights, decimals=2):
+    """تقسيم total بنسب weights مقربًا إلى decimals منازل بحيث يساوي المجموع total تمامًا.
+
+    كل حصة تُقرب للأسفل بوحدة التقريب (القرش)، ثم تُعطى الوحدات المتبقية
+    للحصص ذات أكبر كسور محذوفة.
+    """
+    weights = np.asarray(weights, dtype=np.float64)
+    weight_sum = weights.sum()
+    if weights.size == 0 or weight_sum <= 0:
+        raise ValueError("Cannot allocate over zero total weight")
+    scale = 10 ** decimals
+    total_units = int(round(total * scale))
+    exact = weights / weight_sum * total_units
+    units = np.floor(exact).astype(np.int64)
+    leftover = total_units - int(units.sum())
+    if leftover:
+        # ترتيب مستقر: عند تساوي الكسور تأخذ الأسبقية الصفوف الأولى
+        order = np.argsort(-(exact - units), kind="stable")
+        units[order[:leftover]] += 1
+    return units / scale
+
+
+def allocate(consumption, total, strategy_name=DEFAULT_STRATEGY, decimals=2, **options):
+    """حصة كل مشترك من total حسب الاستراتيجية؛ مصفوفة بترتيب consumption.member_ids.
+
+    options تُمرر لدالة الأوزان (مثل weights لاستراتيجية meal_type_weight).
+    إذا كان مجموع الأوزان صفرًا يُوزع حسب عدد الوجبات ثم بالتساوي.
+    """
+    try:
+        weights_for = STRATEGIES[strategy_name]
+    except KeyError:
+        raise ValueError(f"Unknown allocation strategy: {strategy_name}") from None
+    weights = np.asarray(weights_for(consumption, **options), dtype=np.float64)
+    if weights.size and not weights.sum() > 0:
+        fallback, weights = "meal_count", _by_meal_count(consumption)
+        if not weights.sum() > 0:
+            fallback, weights = "equal", np.ones(len(consumption))
+        logging.warning(f"Allocation strategy {strategy_name} gave zero total weight, falling back to {fallback}")
+    return largest_remainder(total, weights, decimals)
+
+
+def write_allocation(cursor, consumption, amounts, period_id, distribution_date):
+    """تسجيل الحصص في miscellaneous_contributions وإضافتها لديون المشتركين"""
+    member_ids = consumption.member_ids.tolist()
+    amounts = amounts.tolist()
+    meal_counts = consumption.total_meals.tolist()
+    cursor.executemany(
+        "INSERT INTO miscellaneous_contributions "
+        "(member_id, misc_amount, meal_count, distribution_date, period_id) VALUES (?, ?, ?, ?, ?)",
+        [(member_id, amount, count, distribution_date, period_id)
+         for member_id, amount, count in zip(member_ids, amounts, meal_counts)]
+    )
+    cursor.executemany(
+        "UPDATE members SET total_due = total_due + ? WHERE member_id = ?",
+        list(zip(amounts, member_ids))
+    )
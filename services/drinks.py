@@ -0,0 +1,44 @@
+"""تسجيل استهلاك المشروبات بدون واجهة."""
+from database import reserve_stock
+from services.reference import reference_store
+
+DRINK_PRICE_SQL = "SELECT expense_id, price FROM expenses WHERE item_name = ? AND is_drink = 1"
+CHARGE_MEMBER_SQL = "UPDATE members SET total_due = total_due + ? WHERE member_id = ?"
+
+
+class UnknownDrinkError(LookupError):
+    """المشروب غير موجود في المخزون"""
+
+
+def drink_names(db):
+    """أسماء المشروبات المتاحة في المخزون"""
+    return reference_store(db).drink_names()
+
+
+def add_drink(cursor, date, drink_name, member_id, quantity):
+    """تحميل مشترك بكمية من مشروب داخل المعاملة الحالية.
+
+    يرفع UnknownDrinkError إذا لم يوجد المشروب، و InsufficientStockError
+    إذا لم تكفِ الكمية المتبقية. يعيد التكلفة الإجمالية.
+    """
+    if quantity <= 0:
+        raise ValueError("Drink quantity must be positive")
+    cursor.execute(DRINK_PRICE_SQL, (drink_name,))
+    price_data = cursor.fetchone()
+    if not price_data:
+        raise UnknownDrinkError(drink_name)
+    expense_id, unit_price = price_data
+    # إنقاص مشروط: لا يُباع نفس المخزون مرتين من جلستين
+    reserve_stock(cursor, [(expense_id, quantity)])
+    total_cost = quantity * unit_price
+    cursor.execute(CHARGE_MEMBER_SQL, (total_cost, member_id))
+    cursor.execute(
+        "INSERT INTO drink_records (date, drink_name, member_id, quantity, total_cost) VALUES (?, ?, ?, ?, ?)",
+        (date, drink_name, member_id, quantity, total_cost)
+    )
+    return total_cost
+
+
+def record_drink(db, date, drink_name, member_id, quantity):
+    """تسجيل استهلاك مشروب كعملية كتابة مستقلة؛ انظر add_drink"""
+    return db.write(lambda cursor: add_drink(cursor, date, drink_name, member_id, quantity))
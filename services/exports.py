@@ -0,0 +1,173 @@
+"""تصدير التقارير إلى ملفات بدون واجهة، لتعمل كمهام خلفية (utils.jobs).
+
+كل دالة تكتب في ملف مؤقت بجوار الملف المطلوب وتنقله إليه عند الانتهاء،
+فالإلغاء أو الخطأ لا يترك ملفًا ناقصًا. job اختياري: إذا مُرر تُبلغ
+الدالة عن تقدمها وتتوقف عند طلب الإلغاء. تقارير الفترات المغلقة تمر
+بذاكرة التقارير المرسومة (services.report_cache) فيُنسخ تكرار تصديرها
+من القرص.
+"""
+import math
+import os
+from contextlib import contextmanager
+
+from services import report_cache, reports
+from utils.pdf_fonts import FONT_NAME, register_arabic_font
+
+# عدد صفوف المشتركين في كل دفعة كتابة إلى Excel (بين الدفعات يُحدث التقدم ويُفحص الإلغاء)
+EXCEL_CHUNK_ROWS = 500
+# تقدير عدد صفوف الجدول في صفحة PDF لحساب نسبة التقدم
+PDF_ROWS_PER_PAGE = 40
+# جدول المشتركين في PDF يُقسم إلى جداول بهذا العدد من الصفوف: تقسيم reportlab
+# لجدول واحد كبير على الصفحات يتضاعف زمنه مع عدد الصفوف
+PDF_TABLE_CHUNK_ROWS = 1000
+
+
+def _report(job, done, total, message=None):
+    if job is not None:
+        job.report(done, total, message)
+
+
+@contextmanager
+def atomic_output(path):
+    """مسار ملف مؤقت يُنقل إلى path عند النجاح ويُحذف عند أي استثناء"""
+    root, extension = os.path.splitext(path)
+    temporary = f"{root}.partial{extension}"
+    try:
+        yield temporary
+        os.replace(temporary, path)
+    except BaseException:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+        raise
+
+
+def column_widths(rows, available):
+    """عرض كل عمود بنسبة أطول نص فيه، ليتطابق عرض الأعمدة في كل أجزاء الجدول"""
+    longest = [1] * len(rows[0])
+    for row in rows:
+        for index, value in enumerate(row):
+            longest[index] = max(longest[index], len(str(value)))
+    total = sum(longest)
+    return [available * length / total for length in longest]
+
+
+def month_report_excel(path, frames, job=None):
+    """كتابة تقرير تقفيل الشهر (frames من ComprehensiveReport.to_frames) إلى Excel"""
+    import pandas as pd
+
+    members = frames["members"]
+    total = len(members) + 1
+    with atomic_output(path) as output:
+        with pd.ExcelWriter(output) as writer:
+            frames["summary"].to_excel(writer, sheet_name="ملخص", index=False)
+            _report(job, 1, total, "الملخص")
+            if members.empty:
+                members.to_excel(writer, sheet_name="المشتركين", index=False)
+            for start in range(0, len(members), EXCEL_CHUNK_ROWS):
+                members.iloc[start:start + EXCEL_CHUNK_ROWS].to_excel(
+                    writer, sheet_name="المشتركين", index=False,
+                    header=start == 0, startrow=start + 1 if start else 0,
+                )
+                done = min(start + EXCEL_CHUNK_ROWS, len(members))
+                _report(job, done + 1, total, f"المشتركين {done}/{len(members)}")
+    return path
+
+
+def month_report_pdf(path, frames, job=None):
+    """كتابة تقرير تقفيل الشهر إلى PDF؛ التقدم يُحسب من عدد الصفحات المرسومة"""
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+
+    summary, members = frames["summary"], frames["members"]
+    expected_pages = 1 + math.ceil(len(members) / PDF_ROWS_PER_PAGE)
+
+    def on_page(canvas, doc):
+        # يُستدعى عند رسم كل صفحة؛ الإلغاء يوقف البناء برفع JobCancelled
+        _report(job, min(doc.page, expected_pages), expected_pages + 1, f"الصفحة {doc.page}")
+
+    with atomic_output(path) as output:
+        doc = SimpleDocTemplate(output, pagesize=A4,
+                                rightMargin=30, leftMargin=30,
+                                topMargin=30, bottomMargin=30)
+        elements = []
+        styles = getSampleStyleSheet()
+        title_style = styles["Title"]
+
+        # الخط العربي إن وُجد
+        if register_arabic_font():
+            title_style.fontName = FONT_NAME
+        else:
+            title_style.fontName = "Helvetica"
+
+        title_style.alignment = 2  # محاذاة لليمين
+
+        elements.append(Paragraph("التقرير الشامل لتقفيل الشهر", title_style))
+        elements.append(Spacer(1, 20))
+
+        elements.append(Paragraph("الملخص المالي:", styles["Heading2"]))
+        summary_data = [summary.columns.tolist()] + summary.values.tolist()
+        summary_table = Table(summary_data)
+        summary_table.setStyle(TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('ALIGN', (0, 0), (-1, -1), 'RIGHT'),
+            ('FONTNAME', (0, 0), (-1, 0), title_style.fontName),
+            ('FONTSIZE', (0, 0), (-1, -1), 10),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+            ('GRID', (0, 0), (-1, -1), 1, colors.black),
+        ]))
+        elements.append(summary_table)
+        elements.append(Spacer(1, 20))
+
+        elements.append(Paragraph("تفاصيل المشتركين:", styles["Heading2"]))
+        header, rows = members.columns.tolist(), members.values.tolist()
+        widths = column_widths([header] + rows, A4[0] - 60)
+        members_style = TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('ALIGN', (0, 0), (-1, -1), 'RIGHT'),
+            ('FONTNAME', (0, 0), (-1, 0), title_style.fontName),
+            ('FONTSIZE', (0, 0), (-1, -1), 8),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+            ('GRID', (0, 0), (-1, -1), 1, colors.black),
+        ])
+        for start in range(0, max(len(rows), 1), PDF_TABLE_CHUNK_ROWS):
+            chunk = Table([header] + rows[start:start + PDF_TABLE_CHUNK_ROWS], colWidths=widths, repeatRows=1)
+            chunk.setStyle(members_style)
+            elements.append(chunk)
+        _report(job, 0, expected_pages + 1, "تجهيز الجداول")
+        doc.build(elements, onFirstPage=on_page, onLaterPages=on_page)
+    return path
+
+
+# امتداد الملف -> دالة كتابة تقرير الفترة
+PERIOD_REPORT_WRITERS = {
+    ".xlsx": month_report_excel,
+    ".pdf": month_report_pdf,
+}
+
+
+def period_report(db, period_id, path, job=None):
+    """تصدير التقرير الشامل لفترة إلى path (الصيغة من امتداده).
+
+    الفترة المغلقة تُنسخ من ذاكرة التقارير إن رُسمت من قبل، وإلا تُرسم
+    وتُحفظ فيها؛ الفترة المفتوحة تُرسم دائمًا.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    writer = PERIOD_REPORT_WRITERS[extension]
+
+    def load():
+        report = reports.comprehensive_report(db, period_id)
+        if report is None:
+            raise ValueError("No members in this period")
+        return report
+
+    report_cache.ReportCache(db).export(
+        f"month_report{extension}", report_cache.period_archive_key(db, period_id), path,
+        load, lambda report, output: writer(output, report.to_frames(), job),
+    )
+    return path
@@ -0,0 +1,82 @@
+"""تسجيل الوجبات بدون واجهة.
+
+add_meal تعمل على مؤشر داخل معاملة قائمة، فيمكن تجميع عدة وجبات في
+معاملة واحدة (دفعات، سطر أوامر، قياس أداء)، و record_meal تنفذها
+كعملية كتابة مستقلة عبر DatabaseManager.
+"""
+import json
+
+from database import reserve_stock
+from services.reference import reference_store
+
+# أسعار الأصناف المحجوزة للوجبة: json_each بقائمة المعرفات
+ITEM_PRICES_SQL = "SELECT expense_id, price FROM expenses WHERE expense_id IN (SELECT value FROM json_each(?))"
+# المتبقي يتغير مع كل بيع فلا يُحفظ في مخزن البيانات المرجعية
+MEAL_STOCK_SQL = "SELECT expense_id, remaining FROM expenses WHERE is_drink = 0 AND is_miscellaneous = 0"
+CHARGE_MEMBERS_SQL = "UPDATE members SET total_due = total_due + ? WHERE member_id IN (SELECT value FROM json_each(?))"
+
+
+def meal_options(db):
+    """لقطة المخزون للأصناف: {expense_id: (الاسم، السعر، المتبقي)}.
+
+    الاسم والسعر من مخزن البيانات المرجعية، والمتبقي باستعلام واحد.
+    """
+    items = reference_store(db).meal_options()
+    stock = dict(db.fetch_all(MEAL_STOCK_SQL))
+    return {expense_id: (name, price, stock.get(expense_id, 0)) for expense_id, (name, price) in items.items()}
+
+
+def member_options(db):
+    """المشتركون للاختيار: [(member_id، "الرتبة الاسم")]"""
+    return reference_store(db).member_options()
+
+
+def add_meal(cursor, meal_type, date, member_ids, quantities, misc_total=None):
+    """تسجيل وجبة مشتركة بين member_ids داخل المعاملة الحالية.
+
+    quantities: {expense_id: الكمية}. الكميات تُحجز بإنقاص مشروط (يرفع
+    InsufficientStockError إذا لم يكفِ المخزون)، وتُقسم التكلفة ومبلغ
+    المصاريف الأخرى misc_total بالتساوي على الأعضاء.
+    يعيد [(meal_record_id, member_id)] للسجلات المدرجة.
+    """
+    if not member_ids:
+        raise ValueError("A meal needs at least one member")
+
+    # حجز الكميات بإنقاص مشروط ثم جلب أسعار الأصناف باستعلام واحد
+    total_cost = 0
+    if quantities:
+        reserve_stock(cursor, quantities.items())
+        cursor.execute(ITEM_PRICES_SQL, (json.dumps(list(quantities)),))
+        prices = dict(cursor.fetchall())
+        total_cost = sum(quantity * prices[expense_id] for expense_id, quantity in quantities.items())
+
+    # حساب التكلفة لكل عضو
+    cost_per_member = total_cost / len(member_ids)
+    misc_amount_per_member = misc_total / len(member_ids) if misc_total is not None else 0
+    member_ids_json = json.dumps(list(member_ids))
+
+    # تحديث إجمالي المدين لكل الأعضاء المختارين بأمر واحد
+    cursor.execute(CHARGE_MEMBERS_SQL, (cost_per_member + misc_amount_per_member, member_ids_json))
+
+    # إدراج سجلات الوجبات لكل الأعضاء بأمر واحد
+    cursor.execute(
+        "INSERT INTO meal_records (meal_type, date, member_id, final_cost) "
+        "SELECT ?, ?, value, ? FROM json_each(?) "
+        "RETURNING meal_record_id, member_id",
+        (meal_type, date, cost_per_member, member_ids_json)
+    )
+    meal_records = cursor.fetchall()
+
+    # إدراج المصروف النثري المرتبط بكل عضو ووجبته
+    if misc_total is not None:
+        cursor.executemany(
+            "INSERT INTO miscellaneous_expenses (date, amount, meal_type, meal_record_id, member_id) VALUES (?, ?, ?, ?, ?)",
+            [(date, misc_amount_per_member, meal_type, meal_record_id, member_id)
+             for meal_record_id, member_id in meal_records]
+        )
+    return meal_records
+
+
+def record_meal(db, meal_type, date, member_ids, quantities, misc_total=None):
+    """تسجيل وجبة كعملية كتابة مستقلة؛ انظر add_meal"""
+    return db.write(lambda cursor: add_meal(cursor, meal_type, date, member_ids, quantities, misc_total))
@@ -0,0 +1,40 @@
+"""إدارة المشتركين بدون واجهة."""
+from datetime import datetime
+
+from services.name_index import name_source
+
+NAME_COUNT_SQL = "SELECT COUNT(*) FROM members WHERE name = ?"
+RANKS_SQL = "SELECT DISTINCT rank FROM members WHERE rank IS NOT NULL ORDER BY rank"
+
+
+class DuplicateMemberError(ValueError):
+    """يوجد مشترك مسجل بنفس الاسم"""
+
+
+def similar_names(db, query, limit=20):
+    """أسماء المشتركين التي تحتوي على query، من فهرس الأسماء في الذاكرة"""
+    return name_source(db, "members").search(query, limit)
+
+
+def ranks(db):
+    """الرتب المسجلة بدون تكرار، مرتبة"""
+    return [row[0] for row in db.fetch_cached(RANKS_SQL)]
+
+
+def add_member(cursor, rank, name, contribution, date=None):
+    """إضافة مشترك داخل المعاملة الحالية؛ يرفع DuplicateMemberError إذا كان الاسم مكررًا"""
+    if contribution < 0:
+        raise ValueError("Contribution must not be negative")
+    cursor.execute(NAME_COUNT_SQL, (name,))
+    if cursor.fetchone()[0] > 0:
+        raise DuplicateMemberError(name)
+    cursor.execute(
+        "INSERT INTO members (rank, name, contribution, date) VALUES (?, ?, ?, ?)",
+        (rank, name, contribution, date or datetime.now().strftime("%Y-%m-%d"))
+    )
+    return cursor.lastrowid
+
+
+def register_member(db, rank, name, contribution, date=None):
+    """إضافة مشترك كعملية كتابة مستقلة؛ يعيد member_id"""
+    return db.write(lambda cursor: add_member(cursor, rank, name, contribution, date))
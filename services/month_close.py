@@ -0,0 +1,290 @@
+"""تقفيل الشهر كعملية محفوظة على مراحل قابلة للاستئناف.
+
+كل تقفيل يُسجَّل في month_close_runs مرتبطًا بالفترة التي يغلقها، وكل
+مرحلة تنفذ عملها وتكتب نقطة الحفظ الخاصة بها في month_close_stages ضمن
+معاملة كتابة واحدة: إما أن تُحفظ المرحلة كاملة مع نقطتها أو لا يُحفظ
+منها شيء. عند إعادة التشغيل بعد انقطاع تُتخطى المراحل المكتملة ويُستأنف
+التقفيل من أول مرحلة لم تكتمل.
+
+المراحل تعمل على فترة التشغيل (period_id) وليس على الفترة المفتوحة،
+لذلك تبقى صحيحة حتى بعد إغلاق الفترة وفتح فترة جديدة.
+"""
+import logging
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+
+from database import close_period
+from services import allocation, reports
+
+FIRST_TRANSACTION_DATE_SQL = """
+    SELECT MIN(d) FROM (
+        SELECT MIN(date) AS d FROM meal_records WHERE period_id = ?
+        UNION ALL SELECT MIN(date) FROM drink_records WHERE period_id = ?
+        UNION ALL SELECT MIN(date) FROM expenses
+    )
+"""
+
+MISC_TOTALS_SQL = "SELECT COUNT(*), SUM(total_price) FROM expenses WHERE is_miscellaneous = 1"
+
+# نسخ أصناف المخزون (النثريات أو غيرها) إلى expenses_archive بمفتاح الأرشيف
+ARCHIVE_EXPENSES_SQL = """
+    INSERT OR REPLACE INTO expenses_archive
+        (expense_id, item_name, quantity, price, total_price, consumption, remaining,
+         is_miscellaneous, is_drink, date, archive_key_id)
+    SELECT expense_id, item_name, quantity, price, total_price, consumption, remaining,
+           is_miscellaneous, is_drink, date, ?
+    FROM expenses
+    WHERE is_miscellaneous = ?
+"""
+
+DELETE_MISC_SQL = "DELETE FROM expenses WHERE is_miscellaneous = 1"
+
+SNAPSHOT_MEMBERS_SQL = """
+    INSERT OR REPLACE INTO members_archive
+        (member_id, name, rank, contribution, total_due, date, archive_key_id)
+    SELECT member_id, name, rank, contribution, total_due, date, ?
+    FROM members
+"""
+
+ZERO_STOCK_SQL = "UPDATE expenses SET remaining = 0 WHERE is_miscellaneous = 0"
+
+PENDING_RUN_SQL = "SELECT run_id, period_id, archive_key_id FROM month_close_runs WHERE status = 'running'"
+
+STAGE_DONE_SQL = "SELECT duration_ms, detail FROM month_close_stages WHERE run_id = ? AND stage = ?"
+
+
+@dataclass
+class CloseRun:
+    """تشغيل تقفيل واحد"""
+    run_id: int
+    period_id: int
+    archive_key_id: int = None
+
+
+@dataclass
+class StageResult:
+    """نتيجة مرحلة؛ skipped تعني أنها اكتملت في محاولة سابقة"""
+    stage: str
+    label: str
+    duration_ms: float
+    detail: str = ""
+    skipped: bool = False
+
+
+@dataclass
+class CloseResult:
+    """نتيجة التقفيل: المراحل بتوقيتاتها والتقرير النهائي للفترة المغلقة"""
+    run: CloseRun
+    stages: list = field(default_factory=list)
+    report: reports.ComprehensiveReport = None
+    report_ms: float = 0.0
+
+    def timings(self):
+        """توقيت كل مرحلة بالمللي ثانية: [(المرحلة، المدة)]"""
+        return [(s.stage, s.duration_ms) for s in self.stages] + [("report", self.report_ms)]
+
+
+def now_text():
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+
+def first_transaction_date(cursor, period_id):
+    """أقل تاريخ سجل في الفترة عبر الوجبات والمشروبات والمشتروات"""
+    cursor.execute(FIRST_TRANSACTION_DATE_SQL, (period_id, period_id))
+    return cursor.fetchone()[0]
+
+
+def archive_key_for_period(cursor, period_id):
+    """مفتاح الأرشيف المرتبط بالفترة، يُنشأ ويُربط بها عند أول طلب"""
+    cursor.execute("SELECT archive_key_id, start_date FROM periods WHERE period_id = ?", (period_id,))
+    row = cursor.fetchone()
+    if row is None:
+        raise ValueError(f"Unknown period {period_id}")
+    archive_key_id, start_date = row
+    if archive_key_id:
+        return archive_key_id
+
+    now_date = datetime.now().strftime("%Y-%m-%d")
+    first_date = first_transaction_date(cursor, period_id) or start_date or now_date
+    cursor.execute(
+        "INSERT INTO archive_keys (archive_name, start_date, end_date, archived_at) VALUES (?, ?, ?, ?)",
+        (f"Dist_{first_date}_to_{now_date}", first_date, now_date, now_text())
+    )
+    archive_key_id = cursor.lastrowid
+    cursor.execute(
+        "UPDATE periods SET archive_key_id = ? WHERE period_id = ?",
+        (archive_key_id, period_id)
+    )
+    return archive_key_id
+
+
+def distribute_miscellaneous(cursor, period_id, archive_key_id=None,
+                             strategy=allocation.DEFAULT_STRATEGY, **options):
+    """توزيع النثريات على المشتركين حسب استهلاكهم في الفترة ثم أرشفتها.
+
+    الحصص تُحسب بمحرك التوزيع (services.allocation) حسب الاستراتيجية
+    وتُقرب بالقروش بحيث يساوي مجموعها قيمة النثريات، ثم تُنقل أصناف
+    النثريات إلى الأرشيف وتُحذف، فتكرار الاستدعاء بعد نجاحه لا يجد
+    نثريات يوزعها. إذا لم يُمرر مفتاح الأرشيف يُستخدم مفتاح الفترة
+    (ويُنشأ فقط عند وجود ما يُوزع). options تُمرر إلى allocation.allocate.
+    يعيد (عدد الأصناف، القيمة الإجمالية، عدد الوجبات).
+    """
+    cursor.execute(MISC_TOTALS_SQL)
+    item_count, total_value = cursor.fetchone()
+    if not item_count:
+        return 0, 0.0, 0
+    total_value = total_value or 0.0
+    consumption = allocation.load_consumption(cursor, period_id)
+    total_meals = int(consumption.meal_counts.sum())
+    if not total_meals:
+        return item_count, total_value, 0
+
+    if archive_key_id is None:
+        archive_key_id = archive_key_for_period(cursor, period_id)
+    amounts = allocation.allocate(consumption, total_value, strategy, **options)
+    allocation.write_allocation(
+        cursor, consumption, amounts, period_id, datetime.now().strftime("%Y-%m-%d")
+    )
+
+    cursor.execute(ARCHIVE_EXPENSES_SQL, (archive_key_id, 1))
+    cursor.execute(DELETE_MISC_SQL)
+    logging.info(
+        f"Distributed {item_count} miscellaneous items ({total_value}) over "
+        f"{len(consumption)} members / {total_meals} meals by {strategy}"
+    )
+    return item_count, total_value, total_meals
+
+
+# ---- المراحل: كل مرحلة تعمل داخل معاملة الكتابة وتعيد وصفًا مختصرًا لما فعلته ----
+
+def _stage_archive_key(cursor, run):
+    run.archive_key_id = archive_key_for_period(cursor, run.period_id)
+    cursor.execute(
+        "UPDATE month_close_runs SET archive_key_id = ? WHERE run_id = ?",
+        (run.archive_key_id, run.run_id)
+    )
+    return f"archive key {run.archive_key_id}"
+
+
+def _stage_distribute(cursor, run):
+    items, value, meals = distribute_miscellaneous(cursor, run.period_id, run.archive_key_id)
+    if not items:
+        return "no miscellaneous items"
+    if not meals:
+        return f"{items} items kept: no meals in period"
+    return f"{items} items ({value}) over {meals} meals"
+
+
+def _stage_snapshot_members(cursor, run):
+    cursor.execute(SNAPSHOT_MEMBERS_SQL, (run.archive_key_id,))
+    return f"{cursor.rowcount} members"
+
+
+def _stage_snapshot_stock(cursor, run):
+    cursor.execute(ARCHIVE_EXPENSES_SQL, (run.archive_key_id, 0))
+    archived = cursor.rowcount
+    cursor.execute(ZERO_STOCK_SQL)
+    return f"{archived} stock items"
+
+
+def _stage_close_period(cursor, run):
+    cursor.execute("SELECT closed_at FROM periods WHERE period_id = ?", (run.period_id,))
+    if cursor.fetchone()[0] is not None:
+        return "already closed"
+    close_period(cursor, run.archive_key_id)
+    return f"period {run.period_id} closed"
+
+
+# (الاسم، العنوان المعروض، الدالة) بترتيب التنفيذ
+STAGES = [
+    ("archive_key", "تجهيز مفتاح الأرشيف", _stage_archive_key),
+    ("distribute_misc", "توزيع النثريات", _stage_distribute),
+    ("snapshot_members", "أرشفة أرصدة المشتركين", _stage_snapshot_members),
+    ("snapshot_stock", "أرشفة المخزون وتصفير المتبقي", _stage_snapshot_stock),
+    ("close_period", "إغلاق الفترة", _stage_close_period),
+]
+
+
+def pending_run(db):
+    """تشغيل تقفيل سابق لم يكتمل، أو None"""
+    row = db.fetch_one(PENDING_RUN_SQL)
+    return CloseRun(*row) if row else None
+
+
+def start_run(db):
+    """بدء تشغيل جديد للفترة المفتوحة، أو إرجاع التشغيل المعلق لاستئنافه"""
+    def create(cursor):
+        cursor.execute(PENDING_RUN_SQL)
+        row = cursor.fetchone()
+        if row:
+            return CloseRun(*row)
+        cursor.execute("""
+            INSERT INTO month_close_runs (period_id, started_at)
+            SELECT period_id, ? FROM periods WHERE closed_at IS NULL
+        """, (now_text(),))
+        if cursor.rowcount != 1:
+            raise RuntimeError("No open period to close")
+        cursor.execute("SELECT period_id FROM periods WHERE closed_at IS NULL")
+        return CloseRun(cursor.lastrowid, cursor.fetchone()[0])
+
+    return db.write(create)
+
+
+def _run_stage(cursor, run, stage, label, fn):
+    """تنفيذ مرحلة مع نقطة حفظها، أو تخطيها إذا اكتملت سابقًا"""
+    cursor.execute(STAGE_DONE_SQL, (run.run_id, stage))
+    done = cursor.fetchone()
+    if done:
+        return StageResult(stage, label, done[0] or 0.0, done[1] or "", skipped=True)
+
+    started = time.perf_counter()
+    detail = fn(cursor, run) or ""
+    duration_ms = (time.perf_counter() - started) * 1000
+    cursor.execute(
+        "INSERT INTO month_close_stages (run_id, stage, completed_at, duration_ms, detail) "
+        "VALUES (?, ?, ?, ?, ?)",
+        (run.run_id, stage, now_text(), duration_ms, detail)
+    )
+    return StageResult(stage, label, duration_ms, detail)
+
+
+def run_month_close(db, progress=None):
+    """تنفيذ (أو استئناف) تقفيل الشهر مرحلة بمرحلة.
+
+    progress(index, total, label) يُستدعى قبل كل مرحلة ثم مرة أخيرة
+    بعد اكتمالها جميعًا، ويمكن استدعاؤها من خيط غير خيط الواجهة.
+    يعيد CloseResult بتوقيت كل مرحلة والتقرير الشامل للفترة المغلقة.
+    """
+    run = start_run(db)
+    result = CloseResult(run)
+    total = len(STAGES) + 1
+
+    for index, (stage, label, fn) in enumerate(STAGES):
+        if progress:
+            progress(index, total, label)
+        stage_result = db.write(
+            lambda cursor, stage=stage, label=label, fn=fn: _run_stage(cursor, run, stage, label, fn)
+        )
+        result.stages.append(stage_result)
+        logging.info(
+            f"Month close run {run.run_id} stage {stage}: "
+            f"{'skipped' if stage_result.skipped else f'{stage_result.duration_ms:.1f} ms'} {stage_result.detail}"
+        )
+
+    if progress:
+        progress(len(STAGES), total, "إعداد التقرير")
+    started = time.perf_counter()
+    result.report = reports.comprehensive_report(db, run.period_id)
+    result.report_ms = (time.perf_counter() - started) * 1000
+
+    db.write(lambda cursor: cursor.execute(
+        "UPDATE month_close_runs SET status = 'completed', finished_at = ? WHERE run_id = ?",
+        (now_text(), run.run_id)
+    ))
+    if progress:
+        progress(total, total, "اكتمل التقفيل")
+    logging.info(
+        "Month close timings: " + ", ".join(f"{stage}={ms:.1f}ms" for stage, ms in result.timings())
+    )
+    return result
@@ -0,0 +1,240 @@
+"""فهرس n-gram في الذاكرة للبحث السريع في أسماء الأصناف والمشتركين.
+
+الأسماء تُطبَّع قبل الفهرسة والبحث (normalize): حذف التشكيل والتطويل،
+وتوحيد صور الألف والهمزة، والتاء المربوطة مع الهاء، والألف المقصورة مع
+الياء. كل اسم مطبَّع يُفهرس بمقاطعه الثنائية والثلاثية، والبحث يتقاطع
+مع قوائم مقاطع النص المكتوب ثم يتحقق من الاحتواء، فلا يُمسح أي جدول
+أثناء الكتابة.
+
+كل فهرس مرتبط بجدول ويتابع سجل name_changes (تكتبه مشغلات الترحيل 6
+عند أي تغيير في الأسماء): قبل كل بحث تُقرأ التغييرات التالية لآخر تغيير
+مطبق، ويُعاد قراءة الصفوف المتغيرة فقط وتحديثها في الفهرس.
+
+السجل يُقلَّم بـ prune_changes بعد أن يطبق كل قارئ محمل تغييراته. القارئ
+الذي فاتته تغييرات مقلمة (في عملية أخرى) يلاحظ أن أول تغيير باقٍ يلي آخر
+تغيير طبقه بأكثر من واحد، فيعيد البناء كاملًا.
+"""
+import heapq
+import json
+import logging
+import threading
+import time
+import weakref
+
+from migrations import NAME_SOURCES
+from utils.arabic import normalize
+
+# سجل التغييرات (الترحيلان 6 و 8) مشترك بين فهرس الأسماء ومخزن البيانات المرجعية
+CHANGES_SQL = "SELECT change_id, row_id FROM name_changes WHERE source = ? AND change_id > ? ORDER BY change_id"
+# أول وآخر تغيير في السجل كله (كل منهما بالفهرس)؛ الأرقام متتالية (AUTOINCREMENT)
+# فأول رقم باقٍ يكشف التقليم
+CHANGE_RANGE_SQL = (
+    "SELECT (SELECT MIN(change_id) FROM name_changes), (SELECT COALESCE(MAX(change_id), 0) FROM name_changes)"
+)
+PRUNE_CHANGES_SQL = "DELETE FROM name_changes WHERE change_id <= ?"
+# الجدول -> أسماء كل صفوفه، وأسماء صفوف محددة (json_each بقائمة rowid)
+NAME_ROWS_SQL = {
+    source: f"SELECT rowid, {column} FROM {source} WHERE {column} IS NOT NULL"
+    for source, column in NAME_SOURCES.items()
+}
+CHANGED_NAME_ROWS_SQL = {
+    source: f"{sql} AND rowid IN (SELECT value FROM json_each(?))" for source, sql in NAME_ROWS_SQL.items()
+}
+
+GRAM_SIZES = (2, 3)
+
+
+def _grams(text, size):
+    return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+
+class NameIndex:
+    """فهرس مقاطع لأسماء بمفاتيح: key -> الاسم المعروض"""
+
+    def __init__(self, entries=()):
+        self.names = {}
+        self._normalized = {}
+        self._postings = {}
+        for key, name in entries:
+            self.add(key, name)
+
+    def __len__(self):
+        return len(self.names)
+
+    def add(self, key, name):
+        if key in self.names:
+            self.remove(key)
+        normalized = normalize(name)
+        self.names[key] = name
+        self._normalized[key] = normalized
+        for size in GRAM_SIZES:
+            for gram in _grams(normalized, size):
+                self._postings.setdefault(gram, set()).add(key)
+
+    def remove(self, key):
+        normalized = self._normalized.pop(key, None)
+        if normalized is None:
+            return
+        del self.names[key]
+        for size in GRAM_SIZES:
+            for gram in _grams(normalized, size):
+                keys = self._postings.get(gram)
+                if keys is not None:
+                    keys.discard(key)
+                    if not keys:
+                        del self._postings[gram]
+
+    def _candidates(self, query):
+        size = min(len(query), GRAM_SIZES[-1])
+        postings = []
+        for gram in _grams(query, size):
+            keys = self._postings.get(gram)
+            if not keys:
+                return set()
+            postings.append(keys)
+        postings.sort(key=len)
+        candidates = set(postings[0])
+        for keys in postings[1:]:
+            candidates &= keys
+            if not candidates:
+                break
+        return candidates
+
+    def search(self, query, limit=20):
+        """الأسماء (بدون تكرار) التي تحتوي على query بعد التطبيع؛ ما يبدأ به الاسم أولًا ثم الأقصر"""
+        query = normalize(query)
+        if not query:
+            return []
+        if len(query) < GRAM_SIZES[0]:
+            # حرف واحد: لا مقاطع له، فنمسح حتى نجمع عددًا كافيًا
+            matches = []
+            for key, normalized in self._normalized.items():
+                if query in normalized:
+                    matches.append(key)
+                    if len(matches) >= limit * 5:
+                        break
+        else:
+            matches = [key for key in self._candidates(query) if query in self._normalized[key]]
+
+        def rank(key):
+            normalized = self._normalized[key]
+            if normalized.startswith(query):
+                position = 0
+            elif f" {query}" in normalized:
+                position = 1
+            else:
+                position = 2
+            return position, len(normalized), normalized
+
+        names = dict.fromkeys(self.names[key] for key in heapq.nsmallest(limit * 2, matches, key=rank))
+        return list(names)[:limit]
+
+
+class NameSource:
+    """فهرس أسماء جدول في قاعدة بيانات، يتابع سجل تغييرات أسمائه"""
+
+    # عدد التغييرات المعلقة الذي يصبح بعده إعادة البناء الكاملة أسرع
+    REBUILD_THRESHOLD = 1000
+
+    def __init__(self, db, source):
+        self.db = db
+        self.source = source
+        self.last_change = None
+        self.index = NameIndex()
+        self._lock = threading.Lock()
+
+    def consumed(self):
+        """{الجدول: آخر تغيير مطبق}، فارغ قبل البناء الأول"""
+        return {} if self.last_change is None else {self.source: self.last_change}
+
+    def _rows(self, row_ids=None):
+        if row_ids is None:
+            return self.db.fetch_all(NAME_ROWS_SQL[self.source])
+        return self.db.fetch_all(CHANGED_NAME_ROWS_SQL[self.source], (json.dumps(list(row_ids)),))
+
+    def rebuild(self):
+        started = time.perf_counter()
+        # رقم آخر تغيير يُقرأ قبل الصفوف، فأي تغيير بينهما يُطبق مرة أخرى بلا ضرر
+        _, self.last_change = change_range(self.db)
+        self.index = NameIndex(self._rows())
+        logging.info(
+            f"Built {self.source} name index: {len(self.index)} names in "
+            f"{(time.perf_counter() - started) * 1000:.1f} ms"
+        )
+
+    def refresh(self):
+        """تطبيق تغييرات الأسماء منذ آخر تحديث؛ يعيد عدد الصفوف المتغيرة"""
+        with self._lock:
+            if self.last_change is None:
+                self.rebuild()
+                return len(self.index)
+            # آخر تغيير في السجل يُقرأ قبل تغييرات الجدول، فكل تغيير للجدول حتى رقمه مطبق بعدها
+            first, last = change_range(self.db)
+            if first is not None and first > self.last_change + 1:
+                self.rebuild()
+                return len(self.index)
+            changes = self.db.fetch_all(CHANGES_SQL, (self.source, self.last_change))
+            if len(changes) > self.REBUILD_THRESHOLD:
+                self.rebuild()
+                return len(changes)
+            row_ids = {row_id for _, row_id in changes}
+            current = dict(self._rows(row_ids)) if row_ids else {}
+            for row_id in row_ids:
+                if row_id in current:
+                    self.index.add(row_id, current[row_id])
+                else:
+                    self.index.remove(row_id)
+            self.last_change = max(self.last_change, last, changes[-1][0] if changes else 0)
+            return len(row_ids)
+
+    def search(self, query, limit=20):
+        self.refresh()
+        with self._lock:
+            return self.index.search(query, limit)
+
+
+def change_range(db):
+    """(أول تغيير باقٍ في السجل أو None، آخر تغيير أو 0)"""
+    row = db.fetch_one(CHANGE_RANGE_SQL)
+    return (row[0], row[1]) if row else (None, 0)
+
+
+_sources = weakref.WeakKeyDictionary()
+_sources_lock = threading.Lock()
+# قراء السجل الآخرون لكل قاعدة بيانات (مخزن البيانات المرجعية)؛ لكل منهم consumed()
+_readers = weakref.WeakKeyDictionary()
+
+
+def name_source(db, source):
+    """فهرس الأسماء المشترك لجدول source في قاعدة البيانات db"""
+    with _sources_lock:
+        by_source = _sources.setdefault(db, {})
+        if source not in by_source:
+            by_source[source] = NameSource(db, source)
+        return by_source[source]
+
+
+def register_change_reader(db, reader):
+    """تسجيل قارئ آخر لسجل name_changes حتى لا يُقلَّم ما لم يطبقه"""
+    with _sources_lock:
+        _readers.setdefault(db, weakref.WeakSet()).add(reader)
+
+
+def prune_changes(db):
+    """حذف التغييرات التي طبقها كل قراء السجل المحملين في هذه العملية؛ يعيد آخر رقم محذوف أو None.
+
+    فهارس الأسماء المتأخرة تُحدَّث أولًا حتى لا يوقف فهرس لم يُبحث فيه
+    منذ مدة التقليم. القراء غير المحملين يعيدون البناء كاملًا فلا يُنتظرون.
+    """
+    with _sources_lock:
+        sources = list(_sources.get(db, {}).values())
+        readers = sources + list(_readers.get(db, ()))
+    for source in sources:
+        if source.last_change is not None:
+            source.refresh()
+    consumed = [change_id for reader in readers for change_id in reader.consumed().values()]
+    if not consumed:
+        return None
+    upto = min(consumed)
+    db.write(lambda cursor: cursor.execute(PRUNE_CHANGES_SQL, (upto,)))
+    return upto
@@ -0,0 +1,69 @@
+"""تسجيل المشتروات وأصناف المخزون بدون واجهة."""
+from datetime import datetime
+
+from services.name_index import name_source
+from services.reference import reference_store
+
+ITEM_STOCK_SQL = "SELECT quantity, price FROM expenses WHERE item_name = ?"
+UPDATE_PURCHASE_SQL = (
+    "UPDATE expenses SET quantity=?, price=?, total_price=?, remaining=?, is_miscellaneous=?, is_drink=?, date=? "
+    "WHERE item_name=?"
+)
+
+
+def item_names(db):
+    """أسماء الأصناف المسجلة في المخزون"""
+    return reference_store(db).item_names()
+
+
+def similar_items(db, query, limit=20):
+    """الأصناف التي يحتوي اسمها على query، من فهرس الأسماء في الذاكرة"""
+    return name_source(db, "expenses").search(query, limit)
+
+
+def add_item(db, item_name, date=None):
+    """إضافة صنف جديد بكمية وسعر صفر"""
+    date = date or datetime.now().strftime("%Y-%m-%d")
+    db.write(lambda cursor: cursor.execute(
+        "INSERT INTO expenses (item_name, quantity, price, total_price, remaining, date) VALUES (?, 0, 0, 0, 0, ?)",
+        (item_name, date)
+    ))
+
+
+def add_purchase(cursor, item_name, quantity, total_price, is_miscellaneous=False, is_drink=False, date=None):
+    """تسجيل شراء داخل المعاملة الحالية.
+
+    إذا كان الصنف موجودًا تُضاف الكمية ويُعاد حساب سعر الوحدة كمتوسط
+    مرجح بالكميات، وإلا يُدرج صنف جديد. يعيد سعر الوحدة الجديد.
+    """
+    if quantity <= 0 or total_price <= 0:
+        raise ValueError("Purchase quantity and price must be positive")
+    date = date or datetime.now().strftime("%Y-%m-%d")
+    cursor.execute(ITEM_STOCK_SQL, (item_name,))
+    result = cursor.fetchone()
+
+    if result:
+        # متوسط مرجح للسعر مع الكمية السابقة
+        old_qty, old_price = result
+        new_qty = old_qty + quantity
+        new_total = (old_price * old_qty) + total_price
+        new_price = new_total / new_qty
+        cursor.execute(
+            UPDATE_PURCHASE_SQL,
+            (new_qty, new_price, new_total, new_qty, is_miscellaneous, is_drink, date, item_name)
+        )
+        return new_price
+
+    unit_price = total_price / quantity
+    cursor.execute(
+        "INSERT INTO expenses (item_name, quantity, price, total_price, remaining, is_miscellaneous, is_drink, date) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        (item_name, quantity, unit_price, total_price, quantity, is_miscellaneous, is_drink, date)
+    )
+    return unit_price
+
+
+def record_purchase(db, item_name, quantity, total_price, is_miscellaneous=False, is_drink=False, date=None):
+    """تسجيل شراء كعملية كتابة مستقلة؛ انظر add_purchase"""
+    return db.write(lambda cursor: add_purchase(
+        cursor, item_name, quantity, total_price, is_miscellaneous, is_drink, date
+    ))
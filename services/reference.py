@@ -0,0 +1,271 @@
+"""مخزن البيانات المرجعية المشترك: المشتركون وأصناف المخزون حسب المعرف.
+
+يُحمَّل مرة واحدة عند أول استخدام ويتشاركه كل الجلسات، وقوائم الاختيار
+في الصفحات تُبنى منه دون استعلام. بعد كل كتابة تعدل members أو expenses
+(من أي مسار، أو من خارج البرنامج) يقرأ المخزن من سجل name_changes
+(الترحيلان 6 و 8) الصفوف المتغيرة فقط، ثم يرسل التغيير عبر Flet pubsub
+على الموضوع TOPIC إلى كل الجلسات لتحديث القوائم المفتوحة. Flet يحفظ معالجًا
+واحدًا لكل (موضوع، جلسة)، فكل جلسة تشترك مرة واحدة بموزع يمرر التغيير
+لكل صفحاتها.
+
+مستمع الإبطال يعمل في خيط الكتابة فيكتفي بتسجيل الجداول المتغيرة، والقراءة
+والإرسال في خيط المخزن الخلفي (أو في خيط من يطلب القوائم قبله، فيرى
+كتابته مباشرة). المخزون المتبقي لا يُحفظ هنا لأنه يتغير مع كل بيع.
+"""
+import json
+import logging
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+from database import ALL_TABLES
+from services.name_index import CHANGES_SQL, change_range, prune_changes, register_change_reader
+
+# موضوع رسائل pubsub؛ الرسالة ReferenceChange
+TOPIC = "reference"
+
+
+@dataclass(frozen=True)
+class Member:
+    member_id: int
+    rank: str
+    name: str
+
+    @property
+    def label(self):
+        return " ".join(part for part in (self.rank, self.name) if part)
+
+
+@dataclass(frozen=True)
+class Item:
+    expense_id: int
+    name: str
+    price: float
+    is_drink: bool
+    is_miscellaneous: bool
+
+
+@dataclass
+class ReferenceChange:
+    """تغيير في جدول مرجعي: المعرفات المضافة أو المعدلة والمحذوفة"""
+    source: str
+    changed: list
+    removed: list
+
+
+MEMBERS_SQL = "SELECT member_id, rank, name FROM members"
+ITEMS_SQL = "SELECT expense_id, item_name, price, is_drink, is_miscellaneous FROM expenses"
+# الجدول -> (استعلام الصفوف، صنف السجل)
+SOURCES = {
+    "members": (MEMBERS_SQL, Member),
+    "expenses": (ITEMS_SQL, Item),
+}
+# صفوف محددة من كل جدول (json_each بقائمة rowid)
+CHANGED_ROWS_SQL = {
+    source: f"{sql} WHERE rowid IN (SELECT value FROM json_each(?))" for source, (sql, _) in SOURCES.items()
+}
+
+
+class ReferenceStore:
+    # عدد التغييرات المعلقة الذي يصبح بعده إعادة قراءة الجدول كاملًا أسرع
+    REBUILD_THRESHOLD = 1000
+    # عدد التغييرات المطبقة الذي يُقلَّم بعده سجل name_changes
+    PRUNE_EVERY = 1000
+
+    def __init__(self, db):
+        self.db = db
+        self.records = {source: {} for source in SOURCES}
+        # آخر تغيير مطبق لكل جدول؛ None قبل التحميل الأول
+        self.last_change = None
+        # عميل pubsub لكل جلسة مشتركة -> معالجات صفحاتها (يُنسى مع انتهاء جلسته)؛
+        # الإرسال عبر أي عميل يصل لكل الجلسات
+        self._pubsubs = weakref.WeakKeyDictionary()
+        # الجداول التي تغيرت ولم تُقرأ تغييراتها بعد
+        self._pending = set()
+        self._pending_lock = threading.Lock()
+        self._pruned = 0
+        self._lock = threading.RLock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="reference")
+        db.add_invalidation_listener(self._on_invalidate)
+        register_change_reader(db, self)
+
+    def attach(self, pubsub, handler=None):
+        """ربط جلسة بالمخزن عبر عميل pubsub الخاص بها، وإضافة handler(topic, change) لصفحاتها"""
+        with self._pending_lock:
+            handlers = self._pubsubs.get(pubsub)
+            if handlers is None:
+                handlers = self._pubsubs[pubsub] = []
+                pubsub.subscribe_topic(TOPIC, self._dispatcher(handlers))
+            if handler is not None and handler not in handlers:
+                handlers.append(handler)
+
+    @staticmethod
+    def _dispatcher(handlers):
+        """معالج الجلسة الوحيد على TOPIC: يمرر التغيير لكل صفحة مشتركة"""
+        def dispatch(topic, change):
+            for handler in list(handlers):
+                try:
+                    handler(topic, change)
+                except Exception as e:
+                    logging.error(f"Reference change handler failed: {e}")
+        return dispatch
+
+    def consumed(self):
+        """{الجدول: آخر تغيير مطبق}، فارغ قبل التحميل الأول"""
+        return dict(self.last_change or {})
+
+    def _rows(self, source, row_ids=None):
+        sql, record = SOURCES[source]
+        if row_ids is None:
+            rows = self.db.fetch_all(sql)
+        else:
+            rows = self.db.fetch_all(CHANGED_ROWS_SQL[source], (json.dumps(list(row_ids)),))
+        return {row[0]: record(*row) for row in rows}
+
+    def load(self):
+        """تحميل الجدولين كاملين"""
+        with self._lock:
+            # رقم آخر تغيير يُقرأ قبل الصفوف، فأي تغيير بينهما يُطبق مرة أخرى بلا ضرر
+            _, last = change_range(self.db)
+            last_change = dict.fromkeys(SOURCES, last)
+            self.records = {source: self._rows(source) for source in SOURCES}
+            self.last_change = last_change
+            logging.info(
+                f"Loaded reference data: {len(self.records['members'])} members, "
+                f"{len(self.records['expenses'])} items"
+            )
+
+    def _ensure_loaded(self):
+        if self.last_change is None:
+            self.load()
+        elif self._pending:
+            self._drain()
+
+    def _apply(self, source):
+        """تطبيق تغييرات جدول منذ آخر تحديث؛ يعيد ReferenceChange أو None"""
+        # آخر تغيير في السجل يُقرأ قبل تغييرات الجدول، فكل تغيير للجدول حتى رقمه مطبق بعدها
+        first, last = change_range(self.db)
+        applied = self.last_change[source]
+        # first يلي آخر تغيير مطبق بأكثر من واحد: قلمت عملية أخرى تغييرات لم نطبقها
+        missed = first is not None and first > applied + 1
+        changes = self.db.fetch_all(CHANGES_SQL, (source, applied))
+        self.last_change[source] = max(applied, last, changes[-1][0] if changes else 0)
+        if not changes and not missed:
+            return None
+        records = self.records[source]
+        if len(changes) > self.REBUILD_THRESHOLD or missed:
+            current = self._rows(source)
+            row_ids = set(records) | set(current)
+        else:
+            row_ids = {row_id for _, row_id in changes}
+            current = self._rows(source, row_ids)
+        changed = [row_id for row_id in row_ids if row_id in current and records.get(row_id) != current[row_id]]
+        removed = [row_id for row_id in row_ids if row_id not in current and row_id in records]
+        for row_id in changed:
+            records[row_id] = current[row_id]
+        for row_id in removed:
+            del records[row_id]
+        if changed or removed:
+            return ReferenceChange(source, changed, removed)
+        return None
+
+    def refresh(self, sources=SOURCES):
+        """تطبيق التغييرات المعلقة وإرسالها للجلسات؛ لا شيء قبل التحميل الأول"""
+        with self._lock:
+            if self.last_change is None:
+                return []
+            changes = [change for change in map(self._apply, sources) if change is not None]
+        for change in changes:
+            self._publish(change)
+        return changes
+
+    def _on_invalidate(self, tables):
+        """في خيط الكتابة: تسجيل الجداول المتغيرة فقط، والقراءة في الخيط الخلفي"""
+        sources = SOURCES if ALL_TABLES in tables else [source for source in SOURCES if source in tables]
+        if not sources or self.last_change is None:
+            return
+        with self._pending_lock:
+            self._pending.update(sources)
+        try:
+            self._executor.submit(self._drain)
+        except RuntimeError:
+            # أُغلق الخيط الخلفي عند خروج البرنامج
+            pass
+
+    def _drain(self):
+        """تطبيق تغييرات الجداول المعلقة وإرسالها، وتقليم السجل كل PRUNE_EVERY تغيير"""
+        with self._pending_lock:
+            sources, self._pending = self._pending, set()
+        if not sources:
+            return
+        try:
+            self.refresh([source for source in SOURCES if source in sources])
+            if max(self.consumed().values(), default=0) - self._pruned >= self.PRUNE_EVERY:
+                # الجداول التي لم تتغير تلحق بآخر تغيير أولًا حتى لا توقف التقليم
+                self.refresh()
+                self._pruned = prune_changes(self.db) or self._pruned
+        except Exception as e:
+            logging.error(f"Could not refresh reference data: {e}")
+
+    def _publish(self, change):
+        with self._pending_lock:
+            pubsubs = list(self._pubsubs)
+        # كل العملاء يشتركون في نفس موزع Flet، فيكفي أول عميل يعمل؛ العميل الذي
+        # انتهت جلسته يُحذف
+        for pubsub in pubsubs:
+            try:
+                pubsub.send_all_on_topic(TOPIC, change)
+                return
+            except Exception as e:
+                logging.warning(f"Dropping reference pubsub client after failed publish: {e}")
+                with self._pending_lock:
+                    self._pubsubs.pop(pubsub, None)
+
+    # --- القوائم التي تعرضها الصفحات ---
+
+    def member_options(self):
+        """[(member_id، "الرتبة الاسم")]"""
+        with self._lock:
+            self._ensure_loaded()
+            return [(member.member_id, member.label) for member in self.records["members"].values()]
+
+    def meal_options(self):
+        """{expense_id: (الاسم، السعر)} للأصناف غير المشروبات وغير النثريات"""
+        with self._lock:
+            self._ensure_loaded()
+            return {
+                item.expense_id: (item.name, item.price)
+                for item in self.records["expenses"].values()
+                if not item.is_drink and not item.is_miscellaneous
+            }
+
+    def drink_names(self):
+        with self._lock:
+            self._ensure_loaded()
+            return [item.name for item in self.records["expenses"].values() if item.is_drink]
+
+    def item_names(self):
+        """أسماء الأصناف بدون تكرار"""
+        with self._lock:
+            self._ensure_loaded()
+            return list(dict.fromkeys(item.name for item in self.records["expenses"].values()))
+
+
+_stores = weakref.WeakKeyDictionary()
+_stores_lock = threading.Lock()
+
+
+def reference_store(db):
+    """مخزن البيانات المرجعية المشترك لقاعدة البيانات db"""
+    with _stores_lock:
+        if db not in _stores:
+            _stores[db] = ReferenceStore(db)
+        return _stores[db]
+
+
+def subscribe(db, page, handler):
+    """اشتراك جلسة الصفحة في تغييرات البيانات المرجعية؛ handler(topic, change)"""
+    store = reference_store(db)
+    store.attach(page.pubsub, handler)
+    return store
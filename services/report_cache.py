@@ -0,0 +1,183 @@
+"""ذاكرة التقارير المرسومة للفترات المغلقة، معنونة ببصمة المحتوى.
+
+بيانات الفترة المغلقة لا تتغير، فالتقرير المرسوم لها مرة (PDF أو Excel
+أو ZIP الكشوف) يُحفظ في reports/cache باسم بصمة SHA-256 لبياناته، ويُسجل
+في الجدول report_cache (الترحيل 9) بمفتاح (نوع التقرير، مفتاح الأرشيف).
+التصدير التالي لنفس التقرير يُنسخ من القرص دون استعلام ولا رسم. إذا
+تجاوز حجم الملفات MAX_CACHE_BYTES تُحذف الأقدم استخدامًا.
+
+بيانات الفترة المغلقة تُقرأ من لقطات الأرشيف (انظر reports)، فلا تغيرها
+الكتابة في الفترة المفتوحة. استخدام التقارير المحفوظة يُجمع في الذاكرة
+ويُكتب دفعة واحدة قبل الحذف، أو كل TOUCH_BATCH استخدام، أو عند إغلاق
+البرنامج (flush_touches في main.py)، فلا يكتب كل بحث في الذاكرة شيئًا.
+"""
+import hashlib
+import logging
+import os
+import shutil
+import threading
+import time
+import weakref
+from datetime import datetime
+
+REPORTS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "reports")
+CACHE_DIR = os.path.join(REPORTS_DIR, "cache")
+MAX_CACHE_BYTES = 500 * 1024 * 1024
+# يُزاد عند تغيير شكل أي تقرير مرسوم، فتُعد الملفات القديمة غير صالحة
+RENDER_VERSION = 1
+# عدد مرات الاستخدام المجمعة في الذاكرة التي تُكتب بعدها إلى report_cache
+TOUCH_BATCH = 100
+
+LOOKUP_SQL = "SELECT file_name FROM report_cache WHERE report_type = ? AND archive_key_id = ? AND render_version = ?"
+TOUCH_SQL = "UPDATE report_cache SET last_used_at = ?, hits = hits + ? WHERE report_type = ? AND archive_key_id = ?"
+DELETE_ENTRY_SQL = "DELETE FROM report_cache WHERE report_type = ? AND archive_key_id = ?"
+# ملف لكل بصمة محتوى بحجمه وآخر استخدام لأي تقرير يشير إليه، الأقدم أولًا
+CACHED_FILES_SQL = (
+    "SELECT content_hash, file_name, MAX(size_bytes), MAX(last_used_at) AS used "
+    "FROM report_cache GROUP BY content_hash ORDER BY used"
+)
+DELETE_CONTENT_SQL = "DELETE FROM report_cache WHERE content_hash = ?"
+STORE_SQL = (
+    "INSERT OR REPLACE INTO report_cache (report_type, archive_key_id, render_version, content_hash, "
+    "file_name, size_bytes, created_at, last_used_at, hits) VALUES (?, ?, ?, ?, ?, ?, ?, ?, 0)"
+)
+PERIOD_ARCHIVE_SQL = "SELECT closed_at, archive_key_id FROM periods WHERE period_id = ?"
+
+# استخدام لم يُكتب بعد لكل قاعدة بيانات: (نوع التقرير، مفتاح الأرشيف) -> (آخر استخدام، عدد الإصابات)
+_touches = weakref.WeakKeyDictionary()
+_touches_lock = threading.Lock()
+
+
+def now_text():
+    # بالميكروثانية حتى يكون ترتيب آخر استخدام دقيقًا
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S.%f")
+
+
+def content_hash(report_type, data):
+    """بصمة SHA-256 لبيانات التقرير (repr كامل للبيانات) مع نوعه وإصدار الرسم"""
+    digest = hashlib.sha256()
+    digest.update(f"{report_type}\0{RENDER_VERSION}\0".encode("utf-8"))
+    digest.update(repr(data).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def flush_touches(db):
+    """كتابة الاستخدام المجمع في الذاكرة لقاعدة البيانات db إلى report_cache بمعاملة واحدة"""
+    with _touches_lock:
+        touches = _touches.pop(db, {})
+    if touches:
+        db.write(lambda cursor: cursor.executemany(TOUCH_SQL, [
+            (used, hits, report_type, archive_key_id)
+            for (report_type, archive_key_id), (used, hits) in touches.items()
+        ]))
+
+
+def period_archive_key(db, period_id):
+    """مفتاح أرشيف الفترة إذا كانت مغلقة، وإلا None (الفترة المفتوحة لا تُحفظ)"""
+    row = db.fetch_one_cached(PERIOD_ARCHIVE_SQL, (period_id,))
+    if row is None or row[0] is None:
+        return None
+    return row[1]
+
+
+class ReportCache:
+    def __init__(self, db, directory=CACHE_DIR, max_bytes=MAX_CACHE_BYTES):
+        self.db = db
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+    def lookup(self, report_type, archive_key_id):
+        """مسار الملف المحفوظ للتقرير (ويُسجل استخدامه في الذاكرة)، أو None"""
+        row = self.db.fetch_one(LOOKUP_SQL, (report_type, archive_key_id, RENDER_VERSION))
+        if row is None:
+            return None
+        path = os.path.join(self.directory, row[0])
+        if not os.path.exists(path):
+            # حُذف الملف من خارج البرنامج
+            self.db.write(lambda cursor: cursor.execute(DELETE_ENTRY_SQL, (report_type, archive_key_id)))
+            return None
+        with _touches_lock:
+            touches = _touches.setdefault(self.db, {})
+            _, hits = touches.get((report_type, archive_key_id), (None, 0))
+            touches[(report_type, archive_key_id)] = (now_text(), hits + 1)
+            full = sum(hits for _, hits in touches.values()) >= TOUCH_BATCH
+        if full:
+            self.flush_touches()
+        return path
+
+    def flush_touches(self):
+        """كتابة الاستخدام المجمع في الذاكرة إلى report_cache (انظر flush_touches)"""
+        flush_touches(self.db)
+
+    def store(self, report_type, archive_key_id, digest, render, extension):
+        """حفظ التقرير باسم بصمته؛ render(path) يُستدعى فقط إذا لم يكن ملف بنفس البصمة محفوظًا"""
+        os.makedirs(self.directory, exist_ok=True)
+        file_name = f"{digest}{extension}"
+        path = os.path.join(self.directory, file_name)
+        if not os.path.exists(path):
+            partial = os.path.join(self.directory, f"{digest}.partial{extension}")
+            try:
+                render(partial)
+                os.replace(partial, path)
+            except BaseException:
+                if os.path.exists(partial):
+                    os.remove(partial)
+                raise
+        size = os.path.getsize(path)
+        now = now_text()
+        self.db.write(lambda cursor: cursor.execute(
+            STORE_SQL, (report_type, archive_key_id, RENDER_VERSION, digest, file_name, size, now, now)
+        ))
+        self.evict(keep=digest)
+        return path
+
+    def evict(self, keep=None):
+        """حذف الملفات الأقدم استخدامًا حتى لا يتجاوز حجمها max_bytes؛ يعيد عدد البايتات المحذوفة"""
+        self.flush_touches()
+        files = self.db.fetch_all(CACHED_FILES_SQL)
+        total = sum(size for _, _, size, _ in files)
+        freed = 0
+        for digest, file_name, size, _ in files:
+            if total <= self.max_bytes:
+                break
+            if digest == keep:
+                continue
+            self.db.write(lambda cursor, digest=digest: cursor.execute(DELETE_CONTENT_SQL, (digest,)))
+            try:
+                os.remove(os.path.join(self.directory, file_name))
+            except FileNotFoundError:
+                pass
+            total -= size
+            freed += size
+        if freed:
+            logging.info(f"Report cache evicted {freed / 1024 / 1024:.1f} MB, {total / 1024 / 1024:.1f} MB kept")
+        return freed
+
+    def export(self, report_type, archive_key_id, destination, load, render):
+        """نسخ التقرير إلى destination من الذاكرة، أو تحميل بياناته ورسمه وحفظه أولًا.
+
+        load() تعيد بيانات التقرير، و render(data, path) ترسمه. يعيد
+        (destination، هل جاء من الذاكرة). مع archive_key_id = None (فترة
+        مفتوحة) يُرسم مباشرة دون حفظ.
+        """
+        started = time.perf_counter()
+        extension = os.path.splitext(destination)[1]
+        if archive_key_id is None:
+            render(load(), destination)
+            return destination, False
+
+        cached = self.lookup(report_type, archive_key_id)
+        hit = cached is not None
+        if not hit:
+            data = load()
+            cached = self.store(
+                report_type, archive_key_id, content_hash(report_type, data),
+                lambda path: render(data, path), extension
+            )
+        if os.path.abspath(cached) != os.path.abspath(destination):
+            shutil.copyfile(cached, destination)
+        logging.info(
+            f"Report {report_type} for archive {archive_key_id}: {'cache hit' if hit else 'rendered'} "
+            f"in {(time.perf_counter() - started) * 1000:.1f} ms"
+        )
+        return destination, hit
@@ -0,0 +1,236 @@
+"""التقرير المالي الشامل المشترك بين صفحة التقارير وتقفيل الشهر.
+
+كل جدول حقائق (الوجبات، المشروبات، النثريات) يُجمَّع في CTE خاص به
+ثم تُربط النتائج بالمشتركين صفًا لكل مشترك، فلا تتضاعف المجاميع كما
+يحدث عند ربط الوجبات والمشروبات معًا في GROUP BY واحد.
+
+السجلات موسومة بالفترة (period_id)، لذلك يمكن حساب التقرير للفترة
+المفتوحة أو لأي فترة مغلقة (بأرصدة المشتركين من لقطة members_archive)، وسجلات الأرشيف القديم تُقرأ مع سجلات
+الفترة في archived_meal_records و archived_drink_records وفي التقرير الشامل للفترة المغلقة.
+"""
+from dataclasses import dataclass, field
+
+# {members}: جدول المشتركين؛ الحي للفترة المفتوحة، ولقطة members_archive
+# (المأخوذة عند التقفيل) للفترة المغلقة حتى لا تتغير بتعديل المشتركين بعدها.
+# {meals} و {drinks}: سجلات الفترة، ومعها للفترة المغلقة ما نُقل قديمًا إلى جداول *_archive
+_MEMBER_TOTALS_SQL = """
+    WITH meal_totals AS (
+        SELECT member_id, SUM(final_cost) AS meal_cost
+        FROM ({meals})
+        GROUP BY member_id
+    ),
+    drink_totals AS (
+        SELECT member_id, SUM(total_cost) AS drink_cost
+        FROM ({drinks})
+        GROUP BY member_id
+    ),
+    misc_meal_totals AS (
+        SELECT member_id, SUM(amount) AS misc_cost
+        FROM miscellaneous_expenses
+        WHERE period_id = ?
+        GROUP BY member_id
+    ),
+    misc_distribution_totals AS (
+        SELECT member_id, SUM(misc_amount) AS misc_cost
+        FROM miscellaneous_contributions
+        WHERE period_id = ?
+        GROUP BY member_id
+    )
+    SELECT
+        m.member_id,
+        m.name,
+        m.rank,
+        COALESCE(m.contribution, 0),
+        COALESCE(mt.meal_cost, 0),
+        COALESCE(dt.drink_cost, 0),
+        COALESCE(mmt.misc_cost, 0) + COALESCE(mdt.misc_cost, 0)
+    FROM {members} m
+    LEFT JOIN meal_totals mt ON mt.member_id = m.member_id
+    LEFT JOIN drink_totals dt ON dt.member_id = m.member_id
+    LEFT JOIN misc_meal_totals mmt ON mmt.member_id = m.member_id
+    LEFT JOIN misc_distribution_totals mdt ON mdt.member_id = m.member_id
+    {where}
+    ORDER BY m.member_id
+"""
+
+_PERIOD_MEALS = "SELECT member_id, final_cost FROM meal_records WHERE period_id = ?"
+_PERIOD_DRINKS = "SELECT member_id, total_cost FROM drink_records WHERE period_id = ?"
+
+COMPREHENSIVE_MEMBERS_SQL = _MEMBER_TOTALS_SQL.format(
+    members="members", meals=_PERIOD_MEALS, drinks=_PERIOD_DRINKS, where=""
+)
+_ARCHIVED_MEALS = f"{_PERIOD_MEALS} UNION ALL SELECT member_id, final_cost FROM meal_records_archive WHERE archive_key_id = ?"
+_ARCHIVED_DRINKS = f"{_PERIOD_DRINKS} UNION ALL SELECT member_id, total_cost FROM drink_records_archive WHERE archive_key_id = ?"
+
+# المعاملات: (period_id, archive_key_id) للوجبات ثم للمشروبات، period_id للنثريات مرتين، archive_key_id
+ARCHIVED_COMPREHENSIVE_MEMBERS_SQL = _MEMBER_TOTALS_SQL.format(
+    members="members_archive", meals=_ARCHIVED_MEALS, drinks=_ARCHIVED_DRINKS, where="WHERE m.archive_key_id = ?"
+)
+# الأرشيف القديم (قبل الفترات) بلا لقطة للمشتركين: المشتركون الحاليون؛ المعاملات كالسابق بدون الأخير
+LEGACY_COMPREHENSIVE_MEMBERS_SQL = _MEMBER_TOTALS_SQL.format(
+    members="members", meals=_ARCHIVED_MEALS, drinks=_ARCHIVED_DRINKS, where=""
+)
+
+PERIOD_SQL = "SELECT closed_at, archive_key_id FROM periods WHERE period_id = ?"
+
+REMAINING_STOCK_VALUE_SQL = "SELECT SUM(remaining * price) FROM expenses WHERE is_miscellaneous = 0"
+
+# قيمة المخزون كما كانت عند إغلاق الفترة (لقطة expenses_archive)
+ARCHIVED_STOCK_VALUE_SQL = """
+    SELECT SUM(remaining * price) FROM expenses_archive
+    WHERE archive_key_id = ? AND is_miscellaneous = 0
+"""
+
+# سجلات فترة مغلقة: الصفوف الموسومة بفترة الأرشيف، ثم ما نُقل قديمًا إلى جداول *_archive
+ARCHIVED_MEAL_RECORDS_SQL = """
+    SELECT r.meal_record_id, r.meal_type, r.date, r.member_id, r.final_cost
+    FROM periods p
+    JOIN meal_records r ON r.period_id = p.period_id
+    WHERE p.archive_key_id = ?
+    UNION ALL
+    SELECT meal_record_id, meal_type, date, member_id, final_cost
+    FROM meal_records_archive
+    WHERE archive_key_id = ?
+"""
+
+ARCHIVED_DRINK_RECORDS_SQL = """
+    SELECT r.drink_record_id, r.date, r.drink_name, r.member_id, r.quantity, r.total_cost
+    FROM periods p
+    JOIN drink_records r ON r.period_id = p.period_id
+    WHERE p.archive_key_id = ?
+    UNION ALL
+    SELECT drink_record_id, date, drink_name, member_id, quantity, total_cost
+    FROM drink_records_archive
+    WHERE archive_key_id = ?
+"""
+
+# أسماء الأعمدة المعروضة والمصدرة
+MEMBER_COLUMNS = [
+    "الاسم", "الرتبة", "المساهمة", "تكلفة_الوجبات",
+    "تكلفة_المشروبات", "النثرية_الموزعة",
+    "إجمالي_الاستهلاك", "الرصيد_النهائي",
+]
+
+
+@dataclass
+class MemberTotals:
+    """إجماليات مشترك واحد في الفترة الحالية"""
+    member_id: int
+    name: str
+    rank: str
+    contribution: float
+    meal_cost: float
+    drink_cost: float
+    misc_cost: float
+
+    @property
+    def total_consumption(self):
+        return self.meal_cost + self.drink_cost + self.misc_cost
+
+    @property
+    def balance(self):
+        return self.contribution - self.total_consumption
+
+
+@dataclass
+class ComprehensiveReport:
+    """نتيجة التقرير الشامل: صف لكل مشترك وقيمة المخزون المتبقي"""
+    members: list = field(default_factory=list)
+    remaining_stock_value: float = 0.0
+
+    @property
+    def total_contributions(self):
+        return sum(m.contribution for m in self.members)
+
+    @property
+    def total_meal_cost(self):
+        return sum(m.meal_cost for m in self.members)
+
+    @property
+    def total_drink_cost(self):
+        return sum(m.drink_cost for m in self.members)
+
+    @property
+    def total_misc_cost(self):
+        return sum(m.misc_cost for m in self.members)
+
+    @property
+    def total_consumption(self):
+        return sum(m.total_consumption for m in self.members)
+
+    @property
+    def total_balance(self):
+        return sum(m.balance for m in self.members)
+
+    def summary_rows(self):
+        """بنود الملخص المالي كقائمة (البند، المبلغ)"""
+        return [
+            ("إجمالي المساهمات", self.total_contributions),
+            ("إجمالي تكلفة الوجبات", self.total_meal_cost),
+            ("إجمالي تكلفة المشروبات", self.total_drink_cost),
+            ("إجمالي النثرية الموزعة", self.total_misc_cost),
+            ("إجمالي الاستهلاك", self.total_consumption),
+            ("قيمة المخزون المتبقي", self.remaining_stock_value),
+            ("الرصيد النقدي المتوقع (المساهمات - الاستهلاك)", self.total_contributions - self.total_consumption),
+            ("رأس المال المتبقي (المساهمات - الاستهلاك الكلي)", self.total_balance),
+            ("رصيد المشتركين النهائي", self.total_balance),
+        ]
+
+    def member_rows(self):
+        """صفوف المشتركين بترتيب MEMBER_COLUMNS مع صف الإجماليات في النهاية"""
+        rows = [
+            [m.name, m.rank, m.contribution, m.meal_cost, m.drink_cost,
+             m.misc_cost, m.total_consumption, m.balance]
+            for m in self.members
+        ]
+        rows.append([
+            "الإجمالي", "", self.total_contributions, self.total_meal_cost,
+            self.total_drink_cost, self.total_misc_cost,
+            self.total_consumption, self.total_balance,
+        ])
+        return rows
+
+    def to_frames(self, decimals=1):
+        """تحويل التقرير إلى DataFrames للعرض والتصدير: {"summary", "members"}"""
+        import pandas as pd
+
+        summary = pd.DataFrame(self.summary_rows(), columns=["البند", "المبلغ"])
+        summary["المبلغ"] = summary["المبلغ"].astype(float).round(decimals)
+        members = pd.DataFrame(self.member_rows(), columns=MEMBER_COLUMNS)
+        numeric = MEMBER_COLUMNS[2:]
+        members[numeric] = members[numeric].astype(float).round(decimals)
+        return {"summary": summary, "members": members}
+
+
+def comprehensive_report(db, period_id=None):
+    """حساب التقرير الشامل لفترة محددة (الفترة المفتوحة افتراضيًا)؛ يعيد None إذا لم يوجد مشتركون"""
+    if period_id is None:
+        period_id = db.current_period_id()
+    period = db.fetch_one_cached(PERIOD_SQL, (period_id,))
+    if period and period[0] is not None:
+        # فترة مغلقة: المشتركون والمخزون من لقطات الأرشيف
+        archive_key_id = period[1]
+        params = (period_id, archive_key_id) * 2 + (period_id, period_id, archive_key_id)
+        rows = db.fetch_cached(ARCHIVED_COMPREHENSIVE_MEMBERS_SQL, params)
+        if not rows:
+            rows = db.fetch_cached(LEGACY_COMPREHENSIVE_MEMBERS_SQL, params[:-1])
+        stock_value = db.fetch_one_cached(ARCHIVED_STOCK_VALUE_SQL, (archive_key_id,))
+    else:
+        rows = db.fetch_cached(COMPREHENSIVE_MEMBERS_SQL, (period_id,) * 4)
+        stock_value = db.fetch_one_cached(REMAINING_STOCK_VALUE_SQL)
+    if not rows:
+        return None
+    return ComprehensiveReport(
+        members=[MemberTotals(*row) for row in rows],
+        remaining_stock_value=(stock_value[0] if stock_value else None) or 0.0,
+    )
+
+
+def archived_meal_records(db, archive_key_id):
+    """سجلات الوجبات لأرشيف محدد: سجلات الفترة الموسومة مع سجلات الأرشيف القديم"""
+    return db.fetch_cached(ARCHIVED_MEAL_RECORDS_SQL, (archive_key_id, archive_key_id))
+
+
+def archived_drink_records(db, archive_key_id):
+    """سجلات المشروبات لأرشيف محدد: سجلات الفترة الموسومة مع سجلات الأرشيف القديم"""
+    return db.fetch_cached(ARCHIVED_DRINK_RECORDS_SQL, (archive_key_id, archive_key_id))
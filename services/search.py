@@ -0,0 +1,187 @@
+"""البحث الشامل في أسماء المشتركين ورتبهم وأسماء الأصناف عبر كل الفترات.
+
+الاستعلام يُطبق على فهرس FTS5 (search_index، الترحيل 7) الذي يغطي
+الجداول الحية وجداول الأرشيف، ثم تُجمع النتائج حسب الفترة: الفترة
+المفتوحة للمشتركين الأحياء، والفترة التي يقع فيها تاريخ الصنف للأصناف
+الحية (المخزون يبقى في expenses بعد التقفيل)، والفترة المغلقة المرتبطة
+بمفتاح الأرشيف لصفوف الأرشيف. لكل مشترك مطابق يُحسب عدد وجباته ومشروباته في كل فترة من
+السجلات الموسومة بالفترة ومن أرشيف السجلات القديم.
+"""
+import bisect
+import json
+import time
+from dataclasses import dataclass, field
+
+from utils.arabic import fold
+
+# أقصى عدد نتائج يُقرأ من الفهرس لكل بحث
+MAX_HITS = 2000
+# يُحسب نشاط المشتركين (الوجبات والمشروبات) فقط إذا كان عدد المشتركين المطابقين لا يتجاوز هذا الحد
+ACTIVITY_MEMBER_LIMIT = 50
+
+SEARCH_SQL = (
+    "SELECT kind, ref_id, archive_key_id, label, date FROM search_index "
+    "WHERE search_index MATCH ? ORDER BY rank LIMIT ?"
+)
+
+# عدد الوجبات والمشروبات لمجموعة مشتركين: (النوع، التجميع بالفترة؟) -> الاستعلام؛
+# الجداول الحية تُجمع بـ period_id وجداول الأرشيف القديم بمفتاح الأرشيف
+ACTIVITY_SQL = {
+    ("meals", True): "SELECT period_id, member_id, COUNT(*) FROM meal_records "
+                     "WHERE member_id IN (SELECT value FROM json_each(?)) GROUP BY period_id, member_id",
+    ("drinks", True): "SELECT period_id, member_id, COUNT(*) FROM drink_records "
+                      "WHERE member_id IN (SELECT value FROM json_each(?)) GROUP BY period_id, member_id",
+    ("meals", False): "SELECT archive_key_id, member_id, COUNT(*) FROM meal_records_archive "
+                      "WHERE member_id IN (SELECT value FROM json_each(?)) GROUP BY archive_key_id, member_id",
+    ("drinks", False): "SELECT archive_key_id, member_id, COUNT(*) FROM drink_records_archive "
+                       "WHERE member_id IN (SELECT value FROM json_each(?)) GROUP BY archive_key_id, member_id",
+}
+
+
+@dataclass
+class MemberHit:
+    member_id: int
+    label: str
+    meals: int = 0
+    drinks: int = 0
+
+
+@dataclass
+class ItemHit:
+    expense_id: int
+    label: str
+    date: str = None
+
+
+@dataclass
+class PeriodHits:
+    """نتائج فترة واحدة؛ archive_key_id فارغ للفترة المفتوحة"""
+    archive_key_id: int
+    title: str
+    start_date: str = None
+    end_date: str = None
+    members: dict = field(default_factory=dict)
+    items: list = field(default_factory=list)
+
+    @property
+    def is_open(self):
+        return self.archive_key_id is None
+
+    @property
+    def meal_count(self):
+        return sum(member.meals for member in self.members.values())
+
+
+@dataclass
+class SearchResults:
+    query: str
+    periods: list = field(default_factory=list)
+    hits: int = 0
+    truncated: bool = False
+    # False إذا طابق البحث مشتركين أكثر من ACTIVITY_MEMBER_LIMIT فلم يُحسب نشاطهم
+    with_activity: bool = True
+    elapsed_ms: float = 0.0
+
+
+def match_expression(text):
+    """تحويل نص المستخدم إلى تعبير MATCH: كل كلمة بادئة، والكلمات مجتمعة (AND)"""
+    terms = fold(text).split()
+    return " ".join('"{}"*'.format(term.replace('"', '""')) for term in terms)
+
+
+def _periods(db):
+    """عناوين الفترات حسب مفتاح الأرشيف، وخريطة period_id -> مفتاح الأرشيف (فارغ للمفتوحة)،
+    وبدايات الفترات مرتبة [(start_date, مفتاح الأرشيف)]"""
+    titles = {
+        key: (name or f"الفترة من {start} إلى {end}", start, end)
+        for key, name, start, end in db.fetch_cached(
+            "SELECT archive_key_id, archive_name, start_date, end_date FROM archive_keys"
+        )
+    }
+    period_keys = {}
+    starts = []
+    for period_id, key, closed_at, start in db.fetch_cached(
+        "SELECT period_id, archive_key_id, closed_at, start_date FROM periods ORDER BY start_date, period_id"
+    ):
+        period_keys[period_id] = key if closed_at is not None else None
+        starts.append((start or "", period_keys[period_id]))
+    return titles, period_keys, starts
+
+
+def _period_for_date(starts, date):
+    """مفتاح أرشيف الفترة التي يقع فيها التاريخ: آخر فترة تبدأ فيه أو قبله.
+
+    يوم التقفيل يبدأ الفترة الجديدة، والتواريخ قبل أول فترة تُنسب إليها.
+    """
+    if not starts or not date:
+        return None
+    index = bisect.bisect_right([start for start, _ in starts], date[:10])
+    return starts[max(index - 1, 0)][1]
+
+
+def _member_activity(db, member_ids, period_keys):
+    """عدد الوجبات والمشروبات لكل (مفتاح أرشيف الفترة، مشترك)"""
+    activity = {}
+    if not member_ids:
+        return activity
+    ids = json.dumps(sorted(member_ids))
+    for (kind, by_period), sql in ACTIVITY_SQL.items():
+        for group, member_id, count in db.fetch_all(sql, (ids,)):
+            key = period_keys.get(group) if by_period else group
+            counts = activity.setdefault((key, member_id), {"meals": 0, "drinks": 0})
+            counts[kind] += count
+    return activity
+
+
+def search(db, text, limit=MAX_HITS):
+    """البحث عن text وإرجاع النتائج مجمعة حسب الفترة (المفتوحة أولًا ثم الأحدث)"""
+    started = time.perf_counter()
+    results = SearchResults(text)
+    expression = match_expression(text)
+    if not expression:
+        return results
+
+    rows = db.fetch_all(SEARCH_SQL, (expression, limit + 1))
+    results.truncated = len(rows) > limit
+    rows = rows[:limit]
+    results.hits = len(rows)
+
+    titles, period_keys, starts = _periods(db)
+    groups = {}
+
+    def group_for(key):
+        if key not in groups:
+            if key is None:
+                groups[key] = PeriodHits(None, "الفترة الحالية")
+            else:
+                title, start, end = titles.get(key, (f"أرشيف {key}", None, None))
+                groups[key] = PeriodHits(key, title, start, end)
+        return groups[key]
+
+    labels = {}
+    for kind, ref_id, archive_key_id, label, date in rows:
+        if kind == "item" and archive_key_id is None:
+            # الأصناف الحية بلا مفتاح أرشيف: فترتها حسب تاريخ شرائها
+            archive_key_id = _period_for_date(starts, date)
+        group = group_for(archive_key_id)
+        if kind == "member":
+            labels.setdefault(ref_id, label)
+            group.members.setdefault(ref_id, MemberHit(ref_id, label))
+        else:
+            group.items.append(ItemHit(ref_id, label, date))
+
+    results.with_activity = len(labels) <= ACTIVITY_MEMBER_LIMIT
+    activity = _member_activity(db, set(labels), period_keys) if results.with_activity else {}
+    for (key, member_id), counts in activity.items():
+        member = group_for(key).members.setdefault(member_id, MemberHit(member_id, labels[member_id]))
+        member.meals += counts["meals"]
+        member.drinks += counts["drinks"]
+
+    # المفتوحة أولًا ثم الفترات المغلقة من الأحدث للأقدم
+    results.periods = [g for g in groups.values() if g.is_open] + sorted(
+        (g for g in groups.values() if not g.is_open),
+        key=lambda g: (g.end_date or "", g.archive_key_id),
+        reverse=True,
+    )
+    results.elapsed_ms = (time.perf_counter() - started) * 1000
+    return results
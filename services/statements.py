@@ -0,0 +1,248 @@
+"""كشوف حساب المشتركين: ملف PDF لكل مشترك لفترة واحدة، مجمعة في ملف ZIP.
+
+البيانات تُقرأ في العملية الرئيسية باستعلامات مجمعة (إجماليات التقرير
+الشامل، ثم كل سجلات الوجبات والمشروبات للفترة مرة واحدة)، ثم تُرسم
+الملفات بالتوازي في ProcessPoolExecutor: رسم reportlab يستهلك المعالج
+كله في Python فلا تفيده الخيوط. كل عملية تسجل الخط العربي مرة واحدة
+عند بدئها، والعمليات تبدأ بطريقة spawn على كل الأنظمة لأن البرنامج
+يعمل بخيوط (خيط الكتابة، Flet) لا يصح نسخها بـ fork.
+"""
+import csv
+import io
+import logging
+import multiprocessing
+import os
+import re
+import shutil
+import tempfile
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from datetime import datetime
+
+from services import report_cache, reports
+from utils.pdf_fonts import FONT_NAME, register_arabic_font
+
+REPORTS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "reports")
+# أقصى عدد عمليات للرسم
+MAX_WORKERS = 8
+
+OPEN_PERIOD_RECORDS_SQL = {
+    "meals": "SELECT member_id, date, meal_type, final_cost FROM meal_records "
+             "WHERE period_id = ? ORDER BY member_id, date, meal_record_id",
+    "drinks": "SELECT member_id, date, drink_name, quantity, total_cost FROM drink_records "
+              "WHERE period_id = ? ORDER BY member_id, date, drink_record_id",
+}
+
+
+@dataclass
+class MemberStatement:
+    """بيانات كشف مشترك واحد (تُرسل كما هي إلى عملية الرسم)"""
+    totals: reports.MemberTotals
+    period_title: str
+    meals: list = field(default_factory=list)
+    drinks: list = field(default_factory=list)
+
+
+@dataclass
+class StatementBatch:
+    """نتيجة الدفعة: ملف ZIP وزمن رسم كل ملف [(member_id، اسم الملف، مللي ثانية)]"""
+    zip_path: str
+    files: list = field(default_factory=list)
+    workers: int = 0
+    elapsed: float = 0.0
+
+    @property
+    def render_ms(self):
+        return sum(ms for _, _, ms in self.files)
+
+    def summary(self):
+        if not self.files:
+            return "no statements"
+        slowest = max(self.files, key=lambda f: f[2])
+        return (
+            f"{len(self.files)} statements in {self.elapsed:.2f}s with {self.workers} workers "
+            f"(render {self.render_ms / 1000:.2f}s total, mean {self.render_ms / len(self.files):.1f} ms, "
+            f"slowest {slowest[1]} {slowest[2]:.1f} ms)"
+        )
+
+
+def _period_title(db, period_id):
+    row = db.fetch_one_cached(
+        "SELECT p.start_date, p.end_date, k.archive_name FROM periods p "
+        "LEFT JOIN archive_keys k ON k.archive_key_id = p.archive_key_id WHERE p.period_id = ?",
+        (period_id,)
+    )
+    if row is None:
+        return ""
+    start, end, name = row
+    return name or f"الفترة من {start or '?'} إلى {end or 'الآن'}"
+
+
+def load_statements(db, period_id=None):
+    """كشوف كل المشتركين لفترة (المفتوحة افتراضيًا)؛ قائمة فارغة إذا لم يوجد مشتركون"""
+    if period_id is None:
+        period_id = db.current_period_id()
+    report = reports.comprehensive_report(db, period_id)
+    if report is None:
+        return []
+    title = _period_title(db, period_id)
+    statements = {m.member_id: MemberStatement(m, title) for m in report.members}
+
+    period = db.fetch_one_cached(reports.PERIOD_SQL, (period_id,))
+    if period and period[0] is not None:
+        # فترة مغلقة: مع سجلات الأرشيف القديم
+        meals = [(r[3], r[2], r[1], r[4]) for r in reports.archived_meal_records(db, period[1])]
+        drinks = [(r[3], r[1], r[2], r[4], r[5]) for r in reports.archived_drink_records(db, period[1])]
+        meals.sort(key=lambda r: (r[0], r[1] or ""))
+        drinks.sort(key=lambda r: (r[0], r[1] or ""))
+    else:
+        meals = db.fetch_all(OPEN_PERIOD_RECORDS_SQL["meals"], (period_id,))
+        drinks = db.fetch_all(OPEN_PERIOD_RECORDS_SQL["drinks"], (period_id,))
+    for member_id, *record in meals:
+        if member_id in statements:
+            statements[member_id].meals.append(tuple(record))
+    for member_id, *record in drinks:
+        if member_id in statements:
+            statements[member_id].drinks.append(tuple(record))
+    return list(statements.values())
+
+
+def statement_filename(totals):
+    """اسم ملف آمن على كل الأنظمة: رقم المشترك ثم اسمه"""
+    name = re.sub(r'[\\/:*?"<>|\s]+', "_", f"{totals.rank or ''} {totals.name or ''}".strip()) or "member"
+    return f"{totals.member_id:05d}_{name}.pdf"
+
+
+def render_statement(statement, directory):
+    """رسم كشف مشترك إلى ملف PDF داخل directory (يعمل في عملية الرسم)؛ يعيد (member_id، اسم الملف، مللي ثانية)"""
+    started = time.perf_counter()
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+
+    totals = statement.totals
+    filename = statement_filename(totals)
+    doc = SimpleDocTemplate(os.path.join(directory, filename), pagesize=A4,
+                            rightMargin=30, leftMargin=30, topMargin=30, bottomMargin=30)
+    styles = getSampleStyleSheet()
+    font = FONT_NAME if register_arabic_font() else "Helvetica"
+    title_style = styles["Title"]
+    title_style.fontName = font
+    title_style.alignment = 2
+    heading = styles["Heading2"]
+    heading.fontName = font
+    heading.alignment = 2
+
+    def table(rows, header):
+        result = Table([header] + rows, repeatRows=1)
+        result.setStyle(TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('ALIGN', (0, 0), (-1, -1), 'RIGHT'),
+            ('FONTNAME', (0, 0), (-1, -1), font),
+            ('FONTSIZE', (0, 0), (-1, -1), 9),
+            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+            ('GRID', (0, 0), (-1, -1), 1, colors.black),
+        ]))
+        return result
+
+    elements = [
+        Paragraph(f"كشف حساب: {totals.rank or ''} {totals.name or ''}", title_style),
+        Paragraph(statement.period_title, heading),
+        Spacer(1, 12),
+        table([
+            ["المساهمة", f"{totals.contribution:,.2f}"],
+            ["تكلفة الوجبات", f"{totals.meal_cost:,.2f}"],
+            ["تكلفة المشروبات", f"{totals.drink_cost:,.2f}"],
+            ["النثرية الموزعة", f"{totals.misc_cost:,.2f}"],
+            ["إجمالي الاستهلاك", f"{totals.total_consumption:,.2f}"],
+            ["الرصيد النهائي", f"{totals.balance:,.2f}"],
+        ], ["البند", "المبلغ"]),
+        Spacer(1, 16),
+        Paragraph(f"الوجبات ({len(statement.meals)})", heading),
+    ]
+    if statement.meals:
+        elements.append(table(
+            [[date or "", meal_type or "", f"{cost or 0:,.2f}"] for date, meal_type, cost in statement.meals],
+            ["التاريخ", "الوجبة", "التكلفة"],
+        ))
+    elements += [Spacer(1, 16), Paragraph(f"المشروبات ({len(statement.drinks)})", heading)]
+    if statement.drinks:
+        elements.append(table(
+            [[date or "", name or "", quantity or 0, f"{cost or 0:,.2f}"]
+             for date, name, quantity, cost in statement.drinks],
+            ["التاريخ", "المشروب", "العدد", "التكلفة"],
+        ))
+    doc.build(elements)
+    return totals.member_id, filename, (time.perf_counter() - started) * 1000
+
+
+def _render_zip(statements, zip_path, batch, job=None):
+    """رسم الكشوف بالتوازي في ملفات مؤقتة ثم جمعها في zip_path مع timings.csv"""
+    workdir = tempfile.mkdtemp(prefix="statements-", dir=os.path.dirname(zip_path))
+    executor = ProcessPoolExecutor(
+        max_workers=batch.workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=register_arabic_font,
+    )
+    try:
+        futures = [executor.submit(render_statement, statement, workdir) for statement in statements]
+        for future in as_completed(futures):
+            batch.files.append(future.result())
+            if job is not None:
+                job.report(len(batch.files), len(statements), f"كشف {len(batch.files)}/{len(statements)}")
+        batch.files.sort()
+
+        timings = io.StringIO()
+        writer = csv.writer(timings)
+        writer.writerow(["member_id", "file", "render_ms"])
+        writer.writerows((member_id, filename, f"{ms:.1f}") for member_id, filename, ms in batch.files)
+        # ملفات PDF مضغوطة أصلًا، فتُخزن في الـ ZIP بدون ضغط
+        with zipfile.ZipFile(zip_path + ".partial", "w", zipfile.ZIP_STORED) as archive:
+            for _, filename, _ in batch.files:
+                archive.write(os.path.join(workdir, filename), filename)
+            archive.writestr("timings.csv", timings.getvalue())
+        os.replace(zip_path + ".partial", zip_path)
+    except BaseException:
+        if os.path.exists(zip_path + ".partial"):
+            os.remove(zip_path + ".partial")
+        raise
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def generate_statements(db, period_id=None, output_dir=REPORTS_DIR, workers=None, job=None):
+    """رسم كشوف كل المشتركين بالتوازي وجمعها في ZIP داخل output_dir؛ يعيد StatementBatch.
+
+    الملف timings.csv داخل الـ ZIP يحوي زمن رسم كل كشف. job اختياري
+    (utils.jobs): التقدم بعد كل ملف، والإلغاء يوقف المهام المتبقية ولا
+    يترك ملفات. كشوف الفترة المغلقة تُنسخ من ذاكرة التقارير إن رُسمت من
+    قبل (batch.files فارغة حينها).
+    """
+    started = time.perf_counter()
+    if period_id is None:
+        period_id = db.current_period_id()
+    os.makedirs(output_dir, exist_ok=True)
+    zip_path = os.path.join(output_dir, f"member_statements_{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}.zip")
+    batch = StatementBatch(zip_path)
+
+    def load():
+        statements = load_statements(db, period_id)
+        if not statements:
+            raise ValueError("No members to generate statements for")
+        return statements
+
+    def render(statements, path):
+        batch.workers = workers or min(os.cpu_count() or 1, MAX_WORKERS, len(statements))
+        _render_zip(statements, path, batch, job)
+
+    _, hit = report_cache.ReportCache(db).export(
+        "member_statements.zip", report_cache.period_archive_key(db, period_id), zip_path, load, render
+    )
+    batch.elapsed = time.perf_counter() - started
+    logging.info(f"Member statements: {'from report cache' if hit else batch.summary()} -> {zip_path}")
+    return batch
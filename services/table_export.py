@@ -0,0 +1,159 @@
+"""تصدير الجداول الخام (الحية والمؤرشفة) إلى Excel أو CSV بذاكرة ثابتة.
+
+الصفوف تُقرأ من مؤشر SQLite على دفعات بـ fetchmany وتُكتب مباشرة:
+Excel عبر xlsxwriter في وضع constant_memory (كل صف يُكتب إلى القرص
+فور اكتمال الصف التالي)، و CSV أو CSV.gz عبر csv.writer. لا يُحمَّل
+الجدول كاملًا في الذاكرة أبدًا، فاستهلاكها لا يتغير مع حجم الجدول.
+الكتابة في ملف مؤقت يُنقل عند الانتهاء (exports.atomic_output).
+"""
+import csv
+import gzip
+import logging
+import time
+from dataclasses import dataclass
+
+from services.exports import atomic_output
+
+# عدد الصفوف في كل fetchmany (بين الدفعات يُحدث التقدم ويُفحص الإلغاء)
+EXPORT_BATCH_ROWS = 5000
+# أقصى عدد صفوف في ورقة Excel (مع صف العناوين)؛ الباقي ينتقل إلى ورقة جديدة
+EXCEL_MAX_ROWS = 1048576
+# ".csv.gz" قبل ".csv" حتى يطابق الامتداد الأطول أولًا
+FORMATS = (".xlsx", ".csv.gz", ".csv")
+
+# الجدول -> شرط نطاق الفترات (first_period، last_period)، أو None إذا لم يكن للجدول فترة
+# (يُصدر كاملًا). الشروط تستخدم الفهارس (period_id، ...) و (archive_key_id، ...)
+PERIOD_RANGE = "period_id BETWEEN ? AND ?"
+ARCHIVE_RANGE = "archive_key_id IN (SELECT archive_key_id FROM periods WHERE period_id BETWEEN ? AND ?)"
+TABLES = {
+    "expenses": None,
+    "members": None,
+    "meal_records": PERIOD_RANGE,
+    "drink_records": PERIOD_RANGE,
+    "miscellaneous_expenses": PERIOD_RANGE,
+    "miscellaneous_contributions": PERIOD_RANGE,
+    "expenses_archive": ARCHIVE_RANGE,
+    "members_archive": ARCHIVE_RANGE,
+    "meal_records_archive": ARCHIVE_RANGE,
+    "drink_records_archive": ARCHIVE_RANGE,
+    "miscellaneous_expenses_archive": ARCHIVE_RANGE,
+    "miscellaneous_contributions_archive": ARCHIVE_RANGE,
+}
+
+
+@dataclass
+class TableExport:
+    """نتيجة تصدير جدول: عدد الصفوف والزمن"""
+    table: str
+    path: str
+    rows: int = 0
+    elapsed: float = 0.0
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.elapsed if self.elapsed else 0.0
+
+    def summary(self):
+        return f"{self.table}: {self.rows:,} rows in {self.elapsed:.2f}s ({self.rows_per_second:,.0f} rows/s) -> {self.path}"
+
+
+def export_format(path):
+    """صيغة التصدير من امتداد الملف، أو ValueError"""
+    for extension in FORMATS:
+        if path.lower().endswith(extension):
+            return extension
+    raise ValueError(f"Unsupported export format: {path} (expected one of {', '.join(FORMATS)})")
+
+
+def table_query(table, first_period=None, last_period=None):
+    """(الاستعلام، المعاملات) لصفوف الجدول في نطاق الفترات (أرقام periods.period_id، شاملة)"""
+    if table not in TABLES:
+        raise ValueError(f"Unknown table: {table}")
+    condition = TABLES[table]
+    if condition is None or (first_period is None and last_period is None):
+        return f"SELECT * FROM {table}", ()
+    low = first_period if first_period is not None else 0
+    high = last_period if last_period is not None else 2 ** 63 - 1
+    order = "period_id" if condition == PERIOD_RANGE else "archive_key_id"
+    return f"SELECT * FROM {table} WHERE {condition} ORDER BY {order}", (low, high)
+
+
+def _batches(cursor):
+    while True:
+        rows = cursor.fetchmany(EXPORT_BATCH_ROWS)
+        if not rows:
+            return
+        yield rows
+
+
+def _write_csv(output, header, batches, on_batch, compress):
+    # utf-8-sig حتى يقرأ Excel النص العربي صحيحًا عند فتح الملف
+    opener = gzip.open if compress else open
+    with opener(output, "wt", newline="", encoding="utf-8-sig") as stream:
+        writer = csv.writer(stream)
+        writer.writerow(header)
+        for rows in batches:
+            writer.writerows(rows)
+            on_batch(len(rows))
+
+
+def _write_xlsx(output, table, header, batches, on_batch):
+    import xlsxwriter
+
+    workbook = xlsxwriter.Workbook(output, {"constant_memory": True})
+    bold = workbook.add_format({"bold": True})
+    sheets = 0
+    sheet, row_index = None, EXCEL_MAX_ROWS
+    try:
+        for rows in batches:
+            for row in rows:
+                if row_index >= EXCEL_MAX_ROWS:
+                    sheets += 1
+                    sheet = workbook.add_worksheet(table[:28] if sheets == 1 else f"{table[:25]}_{sheets}")
+                    sheet.right_to_left()
+                    sheet.write_row(0, 0, header, bold)
+                    row_index = 1
+                sheet.write_row(row_index, 0, row)
+                row_index += 1
+            on_batch(len(rows))
+        if sheet is None:
+            workbook.add_worksheet(table[:28]).write_row(0, 0, header, bold)
+    finally:
+        workbook.close()
+
+
+def export_table(db, table, path, first_period=None, last_period=None, job=None):
+    """تصدير جدول (أو نطاق فترات منه) إلى path بصيغة امتداده؛ يعيد TableExport.
+
+    الجداول بلا فترة (expenses، members) تحوي الفترة المفتوحة فقط وتُصدر
+    كاملة. job اختياري (utils.jobs): التقدم وعدد الصفوف في الثانية بعد كل
+    دفعة، والإلغاء لا يترك ملفًا.
+    """
+    extension = export_format(path)
+    sql, params = table_query(table, first_period, last_period)
+    result = TableExport(table, path)
+    started = time.perf_counter()
+    total = db.fetch_one(f"SELECT COUNT(*) FROM ({sql})", params)[0]
+
+    def on_batch(count):
+        result.rows += count
+        elapsed = time.perf_counter() - started
+        rate = result.rows / elapsed if elapsed else 0.0
+        if job is not None:
+            job.report(result.rows, total, f"{result.rows:,}/{total:,} صف ({rate:,.0f} صف/ث)")
+
+    # مؤشر مستقل على اتصال القراءة الخاص بالخيط، يُغلق حتى لو توقف التصدير
+    cursor = db.reader().cursor()
+    try:
+        cursor.execute(sql, params)
+        header = [column[0] for column in cursor.description]
+        with atomic_output(path) as output:
+            if extension == ".xlsx":
+                _write_xlsx(output, table, header, _batches(cursor), on_batch)
+            else:
+                _write_csv(output, header, _batches(cursor), on_batch, compress=extension == ".csv.gz")
+    finally:
+        cursor.close()
+    result.elapsed = time.perf_counter() - started
+    logging.info(f"Table export {result.summary()}")
+    return result
@@ -0,0 +1,13 @@
+"""كل استعلام يشحنه البرنامج يستخدم فهرسًا (tools/check_query_plans)."""
+import importlib.util
+
+from tools import check_query_plans
+
+# جداول صفحات العرض تحتاج flet
+HAS_FLET = importlib.util.find_spec("flet") is not None
+
+
+def test_shipped_queries_avoid_full_scans():
+    count, failures = check_query_plans.check(include_grids=HAS_FLET)
+    assert count > 0
+    assert failures == []
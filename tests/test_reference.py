@@ -0,0 +1,72 @@
+"""اختبارات مخزن البيانات المرجعية (services/reference)."""
+import time
+
+from database import DatabaseManager
+from services import members, reference
+
+
+class FakeHub:
+    """مثل PubSubHub في Flet: معالج واحد لكل (موضوع، جلسة)"""
+
+    def __init__(self):
+        self.handlers = {}
+
+    def client(self, session_id):
+        return FakePubSub(self, session_id)
+
+    def send_all_on_topic(self, topic, message):
+        for (handler_topic, _), handler in list(self.handlers.items()):
+            if handler_topic == topic:
+                handler(topic, message)
+
+
+class FakePubSub:
+    def __init__(self, hub, session_id):
+        self.hub = hub
+        self.session_id = session_id
+
+    def subscribe_topic(self, topic, handler):
+        self.hub.handlers[(topic, self.session_id)] = handler
+
+    def send_all_on_topic(self, topic, message):
+        self.hub.send_all_on_topic(topic, message)
+
+
+class FakePage:
+    def __init__(self, pubsub):
+        self.pubsub = pubsub
+        self.changes = []
+
+    def on_reference_change(self, topic, change):
+        self.changes.append(change)
+
+
+def _wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_every_page_in_a_session_receives_changes(tmp_path):
+    db = DatabaseManager(str(tmp_path / "test.db"))
+    try:
+        hub = FakeHub()
+        session = hub.client("session-1")
+        other_session = hub.client("session-2")
+        meal_page, drink_page = FakePage(session), FakePage(session)
+        other_page = FakePage(other_session)
+        for page in (meal_page, drink_page, other_page):
+            store = reference.subscribe(db, page, page.on_reference_change)
+        # الاشتراك مرة أخرى (إعادة بناء الصفحة) لا يكرر المعالج
+        reference.subscribe(db, meal_page, meal_page.on_reference_change)
+        store.member_options()
+
+        member_id = members.register_member(db, "نقيب", "عضو جديد", 10)
+
+        pages = (meal_page, drink_page, other_page)
+        assert _wait_for(lambda: all(page.changes for page in pages))
+        for page in pages:
+            assert [(change.source, change.changed) for change in page.changes] == [("members", [member_id])]
+    finally:
+        db.close_connection()
@@ -0,0 +1,34 @@
+"""اختبارات ذاكرة التقارير المرسومة (services/report_cache)."""
+from database import DatabaseManager
+from services import report_cache
+
+HITS_SQL = "SELECT hits FROM report_cache WHERE report_type = 'report.pdf'"
+
+
+def _cached_report(db, directory):
+    db.write(lambda cursor: cursor.execute(
+        "INSERT INTO archive_keys (archive_key_id, archive_name, start_date, end_date, archived_at) "
+        "VALUES (1, 'يناير', '2026-01-01', '2026-01-31', '2026-02-01')"
+    ))
+    cache = report_cache.ReportCache(db, directory=str(directory))
+    cache.store("report.pdf", 1, "digest", lambda path: open(path, "wb").write(b"pdf"), ".pdf")
+    return cache
+
+
+def test_touches_are_written_on_flush_and_when_a_batch_fills(tmp_path):
+    db = DatabaseManager(str(tmp_path / "test.db"))
+    try:
+        cache = _cached_report(db, tmp_path / "cache")
+
+        for _ in range(3):
+            assert cache.lookup("report.pdf", 1)
+        assert db.fetch_one(HITS_SQL)[0] == 0
+        # عند إغلاق البرنامج
+        report_cache.flush_touches(db)
+        assert db.fetch_one(HITS_SQL)[0] == 3
+
+        for _ in range(report_cache.TOUCH_BATCH):
+            cache.lookup("report.pdf", 1)
+        assert db.fetch_one(HITS_SQL)[0] == 3 + report_cache.TOUCH_BATCH
+    finally:
+        db.close_connection()
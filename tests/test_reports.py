@@ -0,0 +1,60 @@
+"""اختبارات التقرير الشامل (services/reports)."""
+import sqlite3
+
+import migrations
+from database import DatabaseManager
+from services import reports, statements
+
+
+def _legacy_database(path):
+    """قاعدة بيانات بمخطط ما قبل الفترات فيها شهر مؤرشف بالطريقة القديمة:
+    سجلاته في جداول *_archive فقط وبدون لقطة للمشتركين"""
+    conn = sqlite3.connect(path)
+    version, _, initial_schema = migrations.MIGRATIONS[0]
+    initial_schema(conn.cursor())
+    conn.execute(f"PRAGMA user_version = {version}")
+    conn.executemany(
+        "INSERT INTO members (member_id, name, rank, contribution, total_due, date) VALUES (?, ?, ?, ?, 0, ?)",
+        [(1, "أحمد", "نقيب", 100.0, "2026-01-01"), (2, "علي", "رائد", 50.0, "2026-01-01")],
+    )
+    conn.execute(
+        "INSERT INTO archive_keys (archive_key_id, archive_name, start_date, end_date, archived_at) "
+        "VALUES (1, 'يناير', '2026-01-01', '2026-01-31', '2026-02-01')"
+    )
+    conn.executemany(
+        "INSERT INTO meal_records_archive (meal_record_id, meal_type, date, member_id, final_cost, archive_key_id) "
+        "VALUES (?, ?, ?, ?, ?, 1)",
+        [(10, "غداء", "2026-01-05", 1, 12.5), (11, "عشاء", "2026-01-06", 2, 7.0), (12, "غداء", "2026-01-07", 1, 4.0)],
+    )
+    conn.execute(
+        "INSERT INTO drink_records_archive (drink_record_id, date, drink_name, member_id, quantity, total_cost, archive_key_id) "
+        "VALUES (20, '2026-01-05', 'شاي', 1, 2, 3.0, 1)"
+    )
+    # سجل حي بعد الأرشفة ينتمي للفترة المفتوحة
+    conn.execute(
+        "INSERT INTO meal_records (meal_record_id, meal_type, date, member_id, final_cost) "
+        "VALUES (30, 'غداء', '2026-02-03', 2, 9.0)"
+    )
+    conn.commit()
+    conn.close()
+
+
+def test_closed_report_includes_legacy_archive_records(tmp_path):
+    path = str(tmp_path / "legacy.db")
+    _legacy_database(path)
+    db = DatabaseManager(path)
+    try:
+        period_id = db.fetch_one("SELECT period_id FROM periods WHERE archive_key_id = 1")[0]
+
+        report = reports.comprehensive_report(db, period_id)
+
+        totals = {m.member_id: (m.meal_cost, m.drink_cost) for m in report.members}
+        assert totals == {1: (16.5, 3.0), 2: (7.0, 0)}
+        # التقرير يطابق الكشوف المبنية من سجلات الأرشيف
+        for statement in statements.load_statements(db, period_id):
+            assert statement.totals.meal_cost == sum(cost for _, _, cost in statement.meals)
+            assert statement.totals.drink_cost == sum(cost for _, _, _, cost in statement.drinks)
+        open_report = reports.comprehensive_report(db)
+        assert {m.member_id: m.meal_cost for m in open_report.members} == {1: 0, 2: 9.0}
+    finally:
+        db.close_connection()
@@ -0,0 +1,30 @@
+"""اختبارات البحث الشامل (services/search)."""
+from database import DatabaseManager, close_period
+from services import month_close, search
+
+
+def _add_item(cursor, name, date):
+    cursor.execute(
+        "INSERT INTO expenses (item_name, quantity, price, total_price, remaining, is_drink, is_miscellaneous, date) "
+        "VALUES (?, 10, 2, 20, 10, 0, 0, ?)",
+        (name, date),
+    )
+
+
+def test_live_items_are_grouped_by_the_period_of_their_date(tmp_path):
+    db = DatabaseManager(str(tmp_path / "test.db"))
+    try:
+        def close_with_item(cursor):
+            _add_item(cursor, "أرز قديم", "2000-01-05")
+            period_id = cursor.execute("SELECT period_id FROM periods WHERE closed_at IS NULL").fetchone()[0]
+            close_period(cursor, month_close.archive_key_for_period(cursor, period_id))
+            _add_item(cursor, "أرز جديد", "2999-01-05")
+
+        db.write(close_with_item)
+
+        results = search.search(db, "أرز")
+
+        groups = {period.is_open: [item.label for item in period.items] for period in results.periods}
+        assert groups == {True: ["أرز جديد"], False: ["أرز قديم"]}
+    finally:
+        db.close_connection()
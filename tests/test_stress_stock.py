@@ -0,0 +1,7 @@
+"""حجز المخزون من جلسات وخيوط متوازية (tools/stress_stock) بحجم صغير."""
+from tools import stress_stock
+
+
+def test_concurrent_reservations_never_oversell():
+    # المخزون أقل من مجموع الطلبات حتى تتنافس الخيوط على آخر الكميات
+    assert stress_stock.run(sessions=2, threads=4, attempts=50, items=2, stock=100)
@@ -0,0 +1,162 @@
+"""قياس زمن المسارات الساخنة في قاعدة البيانات عند عدة أحجام للبيانات.
+
+لكل نقطة قياس (عدد مشتركين) تُولَّد قاعدة بيانات مؤقتة بـ
+tools.generate_data ثم تُقاس العمليات التالية عبر طبقة الخدمات نفسها
+التي تستخدمها الصفحات:
+    meal_save, drink_save, misc_distribution, comprehensive_report,
+    archive_reports, table_loads, month_close
+
+كل عملية تُكرر --repeat مرات (عدا month_close التي تُنفذ مرة واحدة في
+النهاية لأنها تغلق الفترة)، والنتيجة JSON يمكن حفظها ومقارنتها بين
+الإصدارات لاكتشاف التراجع في الأداء.
+
+التشغيل:
+    python -m tools.benchmark [--scales 100,1000,5000] [--repeat 5] [--output bench.json]
+"""
+import argparse
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from database import OPEN_PERIOD_SQL, DatabaseManager
+from services import drinks, meals, month_close, reports
+from tools import generate_data
+
+# الاستعلامات التي تحملها صفحات العرض عند فتحها (أول نافذة في DataGrid)
+TABLE_LOAD_QUERIES = [
+    "SELECT expense_id, item_name, quantity, price, total_price, consumption, remaining, is_miscellaneous, is_drink FROM expenses WHERE is_miscellaneous = 0 ORDER BY expense_id LIMIT 50",
+    "SELECT expense_id, item_name, quantity, price, total_price, consumption, remaining, is_miscellaneous, is_drink FROM expenses WHERE is_miscellaneous = 1 ORDER BY expense_id LIMIT 50",
+    "SELECT member_id, rank, name, contribution, total_due FROM members ORDER BY member_id LIMIT 50",
+    "SELECT archive_key_id, archive_name, start_date, end_date, archived_at FROM archive_keys ORDER BY archived_at DESC",
+]
+
+# عدد المشتركين في كل وجبة مسجلة أثناء القياس
+MEAL_PARTY_SIZE = 20
+
+
+def timed(fn, repeat):
+    """تنفيذ fn عدة مرات وإرجاع ملخص الأزمنة بالمللي ثانية"""
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return {
+        "runs": repeat,
+        "median_ms": round(statistics.median(samples), 3),
+        "min_ms": round(min(samples), 3),
+        "max_ms": round(max(samples), 3),
+    }
+
+
+def bench_scale(path, members, repeat, generator_options):
+    """توليد قاعدة بيانات بحجم members وقياس كل العمليات عليها"""
+    generated = generate_data.generate(path, members=members, **generator_options)
+    db = DatabaseManager(path)
+    try:
+        member_ids = [row[0] for row in db.fetch_all("SELECT member_id FROM members")]
+        party = member_ids[:MEAL_PARTY_SIZE]
+        item_ids = list(meals.meal_options(db))[:3]
+        drink_name = drinks.drink_names(db)[0]
+        period_id = db.current_period_id()
+        archive_key_id = db.fetch_one("SELECT MAX(archive_key_id) FROM periods WHERE closed_at IS NOT NULL")[0]
+        today = datetime.now().strftime("%Y-%m-%d")
+
+        def misc_distribution():
+            def distribute(cursor):
+                cursor.execute(
+                    "INSERT INTO expenses (item_name, quantity, price, total_price, remaining, is_miscellaneous, date) "
+                    "VALUES ('نثريات القياس', 1, 100, 100, 1, 1, ?)", (today,)
+                )
+                month_close.distribute_miscellaneous(cursor, period_id)
+            db.write(distribute)
+
+        def archive_reports():
+            reports.archived_meal_records(db, archive_key_id)
+            reports.archived_drink_records(db, archive_key_id)
+
+        def table_loads():
+            for query in TABLE_LOAD_QUERIES:
+                db.fetch_all(query)
+
+        timings = {
+            "meal_save": timed(lambda: meals.record_meal(
+                db, "غداء", today, party, {expense_id: 1 for expense_id in item_ids}, misc_total=10.0
+            ), repeat),
+            "drink_save": timed(lambda: drinks.record_drink(db, today, drink_name, party[0], 1), repeat),
+            "misc_distribution": timed(misc_distribution, repeat),
+            "comprehensive_report": timed(lambda: reports.comprehensive_report(db), repeat),
+            "archive_reports": timed(archive_reports, repeat) if archive_key_id else None,
+            "table_loads": timed(table_loads, repeat),
+        }
+        live_rows = db.fetch_one(f"SELECT COUNT(*) FROM meal_records WHERE period_id = {OPEN_PERIOD_SQL}")[0]
+        timings["month_close"] = timed(lambda: month_close.run_month_close(db), 1)
+    finally:
+        db.close_connection()
+
+    return {
+        "members": members,
+        "rows": generated["rows"],
+        "open_period_meal_records": live_rows,
+        "generate_seconds": generated["seconds"],
+        "timings": {name: value for name, value in timings.items() if value is not None},
+    }
+
+
+def run(scales, repeat, generator_options):
+    workdir = tempfile.mkdtemp(prefix="bench-")
+    results = []
+    for members in scales:
+        path = os.path.join(workdir, f"bench-{members}.db")
+        results.append(bench_scale(path, members, repeat, generator_options))
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+    return {
+        "generated_at": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "platform": platform.platform(),
+        "repeat": repeat,
+        "generator": generator_options,
+        "scales": results,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scales", default="100,1000,5000", help="أعداد المشتركين مفصولة بفواصل")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--meals-per-day", type=int, default=3)
+    parser.add_argument("--drinks-per-day", type=int, default=200)
+    parser.add_argument("--periods", type=int, default=2)
+    parser.add_argument("--output", help="حفظ النتيجة في ملف JSON بدلًا من طباعتها")
+    args = parser.parse_args(argv)
+
+    generator_options = {
+        "days": args.days,
+        "meals_per_day": args.meals_per_day,
+        "drinks_per_day": args.drinks_per_day,
+        "periods": args.periods,
+    }
+    scales = [int(value) for value in args.scales.split(",") if value.strip()]
+    result = run(scales, args.repeat, generator_options)
+    text = json.dumps(result, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+        print(f"Benchmark results written to {args.output}")
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
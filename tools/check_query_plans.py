@@ -0,0 +1,177 @@
+"""فحص خطط تنفيذ الاستعلامات المستخدمة في البرنامج.
+
+يُنشئ قاعدة بيانات مؤقتة بالمخطط الحالي (عبر الترحيلات) ثم ينفذ
+EXPLAIN QUERY PLAN على كل استعلام يشحنه البرنامج، ويفشل إذا وجد مسحًا
+كاملًا (SCAN بدون فهرس) لجدول كبير لم يُسمح به صراحةً.
+
+الاستعلامات لا تُنسخ هنا يدويًا: تُجمع من ثوابت *_SQL في database و
+services/* (النصوص والقواميس)، ومن الاستعلامات التي تبنيها
+table_export.table_query و DataGrid لجداول صفحات العرض (pages.show_*.GRID).
+صفحات العرض تحتاج flet، فتُفحص فقط إذا طُلبت (include_grids).
+
+التشغيل:
+    python -m tools.check_query_plans
+
+ويشغله tests/test_query_plans.py مع pytest.
+"""
+import importlib
+import pkgutil
+import sqlite3
+import sys
+
+import database
+import migrations
+import services
+from services import table_export
+
+# الجداول التي تنمو مع حجم البيانات
+LARGE_TABLES = {
+    "expenses", "members", "meal_records", "drink_records",
+    "miscellaneous_expenses", "miscellaneous_contributions",
+    "expenses_archive", "members_archive", "meal_records_archive",
+    "drink_records_archive", "miscellaneous_expenses_archive",
+    "miscellaneous_contributions_archive", "periods", "month_close_runs",
+    "month_close_stages", "name_changes",
+}
+
+# اسم الثابت -> الجداول المسموح بمسحها كاملة لأن الاستعلام يقرأها كلها عمدًا
+ALLOWED_SCANS = {
+    "reference.MEMBERS_SQL": ("members",),
+    "reference.ITEMS_SQL": ("expenses",),
+    "name_index.NAME_ROWS_SQL[members]": ("members",),
+    "name_index.NAME_ROWS_SQL[expenses]": ("expenses",),
+    "month_close.SNAPSHOT_MEMBERS_SQL": ("members",),
+    "reports.COMPREHENSIVE_MEMBERS_SQL": ("members",),
+    "reports.LEGACY_COMPREHENSIVE_MEMBERS_SQL": ("members",),
+    # القراءة بترتيب rowid نفسه وتتوقف عند LIMIT
+    "show_subscribers ORDER BY member_id ASC": ("members",),
+    "show_subscribers ORDER BY member_id DESC": ("members",),
+}
+
+# صفحات العرض التي تُفحص استعلامات جداولها
+GRID_PAGES = ("show_purchases", "show_over", "show_subscribers")
+
+_STATEMENTS = ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH")
+
+
+def _statement(sql):
+    """الاستعلام كما يُنفذ، أو None إذا لم يكن الثابت استعلامًا كاملًا"""
+    text = sql.lstrip()
+    if text.startswith("("):
+        # استعلام فرعي يُضمَّن في استعلامات أخرى (مثل OPEN_PERIOD_SQL)
+        return f"SELECT {text}"
+    return sql if text.upper().startswith(_STATEMENTS) else None
+
+
+def module_queries(module, prefix):
+    """(الاسم، الاستعلام) لكل ثابت *_SQL عام في الوحدة؛ القواميس تُفك إلى عناصرها"""
+    for name, value in sorted(vars(module).items()):
+        if name.startswith("_") or not name.isupper() or not name.endswith("_SQL"):
+            continue
+        items = value.items() if isinstance(value, dict) else [(None, value)]
+        for key, sql in items:
+            label = f"{prefix}.{name}" if key is None else f"{prefix}.{name}[{key}]"
+            statement = _statement(sql) if isinstance(sql, str) else None
+            if statement:
+                yield label, statement
+
+
+def grid_filters(page):
+    """أمثلة مرشحات صفحة العرض (كما تبنيها الصفحة عبر set_filter)"""
+    from utils.data_grid import prefix_filter, range_filter
+
+    return {
+        "show_purchases": [prefix_filter("item_name", "a"), range_filter("date", "2024-01-01", "2024-12-31"),
+                           ("is_drink = 1", ())],
+        "show_over": [prefix_filter("item_name", "a"), range_filter("date", "2024-01-01", "2024-12-31")],
+        "show_subscribers": [prefix_filter("name", "a"), ("rank = ?", ("a",))],
+    }[page]
+
+
+def grid_queries(name, grid, filters):
+    """استعلامات DataGrid للجدول: أول دفعة وما يليها وما يسبقها لكل ترتيب، والمرشحات"""
+    from utils.data_grid import DataGrid
+
+    view = DataGrid(None, display_columns=[], column_names={}, **grid)
+    sample = {col: 1 for col in view.columns}
+    blank = dict(sample, **{col: None for col in view.sortable})
+    for col in [view.key] + sorted(view.sortable):
+        for descending in (False, True):
+            view.sort_column, view.descending = col, descending
+            order = f"{col} {'DESC' if descending else 'ASC'}"
+            yield f"{name} ORDER BY {order}", view._select_sql(view._where()[0])
+            for row in (sample, blank):
+                where = view._where(view._after(row, descending))[0]
+                yield f"{name} ORDER BY {order} after", view._select_sql(where)
+                where = view._where(view._after(row, not descending))[0]
+                yield f"{name} ORDER BY {order} before", view._select_sql(where, reverse=True)
+    view.sort_column, view.descending = view.key, False
+    yield f"{name} row", view._select_sql(view._where((f"{view.key} = ?", (1,)))[0])
+    for clause, params in filters:
+        view.filters = {"filter": (clause, params)}
+        yield f"{name} WHERE {clause}", view._select_sql(view._where()[0])
+
+
+def shipped_queries(include_grids=True):
+    """(الاسم، الاستعلام) لكل استعلام يشحنه البرنامج؛ بدون جداول صفحات العرض إذا لم تُطلب"""
+    yield from module_queries(database, "database")
+    # الثوابت المستوردة من وحدة أخرى تُفحص مرة واحدة باسمها الأصلي
+    seen = {sql for _, sql in module_queries(database, "database")}
+    for info in pkgutil.iter_modules(services.__path__):
+        for name, sql in module_queries(importlib.import_module(f"services.{info.name}"), info.name):
+            if sql not in seen:
+                seen.add(sql)
+                yield name, sql
+    for table, condition in table_export.TABLES.items():
+        if condition is not None:
+            yield f"table_export {table}", table_export.table_query(table, 1, 2)[0]
+    if not include_grids:
+        return
+    for page in GRID_PAGES:
+        module = importlib.import_module(f"pages.{page}")
+        yield from grid_queries(page, module.GRID, grid_filters(page))
+
+
+def full_scans(conn, sql, allowed=()):
+    """إرجاع أسماء الجداول الكبيرة التي يمسحها الاستعلام بالكامل بدون فهرس"""
+    params = (None,) * sql.count("?")
+    scans = []
+    for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params):
+        detail = row[-1]
+        if not detail.startswith("SCAN "):
+            continue
+        if "USING INDEX" in detail or "USING COVERING INDEX" in detail:
+            continue
+        table = detail.split()[1]
+        if table in LARGE_TABLES and table not in allowed:
+            scans.append(detail)
+    return scans
+
+
+def check(include_grids=True):
+    """فحص كل الاستعلامات على مخطط الترحيلات؛ يعيد (عدد الاستعلامات، رسائل الفشل)"""
+    conn = sqlite3.connect(":memory:", isolation_level=None)
+    migrations.migrate(conn)
+    queries = list(shipped_queries(include_grids))
+    failures = []
+    for name, sql in queries:
+        scans = full_scans(conn, sql, ALLOWED_SCANS.get(name, ()))
+        if scans:
+            failures.append("\n    ".join([f"FULL SCAN: {name}: {' '.join(sql.split())}", *scans]))
+    unused = set(ALLOWED_SCANS) - {name for name, _ in queries}
+    for name in sorted(unused):
+        if include_grids or name.split()[0] not in GRID_PAGES:
+            failures.append(f"UNKNOWN QUERY in ALLOWED_SCANS: {name}")
+    return len(queries), failures
+
+
+def main():
+    count, failures = check()
+    for failure in failures:
+        print(failure)
+    print(f"{count - len(failures)}/{count} queries use indexes")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,39 @@
+"""تصدير جدول خام (حي أو مؤرشف) من قاعدة البيانات إلى xlsx أو csv أو csv.gz.
+
+يستخدم services.table_export: القراءة على دفعات والكتابة المتدفقة بذاكرة
+ثابتة مهما كبر الجدول، ويطبع عدد الصفوف في الثانية. --from و --to أرقام
+فترات (periods.period_id) شاملة؛ بدونهما يُصدر الجدول كاملًا.
+
+التشغيل:
+    python -m tools.export_table TABLE OUTPUT [--db expenses.db] [--from 1] [--to 3]
+"""
+import argparse
+import sys
+
+from database import DatabaseManager
+from services import table_export
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("table", choices=sorted(table_export.TABLES))
+    parser.add_argument("output", help="مسار الملف؛ الصيغة من الامتداد: " + ", ".join(table_export.FORMATS))
+    parser.add_argument("--db", default="expenses.db")
+    parser.add_argument("--from", dest="first_period", type=int, help="أول فترة")
+    parser.add_argument("--to", dest="last_period", type=int, help="آخر فترة")
+    args = parser.parse_args(argv)
+    try:
+        table_export.export_format(args.output)
+    except ValueError as e:
+        parser.error(str(e))
+    db = DatabaseManager(args.db)
+    try:
+        result = table_export.export_table(db, args.table, args.output, args.first_period, args.last_period)
+    finally:
+        db.close_connection()
+    print(result.summary())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
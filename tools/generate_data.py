@@ -0,0 +1,164 @@
+"""توليد بيانات تجريبية في قاعدة بيانات مؤقتة لقياس الأداء مع نمو البيانات.
+
+يملأ قاعدة بيانات جديدة (بالمخطط الحالي عبر الترحيلات) بعدد محدد من
+المشتركين والأصناف، ووجبات ومشروبات يومية لكل فترة، ثم يقفل الفترات
+المؤرشفة بخط التقفيل الفعلي (services.month_close) ويترك الفترة الأخيرة
+مفتوحة. الإدراج يتم بـ executemany داخل معاملة واحدة لكل فترة.
+
+التشغيل:
+    python -m tools.generate_data scratch.db [--members 500] [--items 40]
+        [--days 30] [--meals-per-day 3] [--drinks-per-day 200] [--periods 2]
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from datetime import date, timedelta
+
+from database import OPEN_PERIOD_SQL, DatabaseManager
+from services import month_close
+
+RANKS = ["جندي", "عريف", "رقيب", "ملازم", "نقيب", "رائد"]
+MEAL_TYPES = ["فطار", "غداء", "عشاء"]
+# نسبة المشتركين الحاضرين في كل وجبة
+ATTENDANCE = 0.7
+
+
+def _seed_members(cursor, rng, count):
+    cursor.executemany(
+        "INSERT INTO members (name, rank, contribution, total_due, date) VALUES (?, ?, ?, 0, ?)",
+        [(f"مشترك {n}", rng.choice(RANKS), round(rng.uniform(200, 1000), 2), "2025-01-01")
+         for n in range(count)]
+    )
+    cursor.execute("SELECT member_id FROM members")
+    return [row[0] for row in cursor.fetchall()]
+
+
+def _stock_items(cursor, rng, items, drinks, stock, start):
+    """شراء مخزون الفترة: أصناف الوجبات والمشروبات مرة واحدة، ونثريات جديدة لكل فترة"""
+    rows = []
+    cursor.execute("SELECT COUNT(*) FROM expenses WHERE is_miscellaneous = 0")
+    if not cursor.fetchone()[0]:
+        for n in range(items):
+            price = round(rng.uniform(1, 50), 2)
+            rows.append((f"صنف {n}", stock, price, price * stock, stock, 0, 0, start))
+        for n in range(drinks):
+            price = round(rng.uniform(1, 10), 2)
+            rows.append((f"مشروب {n}", stock, price, price * stock, stock, 0, 1, start))
+    for n in range(max(1, items // 10)):
+        price = round(rng.uniform(10, 200), 2)
+        rows.append((f"نثريات {n}", 1, price, price, 1, 1, 0, start))
+    cursor.executemany("""
+        INSERT INTO expenses (item_name, quantity, price, total_price, remaining, is_miscellaneous, is_drink, date)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    """, rows)
+    # بعد التقفيل يصبح المتبقي صفرًا، فيُعاد ملء المخزون لكل فترة
+    cursor.execute(
+        "UPDATE expenses SET remaining = quantity, consumption = 0 WHERE is_miscellaneous = 0"
+    )
+
+
+def _fill_period(cursor, rng, member_ids, start, days, meals_per_day, drinks_per_day):
+    """وجبات ومشروبات الفترة؛ يعيد عدد السجلات المدرجة"""
+    cursor.execute("SELECT item_name, price FROM expenses WHERE is_drink = 1")
+    drinks = cursor.fetchall()
+    meal_rows = []
+    drink_rows = []
+    for day in range(days):
+        day_text = (start + timedelta(days=day)).isoformat()
+        for meal in range(meals_per_day):
+            meal_type = MEAL_TYPES[meal % len(MEAL_TYPES)]
+            diners = [m for m in member_ids if rng.random() < ATTENDANCE] or member_ids[:1]
+            cost = round(rng.uniform(100, 2000), 2) / len(diners)
+            meal_rows.extend((meal_type, day_text, member_id, cost) for member_id in diners)
+        for _ in range(drinks_per_day if drinks else 0):
+            name, price = rng.choice(drinks)
+            quantity = rng.randint(1, 3)
+            drink_rows.append((day_text, name, rng.choice(member_ids), quantity, quantity * price))
+    cursor.executemany(
+        "INSERT INTO meal_records (meal_type, date, member_id, final_cost) VALUES (?, ?, ?, ?)", meal_rows
+    )
+    cursor.executemany(
+        "INSERT INTO drink_records (date, drink_name, member_id, quantity, total_cost) VALUES (?, ?, ?, ?, ?)",
+        drink_rows
+    )
+    cursor.execute(f"""
+        UPDATE members SET total_due = total_due + t.cost
+        FROM (
+            SELECT member_id, SUM(cost) AS cost FROM (
+                SELECT member_id, final_cost AS cost FROM meal_records
+                WHERE period_id = {OPEN_PERIOD_SQL}
+                UNION ALL
+                SELECT member_id, total_cost FROM drink_records
+                WHERE period_id = {OPEN_PERIOD_SQL}
+            )
+            GROUP BY member_id
+        ) AS t
+        WHERE members.member_id = t.member_id
+    """)
+    return len(meal_rows) + len(drink_rows)
+
+
+def generate(path, members=500, items=40, drinks=10, days=30, meals_per_day=3,
+             drinks_per_day=200, periods=2, stock=1_000_000, seed=1):
+    """إنشاء قاعدة بيانات تجريبية في path؛ يعيد إحصاءات عدد الصفوف والزمن"""
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    rng = random.Random(seed)
+    started = time.perf_counter()
+    db = DatabaseManager(path)
+    try:
+        member_ids = db.write(lambda cursor: _seed_members(cursor, rng, members))
+        start = date(2025, 1, 1)
+        records = 0
+        # الفترات المؤرشفة ثم الفترة المفتوحة الحالية
+        for period in range(periods + 1):
+            def fill(cursor, start=start):
+                _stock_items(cursor, rng, items, drinks, stock, start.isoformat())
+                return _fill_period(cursor, rng, member_ids, start, days, meals_per_day, drinks_per_day)
+            records += db.write(fill)
+            if period < periods:
+                month_close.run_month_close(db)
+            start += timedelta(days=days)
+
+        counts = {
+            table: db.fetch_one(f"SELECT COUNT(*) FROM {table}")[0]
+            for table in ("members", "expenses", "meal_records", "drink_records",
+                          "miscellaneous_contributions", "periods")
+        }
+    finally:
+        db.close_connection()
+    return {
+        "path": path,
+        "rows": counts,
+        "records": records,
+        "seconds": round(time.perf_counter() - started, 3),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path")
+    parser.add_argument("--members", type=int, default=500)
+    parser.add_argument("--items", type=int, default=40)
+    parser.add_argument("--drinks", type=int, default=10)
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--meals-per-day", type=int, default=3)
+    parser.add_argument("--drinks-per-day", type=int, default=200)
+    parser.add_argument("--periods", type=int, default=2, help="عدد الفترات المؤرشفة")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+    stats = generate(
+        args.path, members=args.members, items=args.items, drinks=args.drinks,
+        days=args.days, meals_per_day=args.meals_per_day,
+        drinks_per_day=args.drinks_per_day, periods=args.periods, seed=args.seed,
+    )
+    print(json.dumps(stats, ensure_ascii=False, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,93 @@
+"""اختبار ضغط لحجز المخزون من جلسات متوازية.
+
+يفتح عدة نسخ مستقلة من DatabaseManager على نفس قاعدة بيانات مؤقتة
+(كل نسخة بخيط كتابة واتصال خاص، كما لو كانت عمليات منفصلة) ثم يحجز
+منها كميات عشوائية بالتوازي من خيوط متعددة. ينجح الاختبار فقط إذا:
+  - لم يصبح المتبقي سالبًا لأي صنف،
+  - وكان الاستهلاك مساويًا لمجموع الحجوزات الناجحة،
+  - وكان الاستهلاك + المتبقي = الكمية الأصلية.
+
+التشغيل:
+    python -m tools.stress_stock [--sessions 4] [--threads 8] [--attempts 500]
+
+ويشغله tests/test_stress_stock.py مع pytest بحجم صغير.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+from collections import Counter
+
+from database import DatabaseManager, InsufficientStockError
+
+
+def run(sessions, threads, attempts, items, stock):
+    path = os.path.join(tempfile.mkdtemp(), "stress.db")
+    managers = [DatabaseManager(path) for _ in range(sessions)]
+    managers[0].write(lambda cursor: cursor.executemany(
+        "INSERT INTO expenses (item_name, quantity, price, total_price, remaining, date) VALUES (?, ?, 1, ?, ?, '2025-01-01')",
+        [(f"item-{i}", stock, stock, stock) for i in range(items)]
+    ))
+    expense_ids = [row[0] for row in managers[0].fetch_all("SELECT expense_id FROM expenses")]
+
+    reserved = Counter()
+    rejected = Counter()
+    errors = []
+    counter_lock = threading.Lock()
+
+    def worker(db, seed):
+        rng = random.Random(seed)
+        for _ in range(attempts):
+            expense_id = rng.choice(expense_ids)
+            quantity = rng.randint(1, 3)
+            try:
+                db.reserve_stock([(expense_id, quantity)])
+            except InsufficientStockError:
+                with counter_lock:
+                    rejected[expense_id] += 1
+            except Exception as e:
+                errors.append(e)
+            else:
+                with counter_lock:
+                    reserved[expense_id] += quantity
+
+    workers = [
+        threading.Thread(target=worker, args=(managers[n % sessions], n))
+        for n in range(sessions * threads)
+    ]
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+
+    ok = not errors
+    for expense_id, quantity, consumption, remaining in managers[0].fetch_all(
+        "SELECT expense_id, quantity, consumption, remaining FROM expenses"
+    ):
+        if remaining < 0 or consumption != reserved[expense_id] or consumption + remaining != quantity:
+            ok = False
+        print(f"expense {expense_id}: reserved={reserved[expense_id]} rejected={rejected[expense_id]} "
+              f"consumption={consumption} remaining={remaining}")
+    for e in errors[:5]:
+        print(f"error: {e!r}")
+    for db in managers:
+        db.close_connection()
+    print("PASS" if ok else "FAIL")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=4)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--attempts", type=int, default=500)
+    parser.add_argument("--items", type=int, default=3)
+    parser.add_argument("--stock", type=int, default=2000)
+    args = parser.parse_args()
+    return 0 if run(args.sessions, args.threads, args.attempts, args.items, args.stock) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
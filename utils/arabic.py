@@ -0,0 +1,43 @@
+"""تطبيع النص العربي للبحث: في Python وكتعبير SQL مكافئ للمشغلات."""
+import re
+
+# صور الحروف التي تُوحَّد: الألف والهمزة، والتاء المربوطة، والألف المقصورة
+LETTER_FOLDS = {
+    "أ": "ا", "إ": "ا", "آ": "ا", "ٱ": "ا",
+    "ة": "ه",
+    "ى": "ي",
+    "ؤ": "و",
+    "ئ": "ي",
+}
+# الحركات والتنوين والشدة والسكون والألف الخنجرية والتطويل
+MARKS = [chr(code) for code in range(0x064B, 0x0653)] + ["\u0670", "\u0640"]
+
+_FOLD_TABLE = str.maketrans({**LETTER_FOLDS, **{mark: None for mark in MARKS}})
+# علامات إضافية نادرة (علامات المصحف) تُحذف في normalize فقط
+_EXTRA_MARKS = re.compile("[\u0610-\u061a\u0653-\u065f\u06d6-\u06ed]")
+_SPACES = re.compile(r"\s+")
+
+
+def fold(text):
+    """توحيد الحروف وحذف الحركات؛ نفس نتيجة fold_sql على النص نفسه"""
+    return (text or "").translate(_FOLD_TABLE)
+
+
+def fold_sql(expression):
+    """تعبير SQL يطبق fold على expression بسلسلة replace() بدون دوال خارجية.
+
+    يعمل في أي اتصال (بما فيها المشغلات وأدوات sqlite الخارجية)، لأن
+    مقسم الكلمات unicode61 في FTS5 يعامل الحركات كفواصل بين الكلمات.
+    """
+    sql = f"COALESCE({expression}, '')"
+    for mark in MARKS:
+        sql = f"replace({sql}, '{mark}', '')"
+    for letter, folded in LETTER_FOLDS.items():
+        sql = f"replace({sql}, '{letter}', '{folded}')"
+    return sql
+
+
+def normalize(text):
+    """تطبيع كامل للمقارنة: fold مع حذف العلامات النادرة، وأحرف لاتينية صغيرة ومسافات موحدة"""
+    text = _EXTRA_MARKS.sub("", fold(text)).casefold()
+    return _SPACES.sub(" ", text).strip()
@@ -0,0 +1,393 @@
+"""جدول بيانات مشترك لصفحات العرض يحمل الصفوف على دفعات بترقيم المفتاح.
+
+بدلًا من جلب الجدول كاملًا وبناء عنصر لكل صف، يحتفظ DataGrid بنافذة
+محدودة من الصفوف (MAX_ROWS) ويجلب الدفعة التالية أو السابقة عند الاقتراب
+من طرف السكرول باستعلام من نوع
+
+    SELECT ... WHERE key > ? ORDER BY key LIMIT ?
+
+فلا تعتمد سرعة الجلب على موقع الدفعة في الجدول (بخلاف OFFSET)، ولا يتجاوز
+عدد عناصر الواجهة حجم النافذة مهما كبر الجدول. عند تعديل صف أو حذفه يُحدَّث
+عنصره فقط عبر patch_row و remove_row دون إعادة بناء باقي الصفوف.
+
+الترتيب والتصفية يتمان في SQL فقط: النقر على عنوان عمود من الأعمدة
+المسموح بها (sortable) يغير ORDER BY، ويصبح المفتاح في ترقيم الصفحات
+الزوج (عمود الترتيب، المفتاح)، والمرشحات (set_filter) شروط WHERE بمعاملات.
+الأعمدة المسموح بالترتيب بها يجب أن يكون لها فهرس: (is_miscellaneous, العمود)
+لأعمدة expenses و(rank, name) و name و contribution و total_due لجدول members
+(الترحيلان 2 و5).
+"""
+from datetime import datetime
+
+import flet as ft
+
+# أكبر محرف في Unicode؛ حد أعلى لنطاق البحث بالبادئة
+_MAX_CHAR = "\U0010ffff"
+
+
+def prefix_filter(column, text):
+    """شرط "يبدأ بـ" كنطاق على العمود حتى يستخدم فهرسه (بخلاف LIKE)"""
+    return f"{column} >= ? AND {column} < ?", (text, text + _MAX_CHAR)
+
+
+def parse_date(text):
+    """تاريخ بصيغة YYYY-MM-DD أو None إذا كان النص فارغًا؛ يرفع ValueError إذا كانت الصيغة خاطئة"""
+    text = (text or "").strip()
+    if not text:
+        return None
+    return datetime.strptime(text, "%Y-%m-%d").strftime("%Y-%m-%d")
+
+
+def range_filter(column, start=None, end=None):
+    """شرط نطاق مغلق على العمود؛ الحد الفارغ يُهمل. يعيد (None, ()) إذا لم يُحدد شيء"""
+    clauses, params = [], []
+    if start:
+        clauses.append(f"{column} >= ?")
+        params.append(start)
+    if end:
+        clauses.append(f"{column} <= ?")
+        params.append(end)
+    return (" AND ".join(clauses) or None), tuple(params)
+
+
+class DataGrid:
+    PAGE_SIZE = 50
+    # أقصى عدد صفوف مبنية في الواجهة في نفس الوقت
+    MAX_ROWS = 200
+    ROW_HEIGHT = 40
+    # المسافة (بالبكسل) من طرف السكرول التي يبدأ عندها جلب الدفعة التالية
+    LOAD_THRESHOLD = 200
+
+    def __init__(self, db, table, key, columns, display_columns, column_names,
+                 where="", params=(), widths=None, width=750, height=300, on_select=None,
+                 sortable=()):
+        """
+        table, key: الجدول ومفتاحه الأساسي (عمود فريد يُرتب به)
+        columns: الأعمدة المسترجعة لكل صف (تُمرر للصفحة كقاموس)
+        display_columns: الأعمدة المعروضة بترتيب العرض
+        widths: عرض كل عمود معروض؛ الافتراضي 100
+        on_select(row): يُستدعى عند النقر على صف، وبعد إعادة التحميل بالصف
+            المحدد بعد قراءته من جديد (أو None إذا لم يعد ضمن النافذة)
+        sortable: الأعمدة التي يمكن الترتيب بها بالنقر على عنوانها
+        """
+        self.db = db
+        self.table = table
+        self.key = key
+        self.columns = list(columns)
+        self.display_columns = list(display_columns)
+        self.column_names = column_names
+        self.where = where
+        self.params = tuple(params)
+        self.widths = widths or {}
+        self.width = width
+        self.height = height
+        self.on_select = on_select
+        self.sortable = set(sortable) & set(self.columns)
+
+        # الترتيب الحالي (العمود، تنازلي؟) والمرشحات الفعالة {الاسم: (الشرط، المعاملات)}
+        self.sort_column = key
+        self.descending = False
+        self.filters = {}
+        self._header_labels = {}
+        self._header = None
+
+        # الصفوف المبنية حاليًا بالترتيب، وعنصر كل صف حسب مفتاحه
+        self.rows = []
+        self._controls = {}
+        self._has_before = False
+        self._has_after = False
+        self._loading = False
+        self.selected_key = None
+
+        self.list_view = None
+        self.control = None
+
+    # ---- الاستعلامات ----
+
+    def _where(self, condition=None):
+        """دمج الشرط الأساسي والمرشحات والشرط الإضافي؛ يعيد (نص WHERE، المعاملات)"""
+        clauses = [(self.where, self.params)] if self.where else []
+        clauses += [f for f in self.filters.values()]
+        if condition:
+            clauses.append(condition)
+        if not clauses:
+            return "", ()
+        sql = " AND ".join(f"({clause})" for clause, _ in clauses)
+        return f"WHERE {sql}", tuple(p for _, params in clauses for p in params)
+
+    def _select_sql(self, where, reverse=False):
+        descending = self.descending != reverse
+        direction = "DESC" if descending else "ASC"
+        order = f"{self.key} {direction}"
+        if self.sort_column != self.key:
+            order = f"{self.sort_column} {direction}, {order}"
+        return f"SELECT {', '.join(self.columns)} FROM {self.table} {where} ORDER BY {order} LIMIT ?"
+
+    def _after(self, row, descending):
+        """شرط الصفوف التي تلي row في ترتيب (عمود الترتيب، المفتاح).
+
+        SQLite يضع NULL أولًا في الترتيب التصاعدي، فتُعالج القيم الفارغة
+        بفرع خاص؛ وفي غير ذلك تُستخدم مقارنة الأزواج التي تستفيد من الفهرس.
+        """
+        row_key = row[self.key]
+        op = "<" if descending else ">"
+        if self.sort_column == self.key:
+            return f"{self.key} {op} ?", (row_key,)
+        col = self.sort_column
+        value = row[col]
+        if value is None:
+            if descending:
+                return f"{col} IS NULL AND {self.key} < ?", (row_key,)
+            return f"({col} IS NULL AND {self.key} > ?) OR {col} IS NOT NULL", (row_key,)
+        if descending:
+            return f"({col}, {self.key}) < (?, ?) OR {col} IS NULL", (value, row_key)
+        return f"({col}, {self.key}) > (?, ?)", (value, row_key)
+
+    def _as_dicts(self, results):
+        return [dict(zip(self.columns, row)) for row in results]
+
+    def fetch_after(self, row=None, limit=None):
+        """الدفعة التي تلي الصف row (أو أول دفعة) بالترتيب الحالي"""
+        limit = limit or self.PAGE_SIZE
+        where, params = self._where(self._after(row, self.descending) if row else None)
+        return self._as_dicts(self.db.fetch_all(self._select_sql(where), params + (limit,)))
+
+    def fetch_before(self, row, limit=None):
+        """الدفعة التي تسبق الصف row، بالترتيب الحالي"""
+        limit = limit or self.PAGE_SIZE
+        where, params = self._where(self._after(row, not self.descending))
+        results = self.db.fetch_all(self._select_sql(where, reverse=True), params + (limit,))
+        return self._as_dicts(reversed(results))
+
+    def fetch_row(self, key):
+        """صف واحد بمفتاحه، أو None إذا لم يعد موجودًا أو لم يعد يطابق الشرط"""
+        where, params = self._where((f"{self.key} = ?", (key,)))
+        results = self.db.fetch_all(self._select_sql(where), params + (1,))
+        return self._as_dicts(results)[0] if results else None
+
+    # ---- الترتيب والتصفية ----
+
+    def _header_text(self, col):
+        if col != self.sort_column:
+            return self.column_names[col]
+        return f"{self.column_names[col]} {'▼' if self.descending else '▲'}"
+
+    def sort_by(self, col, descending=None):
+        """الترتيب بعمود مسموح به؛ النقر على نفس العمود يعكس الاتجاه"""
+        if col not in self.sortable and col != self.key:
+            raise ValueError(f"Column {col} is not sortable")
+        if descending is None:
+            descending = not self.descending if col == self.sort_column else False
+        self.sort_column, self.descending = col, descending
+        for name, label in self._header_labels.items():
+            label.value = self._header_text(name)
+        self.reload()
+        self._header.update()
+
+    def set_filter(self, name, clause=None, params=()):
+        """تعيين مرشح باسم name (أو إزالته إذا كان الشرط فارغًا) ثم إعادة التحميل"""
+        if clause:
+            self.filters[name] = (clause, tuple(params))
+        elif self.filters.pop(name, None) is None:
+            return
+        self.reload()
+
+    # ---- بناء العناصر ----
+
+    def _cell(self, text, col, **kwargs):
+        return ft.Container(
+            content=ft.Text(text, **kwargs),
+            width=self.widths.get(col, 100),
+            alignment=ft.alignment.center,
+            padding=10,
+        )
+
+    def _build_row(self, row):
+        row_key = row[self.key]
+        control = ft.Container(
+            content=ft.Row(
+                [self._cell(str(row[col]), col) for col in self.display_columns],
+                alignment=ft.MainAxisAlignment.CENTER,
+            ),
+            height=self.ROW_HEIGHT,
+            bgcolor=ft.colors.YELLOW if row_key == self.selected_key else None,
+            on_click=lambda e, row_key=row_key: self._select(row_key),
+        )
+        self._controls[row_key] = control
+        return control
+
+    def build(self):
+        """بناء صف العناوين والقائمة وتحميل أول دفعة؛ يعيد عنصر الجدول"""
+        self._header_labels = {
+            col: ft.Text(self._header_text(col), weight=ft.FontWeight.BOLD)
+            for col in self.display_columns
+        }
+        self._header = header = ft.Container(
+            content=ft.Row(
+                [
+                    ft.Container(
+                        content=self._header_labels[col],
+                        width=self.widths.get(col, 100),
+                        alignment=ft.alignment.center,
+                        padding=10,
+                        bgcolor=ft.colors.GREEN,
+                        on_click=(lambda e, col=col: self.sort_by(col))
+                        if col in self.sortable or col == self.key else None,
+                    ) for col in self.display_columns
+                ],
+                alignment=ft.MainAxisAlignment.CENTER,
+            ),
+            bgcolor=ft.colors.GREEN,
+            shadow=ft.BoxShadow(blur_radius=30, color="green"),
+            width=self.width,
+        )
+        # item_extent ثابت يسمح لـ Flutter بعرض الصفوف الظاهرة فقط وبحساب موضع السكرول
+        self.list_view = ft.ListView(
+            height=self.height,
+            width=self.width,
+            spacing=0,
+            padding=0,
+            item_extent=self.ROW_HEIGHT,
+            on_scroll=self._on_scroll,
+            on_scroll_interval=50,
+        )
+        self.control = ft.Column(
+            [
+                header,
+                ft.Container(
+                    content=self.list_view,
+                    bgcolor=ft.colors.LIGHT_GREEN,
+                    shadow=ft.BoxShadow(blur_radius=30, color="green"),
+                ),
+            ],
+            spacing=0,
+        )
+        self._load_first()
+        return self.control
+
+    def _load_first(self):
+        self.rows = self.fetch_after()
+        self._controls = {}
+        self.list_view.controls = [self._build_row(row) for row in self.rows]
+        self._has_before = False
+        self._has_after = len(self.rows) == self.PAGE_SIZE
+
+    # ---- النافذة المتحركة ----
+
+    def _on_scroll(self, e):
+        if self._loading or e.event_type not in ("update", "end"):
+            return
+        self._loading = True
+        try:
+            if self._has_after and e.max_scroll_extent - e.pixels < self.LOAD_THRESHOLD:
+                self._load_after(e.pixels)
+            elif self._has_before and e.pixels - e.min_scroll_extent < self.LOAD_THRESHOLD:
+                self._load_before(e.pixels)
+        finally:
+            self._loading = False
+
+    def _load_after(self, pixels):
+        batch = self.fetch_after(self.rows[-1] if self.rows else None)
+        self._has_after = len(batch) == self.PAGE_SIZE
+        if not batch:
+            return
+        self.rows.extend(batch)
+        self.list_view.controls.extend(self._build_row(row) for row in batch)
+        dropped = self._trim(from_start=True)
+        self.list_view.update()
+        if dropped:
+            # الصفوف المحذوفة من الأعلى تُزيح المحتوى، فنعيد السكرول لنفس الصف الظاهر
+            self.list_view.scroll_to(offset=max(pixels - dropped * self.ROW_HEIGHT, 0))
+
+    def _load_before(self, pixels):
+        batch = self.fetch_before(self.rows[0])
+        self._has_before = len(batch) == self.PAGE_SIZE
+        if not batch:
+            return
+        self.rows[:0] = batch
+        self.list_view.controls[:0] = [self._build_row(row) for row in batch]
+        self._trim(from_start=False)
+        self.list_view.update()
+        self.list_view.scroll_to(offset=pixels + len(batch) * self.ROW_HEIGHT)
+
+    def _trim(self, from_start):
+        """إزالة الصفوف الزائدة عن MAX_ROWS من الطرف البعيد؛ يعيد عدد الصفوف المزالة"""
+        extra = len(self.rows) - self.MAX_ROWS
+        if extra <= 0:
+            return 0
+        if from_start:
+            removed, self.rows = self.rows[:extra], self.rows[extra:]
+            del self.list_view.controls[:extra]
+            self._has_before = True
+        else:
+            removed, self.rows = self.rows[-extra:], self.rows[:-extra]
+            del self.list_view.controls[-extra:]
+            self._has_after = True
+        for row in removed:
+            self._controls.pop(row[self.key], None)
+        return extra
+
+    # ---- التحديد والتحديث الجزئي ----
+
+    def _index_of(self, row_key):
+        for index, row in enumerate(self.rows):
+            if row[self.key] == row_key:
+                return index
+        return None
+
+    def _select(self, row_key):
+        previous = self._controls.get(self.selected_key)
+        if previous is not None:
+            previous.bgcolor = None
+            previous.update()
+        self.selected_key = row_key
+        control = self._controls[row_key]
+        control.bgcolor = ft.colors.YELLOW
+        control.update()
+        if self.on_select:
+            self.on_select(self.rows[self._index_of(row_key)])
+
+    @property
+    def selected_row(self):
+        index = self._index_of(self.selected_key)
+        return None if index is None else self.rows[index]
+
+    def patch_row(self, row_key):
+        """إعادة قراءة صف واحد وتحديث خلاياه في مكانها بعد تعديله"""
+        index = self._index_of(row_key)
+        if index is None:
+            return None
+        row = self.fetch_row(row_key)
+        if row is None:
+            self.remove_row(row_key)
+            return None
+        self.rows[index] = row
+        control = self._controls[row_key]
+        for cell, col in zip(control.content.controls, self.display_columns):
+            cell.content.value = str(row[col])
+        control.update()
+        return row
+
+    def remove_row(self, row_key):
+        """إزالة عنصر صف محذوف دون إعادة تحميل باقي النافذة"""
+        index = self._index_of(row_key)
+        if index is None:
+            return
+        del self.rows[index]
+        control = self._controls.pop(row_key)
+        self.list_view.controls.remove(control)
+        if self.selected_key == row_key:
+            self.selected_key = None
+        self.list_view.update()
+
+    def reload(self):
+        """إعادة تحميل النافذة من أول الجدول (عند الرجوع للصفحة أو تغيير الترتيب والمرشحات)"""
+        self._load_first()
+        if self.selected_key is not None:
+            # الصف المحدد أُعيدت قراءته أو خرج من النافذة: نبلغ الصفحة بالحالة الجديدة
+            if self.selected_key not in self._controls:
+                self.selected_key = None
+            if self.on_select:
+                self.on_select(self.selected_row)
+        self.list_view.update()
+        self.list_view.scroll_to(offset=0)
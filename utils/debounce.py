@@ -0,0 +1,30 @@
+"""تأخير تنفيذ دالة حتى يتوقف المستخدم عن الكتابة."""
+import threading
+
+
+class Debouncer:
+    """يؤجل استدعاء fn حتى تمر delay ثانية بدون استدعاء جديد.
+
+    كل استدعاء يلغي المؤقت السابق، فلا يُنفذ البحث إلا لآخر قيمة مكتوبة.
+    fn تعمل في خيط المؤقت، وFlet يسمح بتحديث الصفحة من خارج خيطها.
+    """
+
+    def __init__(self, fn, delay=0.15):
+        self.fn = fn
+        self.delay = delay
+        self._timer = None
+        self._lock = threading.Lock()
+
+    def __call__(self, *args, **kwargs):
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+            self._timer = threading.Timer(self.delay, self.fn, args, kwargs)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def cancel(self):
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
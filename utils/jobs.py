@@ -0,0 +1,152 @@
+"""تشغيل المهام الطويلة (التصدير) في مجموعة خيوط خلفية مع التقدم والإلغاء.
+
+المهمة دالة fn(job) تعمل في خيط من المجموعة، وتبلغ عن تقدمها بـ
+job.report(done, total) وتستدعي job.checkpoint() بين الخطوات فترفع
+JobCancelled إذا طلب المستخدم الإلغاء. استدعاءات on_progress و on_done
+تعمل في خيط المهمة، وFlet يسمح بتحديث الصفحة من خارج خيطها.
+"""
+import itertools
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+class JobCancelled(Exception):
+    """أوقف المستخدم المهمة"""
+
+
+class Job:
+    PENDING, RUNNING, DONE, FAILED, CANCELLED = "pending", "running", "done", "failed", "cancelled"
+    # أقل مدة (بالثواني) بين تحديثين للتقدم، حتى لا تغرق الواجهة بالتحديثات
+    PROGRESS_INTERVAL = 0.1
+
+    def __init__(self, job_id, label, fn, on_progress=None, on_done=None):
+        self.job_id = job_id
+        self.label = label
+        self.fn = fn
+        self.on_progress = on_progress
+        self.on_done = on_done
+        self.status = self.PENDING
+        self.progress = 0.0
+        self.message = ""
+        self.result = None
+        self.error = None
+        self.future = None
+        self.started_at = None
+        self.finished_at = None
+        self._cancel = threading.Event()
+        self._last_report = 0.0
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    @property
+    def finished(self):
+        return self.status in (self.DONE, self.FAILED, self.CANCELLED)
+
+    @property
+    def elapsed(self):
+        if self.started_at is None:
+            return 0.0
+        return (self.finished_at or time.perf_counter()) - self.started_at
+
+    def cancel(self):
+        """طلب الإلغاء؛ المهمة التي لم تبدأ تُلغى فورًا والجارية عند أول checkpoint"""
+        self._cancel.set()
+        if self.future is not None and self.future.cancel():
+            self._finish(self.CANCELLED)
+
+    def checkpoint(self):
+        if self._cancel.is_set():
+            raise JobCancelled(self.label)
+
+    def report(self, done, total, message=None):
+        """تسجيل التقدم (done من total) ثم checkpoint"""
+        self.progress = min(done / total, 1.0) if total else 0.0
+        if message is not None:
+            self.message = message
+        now = time.perf_counter()
+        if self.on_progress is not None and (now - self._last_report >= self.PROGRESS_INTERVAL or done >= total):
+            self._last_report = now
+            self._notify(self.on_progress)
+        self.checkpoint()
+
+    def _notify(self, callback):
+        try:
+            callback(self)
+        except Exception as e:
+            logging.error(f"Job {self.label} callback failed: {e}")
+
+    def _finish(self, status, result=None, error=None):
+        self.status = status
+        self.result = result
+        self.error = error
+        self.finished_at = time.perf_counter()
+        if self.on_done is not None:
+            self._notify(self.on_done)
+
+    def run(self):
+        if self._cancel.is_set():
+            self._finish(self.CANCELLED)
+            return
+        self.status = self.RUNNING
+        self.started_at = time.perf_counter()
+        try:
+            result = self.fn(self)
+        except JobCancelled:
+            logging.info(f"Job {self.label} cancelled after {self.elapsed:.2f}s")
+            self._finish(self.CANCELLED)
+        except Exception as e:
+            logging.error(f"Job {self.label} failed: {e}", exc_info=True)
+            self._finish(self.FAILED, error=e)
+        else:
+            self.progress = 1.0
+            logging.info(f"Job {self.label} finished in {self.elapsed:.2f}s")
+            self._finish(self.DONE, result=result)
+
+
+class JobRunner:
+    """مجموعة خيوط تنفذ المهام وتحتفظ بالمهام غير المنتهية"""
+
+    def __init__(self, max_workers=2):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._ids = itertools.count(1)
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, label, fn, on_progress=None, on_done=None):
+        """إرسال fn(job) للتنفيذ في الخلفية وإرجاع Job فورًا"""
+        job = Job(next(self._ids), label, fn, on_progress, on_done)
+        with self._lock:
+            self._jobs[job.job_id] = job
+        job.future = self._executor.submit(job.run)
+        # يُستدعى أيضًا إذا أُلغيت المهمة قبل أن تبدأ
+        job.future.add_done_callback(lambda future: self._forget(job))
+        return job
+
+    def _forget(self, job):
+        with self._lock:
+            self._jobs.pop(job.job_id, None)
+
+    def active_jobs(self):
+        with self._lock:
+            return list(self._jobs.values())
+
+    def cancel_all(self):
+        for job in self.active_jobs():
+            job.cancel()
+
+
+_runner = None
+_runner_lock = threading.Lock()
+
+
+def job_runner():
+    """مجموعة المهام المشتركة للبرنامج (تُنشأ عند أول استخدام)"""
+    global _runner
+    with _runner_lock:
+        if _runner is None:
+            _runner = JobRunner()
+        return _runner
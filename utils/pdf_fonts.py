@@ -0,0 +1,83 @@
+"""Arabic font registration for PDF exports.
+
+reportlab is imported and the font files are searched only on the first
+PDF export, not when the pages are imported.
+"""
+import logging
+import os
+import sys
+from functools import lru_cache
+
+FONT_NAME = "Arabic-Font"
+
+
+@lru_cache(maxsize=1)
+def register_arabic_font():
+    """Register an Arabic font for PDF export once; returns True if FONT_NAME is usable"""
+    try:
+        from reportlab.pdfbase import pdfmetrics
+        from reportlab.pdfbase.ttfonts import TTFont
+
+        # 1. Check in the same directory as the main file
+        if hasattr(sys, 'frozen'):
+            # If running as a PyInstaller executable
+            main_dir = sys._MEIPASS
+        else:
+            # Normal Python script
+            main_dir = os.path.dirname(os.path.abspath(sys.argv[0]))
+        
+        font_path = os.path.join(main_dir, '1.ttf')
+        
+        if os.path.exists(font_path):
+            try:
+                pdfmetrics.registerFont(TTFont(FONT_NAME, font_path))
+                logging.info(f"Successfully registered font from main directory: {font_path}")
+                return True
+            except Exception as e:
+                logging.warning(f"Could not register font from main directory: {e}")
+        
+        # 2. Try project assets directory
+        project_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        font_path = os.path.join(project_dir, 'assets', 'fonts', '1.ttf')
+        
+        if os.path.exists(font_path):
+            try:
+                pdfmetrics.registerFont(TTFont(FONT_NAME, font_path))
+                logging.info(f"Successfully registered font from project directory: {font_path}")
+                return True
+            except Exception as e:
+                logging.warning(f"Could not register font from project directory: {e}")
+
+        # 3. Try system fonts
+        system_fonts = [
+            # Linux
+            "/usr/share/fonts/truetype/noto/NotoNaskhArabic-Regular.ttf",
+            "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
+            # Windows
+            "C:/Windows/Fonts/tahoma.ttf",  # Tahoma supports Arabic
+            "C:/Windows/Fonts/arial.ttf",
+            # macOS
+            "/Library/Fonts/Arial Unicode.ttf",
+            "/System/Library/Fonts/Supplemental/Arial.ttf",
+            # User fonts
+            os.path.join(os.path.expanduser("~"), ".fonts", "arial.ttf"),
+            os.path.join(os.path.dirname(sys.executable), "fonts", "arial.ttf")
+        ]
+
+        for font_path in system_fonts:
+            if os.path.exists(font_path):
+                try:
+                    pdfmetrics.registerFont(TTFont(FONT_NAME, font_path))
+                    logging.info(f"Successfully registered font from system path: {font_path}")
+                    return True
+                except Exception as e:
+                    logging.warning(f"Could not register font from {font_path}: {e}")
+                    continue
+
+        # 4. Fallback to system default (Helvetica works on most systems)
+        logging.warning("Using system default font (Helvetica) for PDF export")
+        return False
+        
+    except Exception as e:
+        logging.error(f"Error registering Arabic font: {e}")
+        return False